@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Stand-in for the CuraEngine executable, used by the benchmark harness.
+
+Accepts the same ``slice -v -p -j <json> -s <key=value> ... -l <model> -o <output>`` command line as CuraEngine and
+mimics its output on stderr: ``Progress`` lines for a couple of stages followed by ``Print time:`` and ``Filament:``
+lines. If no ``-o`` is given the G-code is written to stdout. The amount and pace of output is controlled through
+environment variables:
+
+FAKE_CURA_PROGRESS_LINES
+    number of ``Progress`` lines to emit (default 1000)
+FAKE_CURA_LINE_RATE
+    lines per second, 0 to emit as fast as possible (default 0)
+FAKE_CURA_VERBOSE_LINES
+    additional verbose log lines per progress line (default 0)
+FAKE_CURA_LAYERS
+    number of layers of G-code to write (default 10)
+FAKE_CURA_MOVES_PER_LAYER
+    extruding moves per layer (default 100)
+FAKE_CURA_RETURNCODE
+    exit code to report (default 0)
+"""
+
+from __future__ import absolute_import, print_function
+
+import os
+import sys
+import time
+
+STAGES = ["slice", "layerparts", "inset+skin", "support", "export"]
+
+
+def _env(name, default, type=int):
+	try:
+		return type(os.environ.get(name, default))
+	except ValueError:
+		return default
+
+
+def _parse_args(args):
+	if not args or args[0] != "slice":
+		print("Usage: {} slice -v -p -j <json> -s <key=value> -l <model> -o <output>".format(sys.argv[0]), file=sys.stderr)
+		sys.exit(1)
+
+	options = dict(settings=dict(), models=[], output=None, definition=None)
+	index = 1
+	while index < len(args):
+		arg = args[index]
+		if arg in ("-v", "-p"):
+			index += 1
+			continue
+		if index + 1 >= len(args):
+			print("Missing value for {}".format(arg), file=sys.stderr)
+			sys.exit(1)
+		value = args[index + 1]
+		if arg == "-j":
+			options["definition"] = value
+		elif arg == "-s":
+			key, _, setting = value.partition("=")
+			options["settings"][key] = setting
+		elif arg == "-l":
+			options["models"].append(value)
+		elif arg == "-o":
+			options["output"] = value
+		index += 2
+	return options
+
+
+def _write_gcode(output, layers, moves):
+	extruded = 0.0
+	output.write(";FLAVOR:RepRap\nG28\nG92 E0\n")
+	for layer in range(layers):
+		output.write(";LAYER:{}\n".format(layer))
+		output.write("G0 F9000 X10.000 Y10.000 Z{:.3f}\n".format(0.2 * (layer + 1)))
+		for move in range(moves):
+			extruded += 0.05
+			output.write("G1 F1800 X{:.3f} Y{:.3f} E{:.5f}\n".format(10 + (move % 50), 10 + (move // 50), extruded))
+	output.write("M107\nM84\n")
+	return extruded
+
+
+def main():
+	options = _parse_args(sys.argv[1:])
+	if options["definition"] is None or not os.path.exists(options["definition"]):
+		print("Could not load definition {}".format(options["definition"]), file=sys.stderr)
+		sys.exit(1)
+
+	progress_lines = _env("FAKE_CURA_PROGRESS_LINES", 1000)
+	verbose_lines = _env("FAKE_CURA_VERBOSE_LINES", 0)
+	rate = _env("FAKE_CURA_LINE_RATE", 0.0, type=float)
+	interval = 1.0 / rate if rate > 0 else 0
+
+	stderr = sys.stderr
+	stderr.write("Loaded {} settings from command line\n".format(len(options["settings"])))
+	for line in range(progress_lines):
+		stage = STAGES[line * len(STAGES) // max(progress_lines, 1)]
+		stderr.write("Progress:{}:{}:{} \t{:f}%\n".format(stage, line + 1, progress_lines, float(line + 1) / progress_lines))
+		for _ in range(verbose_lines):
+			stderr.write("Processing layer {} of model {}\n".format(line, ",".join(options["models"])))
+		if interval:
+			stderr.flush()
+			time.sleep(interval)
+
+	layers = _env("FAKE_CURA_LAYERS", 10)
+	moves = _env("FAKE_CURA_MOVES_PER_LAYER", 100)
+	if options["output"]:
+		with open(options["output"], "w") as f:
+			extruded = _write_gcode(f, layers, moves)
+	else:
+		extruded = _write_gcode(sys.stdout, layers, moves)
+		sys.stdout.flush()
+
+	stderr.write("Print time: {}\n".format(layers * moves))
+	stderr.write("Filament: {:f}\n".format(extruded * 2.4))
+	stderr.flush()
+
+	sys.exit(_env("FAKE_CURA_RETURNCODE", 0))
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# coding=utf-8
+"""
+Benchmarks for the hot paths of the CuraEngine plugin.
+
+Runs the plugin against ``fake_cura_engine.py`` instead of a real CuraEngine, so the numbers only reflect the
+plugin's own overhead: spawning, parsing the engine output, loading profiles and building the command line. Has to
+be run with the Python installation OctoPrint is installed under:
+
+    python benchmarks/run_benchmarks.py [--runs 10] [--lines 20000] [--jobs 4] [--json]
+"""
+
+from __future__ import absolute_import, print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import octoprint_cura_engine
+
+FAKE_ENGINE = os.path.join(HERE, "fake_cura_engine.py")
+
+PRINTER_PROFILE = dict(volume=dict(width=200, depth=200, height=200, formFactor="rectangular", origin="lowerleft"))
+
+
+class BenchmarkSettings(object):
+	"""
+	Just enough of OctoPrint's plugin settings for the plugin to run outside of OctoPrint.
+	"""
+
+	def __init__(self, values, logfile):
+		self._values = values
+		self._logfile = logfile
+
+	def get(self, path):
+		value = self._values
+		for key in path:
+			if not isinstance(value, dict) or key not in value:
+				return None
+			value = value[key]
+		return value
+
+	def get_int(self, path):
+		value = self.get(path)
+		return int(value) if value is not None else None
+
+	def get_float(self, path):
+		value = self.get(path)
+		return float(value) if value is not None else None
+
+	def get_boolean(self, path):
+		return bool(self.get(path))
+
+	def global_get(self, path):
+		return None
+
+	def get_plugin_logfile_path(self):
+		return self._logfile
+
+
+class BenchmarkPrinter(object):
+	"""
+	A printer that is never printing.
+	"""
+
+	def is_printing(self):
+		return False
+
+
+class BenchmarkPluginManager(object):
+	"""
+	Swallows the plugin's messages to the frontend.
+	"""
+
+	def send_plugin_message(self, identifier, data):
+		pass
+
+
+def create_plugin(folder, **overrides):
+	plugin = octoprint_cura_engine.CuraEnginePlugin()
+
+	values = plugin.get_settings_defaults()
+	values.update(cura_engine_path=FAKE_ENGINE)
+	values["cache"]["enabled"] = False
+	values.update(overrides)
+
+	data_folder = os.path.join(folder, "data")
+	if not os.path.isdir(data_folder):
+		os.makedirs(data_folder)
+
+	plugin._settings = BenchmarkSettings(values, os.path.join(folder, "engine.log"))
+	plugin._basefolder = os.path.dirname(os.path.abspath(octoprint_cura_engine.__file__))
+	plugin._identifier = "cura_engine"
+	plugin._printer = BenchmarkPrinter()
+	plugin._plugin_manager = BenchmarkPluginManager()
+	plugin.get_plugin_data_folder = lambda: data_folder
+	plugin.on_startup("127.0.0.1", 5000)
+	return plugin
+
+
+def create_profile(plugin, folder):
+	profile_path = os.path.join(folder, "benchmark.profile")
+	octoprint_cura_engine.save_profile_dict_to_yaml(profile_path, plugin._definition.get_defaults())
+	return profile_path
+
+
+def create_model(folder):
+	model_path = os.path.join(folder, "cube.stl")
+	facets = [((0, 0, 0), (10, 0, 0), (10, 10, 0)), ((0, 0, 0), (10, 10, 0), (0, 10, 0)),
+	          ((0, 0, 10), (10, 10, 10), (10, 0, 10)), ((0, 0, 10), (0, 10, 10), (10, 10, 10)),
+	          ((0, 0, 0), (10, 0, 10), (10, 0, 0)), ((0, 0, 0), (0, 0, 10), (10, 0, 10)),
+	          ((0, 10, 0), (10, 10, 0), (10, 10, 10)), ((0, 10, 0), (10, 10, 10), (0, 10, 10)),
+	          ((0, 0, 0), (0, 10, 0), (0, 10, 10)), ((0, 0, 0), (0, 10, 10), (0, 0, 10)),
+	          ((10, 0, 0), (10, 10, 10), (10, 10, 0)), ((10, 0, 0), (10, 0, 10), (10, 10, 10))]
+	with open(model_path, "w") as f:
+		f.write("solid cube\n")
+		for facet in facets:
+			f.write("facet normal 0 0 0\nouter loop\n")
+			for vertex in facet:
+				f.write("vertex {} {} {}\n".format(*vertex))
+			f.write("endloop\nendfacet\n")
+		f.write("endsolid cube\n")
+	return model_path
+
+
+def timed(function, runs):
+	durations = []
+	for _ in range(runs):
+		start = time.time()
+		function()
+		durations.append(time.time() - start)
+	durations.sort()
+	return dict(runs=runs,
+	            min=durations[0],
+	            median=durations[len(durations) // 2],
+	            max=durations[-1])
+
+
+#~~ benchmarks
+
+def benchmark_do_slice(plugin, folder, model_path, profile_path, runs):
+	output = os.path.join(folder, "out.gco")
+
+	def run():
+		ok, result = plugin.do_slice(model_path, PRINTER_PROFILE, machinecode_path=output, profile_path=profile_path)
+		if not ok:
+			raise RuntimeError(result)
+
+	return timed(run, runs)
+
+
+def benchmark_parse_output(plugin, lines, verbose_lines):
+	env = dict(os.environ, FAKE_CURA_PROGRESS_LINES=str(lines), FAKE_CURA_VERBOSE_LINES=str(verbose_lines), FAKE_CURA_LAYERS="1")
+	command = [sys.executable, FAKE_ENGINE, "slice", "-v", "-p", "-j", plugin._definition.path, "-l", "model.stl", "-o", os.devnull]
+	total_lines = lines * (1 + verbose_lines)
+
+	def run():
+		with open(os.devnull, "wb") as devnull:
+			p = subprocess.Popen(command, env=env, stdout=devnull, stderr=subprocess.PIPE)
+		reporter = plugin._create_progress_reporter(None, lambda *args, **kwargs: None, (), dict())
+		plugin._parse_slicing_output(p, reporter=reporter, filament_diameter=2.85)
+
+	result = timed(run, 3)
+	result["lines"] = total_lines
+	result["lines_per_second"] = total_lines / result["median"]
+	return result
+
+
+def benchmark_profile_load(profile_path, runs):
+	def cold():
+		octoprint_cura_engine._profile_cache.invalidate()
+		octoprint_cura_engine.get_profile_dict_from_yaml(profile_path)
+
+	def warm():
+		octoprint_cura_engine.get_profile_dict_from_yaml(profile_path)
+
+	return dict(cold=timed(cold, runs), warm=timed(warm, runs))
+
+
+def benchmark_build_command(plugin, model_path, profile_path, runs):
+	profile_dict = octoprint_cura_engine.get_profile_dict_from_yaml(profile_path)
+
+	def run():
+		plugin._build_command(FAKE_ENGINE, model_path, PRINTER_PROFILE, "out.gco", dict(profile_dict), None)
+
+	result = timed(run, runs)
+	result["arguments"] = len(plugin._build_command(FAKE_ENGINE, model_path, PRINTER_PROFILE, "out.gco", dict(profile_dict), None))
+	return result
+
+
+def benchmark_concurrency(plugin, folder, model_path, profile_path, jobs, runs):
+	errors = []
+
+	def run_job(index):
+		output = os.path.join(folder, "concurrent_{}.gco".format(index))
+		ok, result = plugin.do_slice(model_path, PRINTER_PROFILE, machinecode_path=output, profile_path=profile_path)
+		if not ok:
+			errors.append(result)
+
+	start = time.time()
+	threads = [threading.Thread(target=run_job, args=(index,)) for index in range(jobs * runs)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	duration = time.time() - start
+
+	if errors:
+		raise RuntimeError(errors[0])
+	return dict(jobs=jobs * runs, slots=plugin._scheduler.slots, duration=duration, jobs_per_second=jobs * runs / duration)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark the CuraEngine plugin against a fake CuraEngine")
+	parser.add_argument("--runs", type=int, default=10, help="repetitions per benchmark")
+	parser.add_argument("--lines", type=int, default=20000, help="progress lines emitted by the fake engine when benchmarking output parsing")
+	parser.add_argument("--verbose-lines", type=int, default=4, help="additional verbose lines per progress line")
+	parser.add_argument("--jobs", type=int, default=4, help="concurrent slicing jobs")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+
+	folder = tempfile.mkdtemp(prefix="cura_engine_benchmark_")
+	os.environ.setdefault("FAKE_CURA_PROGRESS_LINES", "1000")
+	try:
+		plugin = create_plugin(folder, max_concurrent_jobs=args.jobs)
+		model_path = create_model(folder)
+		profile_path = create_profile(plugin, folder)
+
+		results = dict()
+		results["do_slice"] = benchmark_do_slice(plugin, folder, model_path, profile_path, args.runs)
+		results["parse_slicing_output"] = benchmark_parse_output(plugin, args.lines, args.verbose_lines)
+		results["profile_load"] = benchmark_profile_load(profile_path, args.runs)
+		results["build_command"] = benchmark_build_command(plugin, model_path, profile_path, args.runs * 10)
+		results["concurrency"] = benchmark_concurrency(plugin, folder, model_path, profile_path, args.jobs, 2)
+	finally:
+		shutil.rmtree(folder, ignore_errors=True)
+
+	if args.json:
+		print(json.dumps(results, indent=2, sort_keys=True))
+		return
+
+	print("do_slice end-to-end:        median {median:.4f}s (min {min:.4f}s, max {max:.4f}s)".format(**results["do_slice"]))
+	print("_parse_slicing_output:      {lines_per_second:.0f} lines/s ({lines} lines in {median:.4f}s)".format(**results["parse_slicing_output"]))
+	print("profile load (cold):        median {median:.6f}s".format(**results["profile_load"]["cold"]))
+	print("profile load (warm):        median {median:.6f}s".format(**results["profile_load"]["warm"]))
+	print("_build_command:             median {median:.6f}s, {arguments} arguments".format(**results["build_command"]))
+	print("concurrent jobs:            {jobs} jobs on {slots} slots in {duration:.3f}s, {jobs_per_second:.2f} jobs/s".format(**results["concurrency"]))
+
+
+if __name__ == "__main__":
+	main()
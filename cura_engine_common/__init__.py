@@ -0,0 +1,6 @@
+# coding=utf-8
+"""
+The parts of the CuraEngine plugin that don't need OctoPrint: running and watching engines, the index over the
+engine's settings definition and the standalone slicing worker (see ``worker.py``), which has to run on hosts without
+OctoPrint as well.
+"""
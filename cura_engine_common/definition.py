@@ -0,0 +1,214 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
+
+
+settings_properties = ["default", "label", "description", "unit", "min_value", "max_value", "type", "options"]
+
+
+class SettingsDefinition(object):
+	"""
+	Flat index over the settings of a CuraEngine definition file such as ``fdmprinter.json``.
+
+	The index maps every setting key to its properties (see ``settings_properties``) plus the label of the category
+	it belongs to (``None`` for machine settings). It is built lazily on first access and persisted to ``cache_path``,
+	later instances reuse that file as long as the definition's mtime and size - or, failing that, its content hash -
+	are unchanged.
+	"""
+
+	CACHE_VERSION = 1
+
+	def __init__(self, path, cache_path=None):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.definition")
+
+		self._path = path
+		self._cache_path = cache_path
+
+		self._mutex = threading.Lock()
+		self._index = None
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def settings(self):
+		return self._get_index()["settings"]
+
+	@property
+	def categories(self):
+		return self._get_index()["categories"]
+
+	@property
+	def digest(self):
+		return self._get_index()["digest"]
+
+	def get(self, key):
+		return self.settings.get(key)
+
+	def get_defaults(self):
+		return dict((key, setting["default"]) for key, setting in self.settings.items())
+
+	def get_profile_struct(self):
+		"""
+		Settings grouped by category label, containing only the properties relevant for the profile editor.
+		"""
+
+		settings = self.settings
+		profile_struct = OrderedDict()
+		for label, keys in self.categories.items():
+			category = OrderedDict()
+			for key in keys:
+				category[key] = dict((p, settings[key][p]) for p in settings_properties if p in settings[key])
+			profile_struct[label] = category
+		return profile_struct
+
+	def write_with_defaults(self, path, defaults):
+		"""
+		Writes a copy of the definition to ``path`` in which the defaults of the settings in ``defaults`` are replaced.
+		"""
+
+		with open(self._path, "rb") as f:
+			raw_definition = json.loads(f.read().decode("utf-8"), object_pairs_hook=OrderedDict)
+
+		for key, setting in iter_settings(raw_definition):
+			if key in defaults:
+				setting["default"] = defaults[key]
+
+		with _atomic_write(path, "wb") as f:
+			f.write(json.dumps(raw_definition, indent=4).encode("utf-8"))
+
+	#~~ index handling
+
+	def _get_index(self):
+		with self._mutex:
+			if self._index is None:
+				self._index = self._load_index()
+			return self._index
+
+	def _load_index(self):
+		stat = os.stat(self._path)
+
+		cached = self._load_cache()
+		if cached is not None:
+			if cached["mtime"] == stat.st_mtime and cached["size"] == stat.st_size:
+				return cached
+
+		with open(self._path, "rb") as f:
+			content = f.read()
+		digest = hashlib.sha1(content).hexdigest()
+
+		if cached is not None and cached["digest"] == digest:
+			index = cached
+		else:
+			try:
+				raw_definition = json.loads(content.decode("utf-8"), object_pairs_hook=OrderedDict)
+			except:
+				raise IOError("Couldn't load JSON profile from {path}".format(path=self._path))
+			index = _build_index(raw_definition)
+			index["digest"] = digest
+			self._logger.info(u"Built settings index for {path} with {count} settings".format(path=self._path, count=len(index["settings"])))
+
+		index["version"] = self.CACHE_VERSION
+		index["mtime"] = stat.st_mtime
+		index["size"] = stat.st_size
+		self._save_cache(index)
+		return index
+
+	def _load_cache(self):
+		if not self._cache_path or not os.path.exists(self._cache_path):
+			return None
+
+		try:
+			with open(self._cache_path, "rb") as f:
+				cached = pickle.load(f)
+		except:
+			self._logger.exception(u"Could not load cached settings index from {path}, rebuilding it".format(path=self._cache_path))
+			return None
+
+		if not isinstance(cached, dict) or cached.get("version") != self.CACHE_VERSION:
+			return None
+		return cached
+
+	def _save_cache(self, index):
+		if not self._cache_path:
+			return
+
+		try:
+			with _atomic_write(self._cache_path, "wb") as f:
+				pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+		except:
+			self._logger.exception(u"Could not save settings index to {path}".format(path=self._cache_path))
+
+
+def iter_settings(data_dict):
+	"""
+	Yields ``(key, setting)`` for every dict carrying a ``default`` anywhere below ``data_dict``, in document order.
+	"""
+
+	stack = [iter(data_dict.items())]
+	while stack:
+		for key, value in stack[-1]:
+			if isinstance(value, dict):
+				if "default" in value:
+					yield key, value
+				stack.append(iter(value.items()))
+				break
+		else:
+			stack.pop()
+
+
+def _build_index(raw_definition):
+	settings = OrderedDict()
+	categories = OrderedDict()
+
+	for key, setting in iter_settings(raw_definition.get("machine_settings", dict())):
+		settings[key] = _index_entry(setting, None)
+
+	for category in raw_definition.get("categories", dict()).values():
+		label = category["label"]
+		keys = categories.setdefault(label, [])
+		for key, setting in iter_settings(category):
+			if key not in settings:
+				keys.append(key)
+			settings[key] = _index_entry(setting, label)
+
+	return dict(settings=settings, categories=categories)
+
+
+def _index_entry(setting, category):
+	entry = dict((p, setting[p]) for p in settings_properties if p in setting)
+	entry["category"] = category
+	return entry
+
+
+@contextmanager
+def _atomic_write(path, mode):
+	"""
+	Like ``octoprint.util.atomic_write``, which isn't available to the slicing worker.
+	"""
+
+	temporary = tempfile.NamedTemporaryFile(mode=mode, prefix=".tmp", dir=os.path.dirname(os.path.abspath(path)), delete=False)
+	try:
+		with temporary:
+			yield temporary
+		shutil.move(temporary.name, path)
+	except:
+		if os.path.exists(temporary.name):
+			os.remove(temporary.name)
+		raise
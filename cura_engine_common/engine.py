@@ -0,0 +1,276 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import errno
+import os
+import platform
+import re
+import select
+import sys
+import time
+
+
+# "Progress:<stage>:<current>:<total> \t<percentage>%", older engines only print the trailing percentage
+PROGRESS_PATTERN = re.compile(r"^Progress:(?P<stage>[^:\s]*)(?::(?P<current>\d+):(?P<total>\d+))?.*?(?P<progress>[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)%\s*$")
+PRINT_TIME_PATTERN = re.compile(r"Print time: (?P<time>.*?)\s*$")
+FILAMENT_PATTERN = re.compile(r"Filament: (?P<volume>[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)")
+
+_SELECT_ON_PIPES = os.name != "nt"
+
+# ioprio_set(2) syscall numbers by machine, Linux only
+_IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv6l": 314, "armv7l": 314}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+# PRIO_PROCESS of getpriority(2)/setpriority(2), os.PRIO_PROCESS is missing on Python 2
+_PRIO_PROCESS = 0
+IOPRIO_CLASS_BEST_EFFORT = 2
+IOPRIO_CLASS_IDLE = 3
+
+
+class EngineOutputReader(object):
+	"""
+	Non-blocking, incremental line reader for one of the engine's output pipes.
+
+	``read_lines`` waits at most ``timeout`` seconds for new data and returns all complete lines received so far,
+	an empty list if nothing arrived in time and ``None`` once the pipe has been closed, which happens as soon as the
+	engine exits.
+	"""
+
+	def __init__(self, stream, block_size=64*1024):
+		self._fd = stream.fileno()
+		self._block_size = block_size
+		self._buffer = b""
+		self._eof = False
+
+	def read_lines(self, timeout=None):
+		if self._eof:
+			return None
+
+		if _SELECT_ON_PIPES:
+			try:
+				readable, _, _ = select.select([self._fd], [], [], timeout)
+			except (OSError, select.error) as e:
+				if e.args[0] == errno.EINTR:
+					return []
+				raise
+			if not readable:
+				return []
+
+		data = os.read(self._fd, self._block_size)
+		if not data:
+			self._eof = True
+			lines = [self._buffer] if self._buffer else []
+			self._buffer = b""
+			return [_decode(line) for line in lines]
+
+		lines = (self._buffer + data).split(b"\n")
+		self._buffer = lines.pop()
+		return [_decode(line) for line in lines]
+
+
+class ProgressThrottle(object):
+	"""
+	Limits progress callbacks to at most ``max_rate`` calls per second, always keeping the latest value.
+	"""
+
+	def __init__(self, callback, max_rate):
+		self._callback = callback
+		self._interval = 1.0 / max_rate if max_rate else 0
+		self._last_emit = None
+		self._pending = None
+
+	def update(self, progress):
+		self._pending = progress
+		now = time.time()
+		if self._last_emit is None or now - self._last_emit >= self._interval:
+			self._emit(now)
+
+	def flush(self):
+		if self._pending is not None:
+			self._emit(time.time())
+
+	def _emit(self, now):
+		progress, self._pending = self._pending, None
+		self._last_emit = now
+		self._callback(progress)
+
+
+def create_preexec(niceness=None, io_class=None, memory_limit=None):
+	"""
+	Returns a ``preexec_fn`` for ``subprocess.Popen`` that changes the CPU (``niceness``) and, on Linux, IO scheduling
+	class (``io_class``) of the engine process and limits its address space to ``memory_limit`` bytes. ``None`` if
+	there is nothing to change or the platform can't do it.
+	"""
+
+	if os.name == "nt":
+		return None
+
+	ioprio_set = None
+	if io_class is not None:
+		ioprio_set = _get_ioprio_set()
+
+	set_memory_limit = None
+	if memory_limit:
+		set_memory_limit = _get_set_memory_limit()
+
+	if not niceness and ioprio_set is None and set_memory_limit is None:
+		return None
+
+	def preexec():
+		if niceness:
+			os.nice(niceness)
+		if ioprio_set is not None:
+			ioprio_set(_IOPRIO_WHO_PROCESS, 0, _ioprio_value(io_class))
+		if set_memory_limit is not None:
+			set_memory_limit(memory_limit)
+
+	return preexec
+
+
+def lower_process_priority(pid, niceness=None, io_class=None):
+	"""
+	Lowers the priority of the already running process ``pid`` (all of its threads on Linux). Priorities are never
+	raised again, unprivileged processes aren't allowed to.
+	"""
+
+	thread_ids = [pid]
+	task_folder = "/proc/{}/task".format(pid)
+	if os.path.isdir(task_folder):
+		thread_ids = [int(tid) for tid in os.listdir(task_folder)]
+
+	priority_functions = _get_priority_functions() if niceness else None
+	ioprio_set = _get_ioprio_set() if io_class is not None else None
+	for tid in thread_ids:
+		if priority_functions is not None:
+			getpriority, setpriority = priority_functions
+			if getpriority(_PRIO_PROCESS, tid) < niceness:
+				setpriority(_PRIO_PROCESS, tid, niceness)
+		if ioprio_set is not None:
+			ioprio_set(_IOPRIO_WHO_PROCESS, tid, _ioprio_value(io_class))
+
+
+class EngineWatchdog(object):
+	"""
+	Kills an engine process that runs for longer than ``timeout`` seconds or doesn't produce any output for longer
+	than ``silence_timeout`` seconds. ``feed`` has to be called on every output of the engine, ``check`` regularly.
+	"""
+
+	def __init__(self, timeout=None, silence_timeout=None):
+		self.reason = None
+
+		self._timeout = timeout
+		self._silence_timeout = silence_timeout
+		self._process = None
+		self._started = None
+		self._last_output = None
+
+	def watch(self, process):
+		self._process = process
+		self._started = self._last_output = time.time()
+
+	def feed(self):
+		self._last_output = time.time()
+
+	def check(self):
+		"""
+		Returns ``True`` if the engine had to be killed.
+		"""
+
+		if self._process is None or self.reason is not None:
+			return self.reason is not None
+
+		now = time.time()
+		if self._timeout and now - self._started > self._timeout:
+			self._kill("running for more than {}s".format(self._timeout))
+		elif self._silence_timeout and now - self._last_output > self._silence_timeout:
+			self._kill("no output for more than {}s".format(self._silence_timeout))
+		return self.reason is not None
+
+	def _kill(self, reason):
+		self.reason = reason
+		try:
+			self._process.kill()
+		except OSError:
+			# already gone
+			pass
+
+
+def _ioprio_value(io_class):
+	# lowest level within the best effort class, the idle class has no levels
+	level = 7 if io_class == IOPRIO_CLASS_BEST_EFFORT else 0
+	return io_class << _IOPRIO_CLASS_SHIFT | level
+
+
+def can_renice():
+	"""
+	Whether ``lower_process_priority`` can change the niceness of running processes on this platform.
+	"""
+
+	return _get_priority_functions() is not None
+
+
+def _get_priority_functions():
+	"""
+	``(getpriority, setpriority)`` working on other processes, ``None`` where there are none. Python 2 lacks
+	``os.getpriority`` and ``os.setpriority``, libc's are called directly there.
+	"""
+
+	if hasattr(os, "setpriority"):
+		return os.getpriority, os.setpriority
+	if os.name == "nt":
+		return None
+
+	try:
+		import ctypes
+		import ctypes.util
+		libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+	except:
+		return None
+
+	def getpriority(which, who):
+		# -1 is a valid priority, only errno tells errors apart
+		ctypes.set_errno(0)
+		priority = libc.getpriority(which, who)
+		error = ctypes.get_errno()
+		if priority == -1 and error:
+			raise OSError(error, os.strerror(error))
+		return priority
+
+	def setpriority(which, who, priority):
+		if libc.setpriority(which, who, priority) != 0:
+			error = ctypes.get_errno()
+			raise OSError(error, os.strerror(error))
+
+	return getpriority, setpriority
+
+
+def _get_ioprio_set():
+	syscall_number = _IOPRIO_SET.get(platform.machine())
+	if not sys.platform.startswith("linux") or syscall_number is None:
+		return None
+
+	try:
+		import ctypes
+		import ctypes.util
+		# resolved in the parent, loading libraries between fork and exec isn't safe
+		syscall = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True).syscall
+	except:
+		return None
+
+	return lambda which, who, ioprio: syscall(syscall_number, which, who, ioprio)
+
+
+def _get_set_memory_limit():
+	try:
+		# resolved in the parent, importing between fork and exec isn't safe
+		import resource
+	except ImportError:
+		return None
+
+	setrlimit = resource.setrlimit
+	rlimit_as = resource.RLIMIT_AS
+	return lambda limit: setrlimit(rlimit_as, (limit, limit))
+
+
+def _decode(line):
+	return line.decode("utf-8", "replace").rstrip("\r")
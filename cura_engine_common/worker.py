@@ -0,0 +1,437 @@
+# coding=utf-8
+"""
+Standalone slicing worker, lets OctoPrint instances offload their slicing jobs to a faster host.
+
+Run it on the host with the CuraEngine binary (the plugin has to be installed there as well, OctoPrint doesn't have to
+run there):
+
+    python -m cura_engine_common.worker --engine /usr/local/bin/CuraEngine --host 0.0.0.0 --port 8765 --jobs 4 --api-key <key>
+
+and add ``http://<host>:8765`` to the plugin's remote workers. The worker only listens on localhost by default, any
+other address requires an API key. The HTTP API:
+
+    GET    /status               number of slots, running and queued jobs
+    POST   /jobs                 create a job from ``{"settings": [[key, value], ...]}``, returns its id
+    PUT    /jobs/<id>/model      upload the STL model, which starts the job
+    GET    /jobs/<id>            state, progress and result of the job
+    GET    /jobs/<id>/gcode      the sliced machine code
+    DELETE /jobs/<id>            cancel the job and/or remove its files
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+
+from .definition import SettingsDefinition
+from .engine import EngineOutputReader, EngineWatchdog, PROGRESS_PATTERN, PRINT_TIME_PATTERN, FILAMENT_PATTERN
+
+
+JOB_PATH_PATTERN = re.compile(r"^/jobs/(?P<id>[0-9a-f-]+)(?P<suffix>/model|/gcode)?$")
+
+
+class WorkerJob(object):
+
+	def __init__(self, folder, settings):
+		self.id = str(uuid.uuid4())
+		self.folder = folder
+		self.settings = settings
+
+		self.state = "created"
+		self.stage = None
+		self.current = None
+		self.total = None
+		self.progress = 0.0
+		self.error = None
+		self.returncode = None
+		self.print_time = None
+		self.filament_volume = None
+
+		self.created_at = time.time()
+		self.finished_at = None
+		self.cancelled = False
+		self.process = None
+
+	@property
+	def model_path(self):
+		return os.path.join(self.folder, "model.stl")
+
+	@property
+	def machinecode_path(self):
+		return os.path.join(self.folder, "output.gco")
+
+	def as_dict(self):
+		return dict(id=self.id,
+		            state=self.state,
+		            stage=self.stage,
+		            current=self.current,
+		            total=self.total,
+		            progress=self.progress,
+		            error=self.error,
+		            returncode=self.returncode,
+		            printTime=self.print_time,
+		            filamentVolume=self.filament_volume)
+
+
+class SlicingWorker(object):
+	"""
+	Runs the jobs received over HTTP on at most ``slots`` CuraEngine processes at a time.
+	"""
+
+	def __init__(self, engine, definition, folder, slots=1, timeout=None, watchdog_timeout=None, max_age=3600):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.worker")
+
+		self.engine = engine
+		self.definition = definition
+		self.folder = folder
+		self.slots = slots
+
+		self._timeout = timeout
+		self._watchdog_timeout = watchdog_timeout
+		self._max_age = max_age
+
+		self._semaphore = threading.Semaphore(slots)
+		self._mutex = threading.Lock()
+		self._jobs = dict()
+
+	def get_status(self):
+		with self._mutex:
+			states = [job.state for job in self._jobs.values()]
+		return dict(slots=self.slots,
+		            running=states.count("running"),
+		            queued=states.count("queued"),
+		            definition=self.definition.digest)
+
+	def create_job(self, settings):
+		self._remove_expired()
+
+		job = WorkerJob(tempfile.mkdtemp(dir=self.folder), settings)
+		with self._mutex:
+			self._jobs[job.id] = job
+		return job
+
+	def get_job(self, job_id):
+		with self._mutex:
+			return self._jobs.get(job_id)
+
+	def start_job(self, job):
+		job.state = "queued"
+		thread = threading.Thread(target=self._run, args=(job,), name="CuraEngineWorker-" + job.id[:8])
+		thread.daemon = True
+		thread.start()
+
+	def remove_job(self, job_id):
+		with self._mutex:
+			job = self._jobs.pop(job_id, None)
+		if job is None:
+			return False
+
+		job.cancelled = True
+		if job.process is not None and job.process.poll() is None:
+			job.process.kill()
+		if job.state not in ("queued", "running"):
+			shutil.rmtree(job.folder, ignore_errors=True)
+		return True
+
+	def _run(self, job):
+		with self._semaphore:
+			if job.cancelled:
+				job.state = "cancelled"
+				shutil.rmtree(job.folder, ignore_errors=True)
+				return
+
+			job.state = "running"
+			try:
+				self._slice(job)
+			except:
+				self._logger.exception(u"Error while slicing job %s" % job.id)
+				job.state = "failed"
+				job.error = "Unknown error, please consult the worker's log"
+			finally:
+				job.finished_at = time.time()
+				if job.cancelled:
+					job.state = "cancelled"
+					shutil.rmtree(job.folder, ignore_errors=True)
+
+	def _slice(self, job):
+		# known settings become the defaults of a copy of the definition, which keeps the command line short
+		defaults = dict((key, value) for key, value in job.settings if key in self.definition.settings)
+		definition_path = os.path.join(job.folder, "definition.json")
+		self.definition.write_with_defaults(definition_path, defaults)
+
+		command_args = [self.engine, "slice", "-v", "-p", "-j", definition_path]
+		for key, value in job.settings:
+			if key not in defaults:
+				command_args += ["-s", u"{}={}".format(key, value)]
+		command_args += ["-l", job.model_path, "-o", job.machinecode_path]
+
+		self._logger.info(u"Running job %s" % job.id)
+		with open(os.devnull, "wb") as devnull:
+			job.process = subprocess.Popen(command_args, cwd=os.path.dirname(self.engine), stdout=devnull, stderr=subprocess.PIPE)
+
+		watchdog = EngineWatchdog(timeout=self._timeout, silence_timeout=self._watchdog_timeout)
+		watchdog.watch(job.process)
+
+		reader = EngineOutputReader(job.process.stderr)
+		while True:
+			lines = reader.read_lines(timeout=0.5)
+			if lines is None:
+				break
+			if lines:
+				watchdog.feed()
+			watchdog.check()
+
+			for line in lines:
+				match = PROGRESS_PATTERN.match(line)
+				if match is not None:
+					job.stage = match.group("stage")
+					job.current = int(match.group("current")) if match.group("current") else None
+					job.total = int(match.group("total")) if match.group("total") else None
+					job.progress = float(match.group("progress"))
+					continue
+
+				match = PRINT_TIME_PATTERN.search(line)
+				if match is not None:
+					job.print_time = match.group("time")
+					continue
+
+				match = FILAMENT_PATTERN.search(line)
+				if match is not None:
+					job.filament_volume = float(match.group("volume"))
+
+		job.process.stderr.close()
+		job.returncode = job.process.wait()
+
+		if job.returncode == 0:
+			job.state = "done"
+		else:
+			job.state = "failed"
+			job.error = "Slicing aborted, {}".format(watchdog.reason) if watchdog.reason else "Got return code {}".format(job.returncode)
+		self._logger.info(u"Job %s %s" % (job.id, job.state))
+
+	def _remove_expired(self):
+		now = time.time()
+		with self._mutex:
+			expired = [job.id for job in self._jobs.values() if job.finished_at is not None and now - job.finished_at > self._max_age]
+		for job_id in expired:
+			self._logger.info(u"Removing expired job %s" % job_id)
+			self.remove_job(job_id)
+
+
+class WorkerRequestHandler(BaseHTTPRequestHandler):
+
+	# set on the subclass created by create_server
+	worker = None
+	api_key = None
+
+	def do_GET(self):
+		if not self._authorized():
+			return
+
+		if self.path == "/status":
+			return self._send_json(200, self.worker.get_status())
+
+		job, suffix = self._get_job()
+		if job is None:
+			return
+		if suffix is None:
+			return self._send_json(200, job.as_dict())
+		if suffix == "/gcode":
+			if job.state != "done":
+				return self._send_error(409, "Job is {}".format(job.state))
+			return self._send_file(job.machinecode_path)
+		self._send_error(404, "Not found")
+
+	def do_POST(self):
+		if not self._authorized():
+			return
+
+		if self.path != "/jobs":
+			return self._send_error(404, "Not found")
+
+		try:
+			data = json.loads(self._read_body().decode("utf-8"))
+			settings = [(key, value) for key, value in data["settings"]]
+		except:
+			return self._send_error(400, "Expected a JSON object with settings")
+
+		job = self.worker.create_job(settings)
+		self._send_json(201, dict(id=job.id))
+
+	def do_PUT(self):
+		if not self._authorized():
+			return
+
+		job, suffix = self._get_job()
+		if job is None:
+			return
+		if suffix != "/model":
+			return self._send_error(404, "Not found")
+		if job.state != "created":
+			return self._send_error(409, "Job is {}".format(job.state))
+
+		length = int(self.headers.get("Content-Length", 0))
+		with open(job.model_path, "wb") as f:
+			remaining = length
+			while remaining > 0:
+				chunk = self.rfile.read(min(remaining, 64 * 1024))
+				if not chunk:
+					break
+				f.write(chunk)
+				remaining -= len(chunk)
+
+		self.worker.start_job(job)
+		self._send_json(202, job.as_dict())
+
+	def do_DELETE(self):
+		if not self._authorized():
+			return
+
+		match = JOB_PATH_PATTERN.match(self.path)
+		if match is None or match.group("suffix") is not None or not self.worker.remove_job(match.group("id")):
+			return self._send_error(404, "Not found")
+		self.send_response(204)
+		self.end_headers()
+
+	def log_message(self, format, *args):
+		logging.getLogger("octoprint.plugins.cura_engine.worker").debug(u"%s - %s" % (self.address_string(), format % args))
+
+	def _authorized(self):
+		if self.api_key and self.headers.get("X-Api-Key") != self.api_key:
+			self._send_error(403, "Invalid API key")
+			return False
+		return True
+
+	def _get_job(self):
+		match = JOB_PATH_PATTERN.match(self.path)
+		job = self.worker.get_job(match.group("id")) if match is not None else None
+		if job is None:
+			self._send_error(404, "Not found")
+			return None, None
+		return job, match.group("suffix")
+
+	def _read_body(self):
+		return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+	def _send_json(self, status, data):
+		body = json.dumps(data).encode("utf-8")
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def _send_error(self, status, message):
+		self._send_json(status, dict(error=message))
+
+	def _send_file(self, path):
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain")
+		self.send_header("Content-Length", str(os.path.getsize(path)))
+		self.end_headers()
+		with open(path, "rb") as f:
+			shutil.copyfileobj(f, self.wfile, 64 * 1024)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+	daemon_threads = True
+
+
+def create_server(worker, host="127.0.0.1", port=8765, api_key=None):
+	handler = type("BoundWorkerRequestHandler", (WorkerRequestHandler,), dict(worker=worker, api_key=api_key))
+	return ThreadingHTTPServer((host, port), handler)
+
+
+def is_loopback(host):
+	"""
+	Whether ``host`` is only reachable from this machine.
+	"""
+
+	try:
+		addresses = set(info[4][0] for info in socket.getaddrinfo(host, None))
+	except socket.gaierror:
+		return False
+	return bool(addresses) and all(address.startswith("127.") or address == "::1" for address in addresses)
+
+
+def get_plugin_definition_path():
+	"""
+	Path of the ``fdmprinter.json`` shipped with the plugin, found without importing the plugin (and with it OctoPrint).
+	"""
+
+	try:
+		from importlib.util import find_spec
+	except ImportError:
+		import imp
+		try:
+			_, folder, _ = imp.find_module("octoprint_cura_engine")
+		except ImportError:
+			return None
+	else:
+		spec = find_spec("octoprint_cura_engine")
+		if spec is None or spec.origin is None:
+			return None
+		folder = os.path.dirname(spec.origin)
+
+	path = os.path.join(folder, "profiles", "fdmprinter.json")
+	return path if os.path.exists(path) else None
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Slicing worker for the OctoPrint CuraEngine plugin")
+	parser.add_argument("--engine", required=True, help="path to the CuraEngine executable")
+	parser.add_argument("--host", default="127.0.0.1", help="address to listen on, anything but localhost requires --api-key")
+	parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+	parser.add_argument("--jobs", type=int, default=1, help="number of concurrently running engines")
+	parser.add_argument("--folder", default=None, help="folder for models and sliced files, a temporary folder by default")
+	parser.add_argument("--api-key", default=None, help="require this key in the X-Api-Key header of all requests")
+	parser.add_argument("--definition", default=None, help="CuraEngine definition file, the plugin's fdmprinter.json by default")
+	parser.add_argument("--timeout", type=int, default=0, help="maximum slicing time per job in seconds, 0 for unlimited")
+	parser.add_argument("--watchdog-timeout", type=int, default=300, help="kill engines silent for longer than this many seconds, 0 to disable")
+	args = parser.parse_args()
+
+	if not args.api_key and not is_loopback(args.host):
+		parser.error("listening on {} requires an --api-key".format(args.host))
+
+	definition_path = args.definition or get_plugin_definition_path()
+	if definition_path is None:
+		parser.error("could not find the plugin's fdmprinter.json, pass --definition")
+
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+	folder = args.folder or tempfile.mkdtemp(prefix="cura_engine_worker_")
+	if not os.path.isdir(folder):
+		os.makedirs(folder)
+
+	definition = SettingsDefinition(definition_path)
+	worker = SlicingWorker(args.engine, definition, folder, slots=max(1, args.jobs), timeout=args.timeout, watchdog_timeout=args.watchdog_timeout)
+
+	server = create_server(worker, host=args.host, port=args.port, api_key=args.api_key)
+	logging.getLogger("octoprint.plugins.cura_engine.worker").info(u"Listening on %s:%d with %d slots" % (args.host, args.port, worker.slots))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+
+if __name__ == "__main__":
+	main()
@@ -2,18 +2,45 @@
 from __future__ import absolute_import
 
 import logging
-import logging.handlers
+import math
 import os
+import subprocess
 import flask
+import octoprint.filemanager
 import octoprint.plugin
 import octoprint.slicing
 import json
-import yaml
 
-from collections import OrderedDict
+from octoprint.events import Events
+
 from octoprint.util.paths import normalize as normalize_path
 from octoprint.server import NO_CONTENT
 
+from cura_engine_common.definition import SettingsDefinition, iter_settings
+from cura_engine_common.engine import EngineOutputReader, EngineWatchdog, can_renice, create_preexec, lower_process_priority, IOPRIO_CLASS_BEST_EFFORT, IOPRIO_CLASS_IDLE, \
+	PROGRESS_PATTERN, PRINT_TIME_PATTERN, FILAMENT_PATTERN
+
+from . import analysis as gcode_analysis
+from . import importer
+from . import mesh
+from . import packing
+from . import persistent
+from .batch import BatchItem, BatchJob
+from .joblog import EngineLog, LineSampler
+from .mesh import ModelDoesNotFit
+from .output import LayerSink
+from .metrics import JobTimer, MetricsRegistry, wait_for_process
+from .profiles import ProfileCache, copy_profile
+from .remote import RemoteWorkerError, WorkerPool
+from .progress import ProgressModel, ProgressReporter, job_features
+from .scheduler import JobScheduler, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_SPECULATIVE
+from .speculative import SpeculativeSlicer
+from .validation import BOOLEAN_TRUES, ProfileValidationError, ProfileValidator
+
+_profile_cache = ProfileCache()
+
+io_classes = {"best-effort": IOPRIO_CLASS_BEST_EFFORT, "idle": IOPRIO_CLASS_IDLE}
+
 editable_profile_settings = ["layer_height", "layer_height_0", "line_width",
 	"shell_thickness", "wall_thickness", "top_bottom_thickness", "travel_compensate_overlapping_walls_enabled",
 	"infill_sparse_density", "infill_pattern", "infill_overlap", "infill_sparse_thickness",
@@ -24,24 +51,41 @@ editable_profile_settings = ["layer_height", "layer_height_0", "line_width",
 	"support_enable", "support_type", "support_xy_distance", "support_z_distance", "support_roof_enable", "support_use_towers", "support_pattern", "support_infill_rate",
 	"adhesion_type", "skirt_line_count", "skirt_gap", "skirt_minimal_lenght", "brim_line_count"]
 
-settings_properties = ["default", "label", "description", "unit", "min_value", "max_value", "type", "options"]
-
 
 class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 	octoprint.plugin.SettingsPlugin,
 	octoprint.plugin.TemplatePlugin,
 	octoprint.plugin.AssetPlugin,
 	octoprint.plugin.BlueprintPlugin,
-	octoprint.plugin.StartupPlugin):
+	octoprint.plugin.StartupPlugin,
+	octoprint.plugin.ShutdownPlugin,
+	octoprint.plugin.EventHandlerPlugin):
+
+	MAX_SETTINGS_FILES = 20
+	MAX_FINISHED_BATCHES = 20
 
 	def __init__(self):
 		self._logger = logging.getLogger("octoprint.plugins.cura_engine")
 		self._cura_engine_logger = logging.getLogger("octoprint.plugins.cura_engine.engine")
 
+		self._scheduler = JobScheduler()
+		self._definition = None
+		self._profile_validator = None
+
+		self._slice_cache = None
+		self._engine_pool = None
+		self._worker_pool = None
+		self._progress_model = None
+		self._engine_log = None
+		self._speculative = SpeculativeSlicer(self._slice_speculatively, self._is_printer_busy)
+		self._metrics = MetricsRegistry()
+
+		# filtered profile editor struct, serialized and gzipped, keyed on the definition digest
+		self._editor_struct_payload = None
+
 		import threading
-		self._slicing_commands = dict()
-		self._cancelled_jobs = []
-		self._job_mutex = threading.Lock()
+		self._batches = dict()
+		self._batch_mutex = threading.Lock()
 
 	#~~ AssetPlugin API
 
@@ -55,51 +99,303 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 	#~~ StartupPlugin API
 
 	def on_startup(self, host, port):
-		# Setup our custom logger
-		cura_logging_handler = logging.handlers.RotatingFileHandler(self._settings.get_plugin_logfile_path(), maxBytes=2*1024*1024)
-		cura_logging_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
-		cura_logging_handler.setLevel(logging.DEBUG)
+		# Setup our custom logger, written asynchronously so engine output never waits for the disk
+		self._engine_log = EngineLog(self._cura_engine_logger, self._settings.get_plugin_logfile_path(),
+		                             job_folder=self._get_job_log_folder(),
+		                             max_bytes=self._settings.get_int(["logging", "max_size"]) * 1024 * 1024,
+		                             max_job_logs=self._settings.get_int(["logging", "max_job_logs"]),
+		                             compress=self._settings.get_boolean(["logging", "compress"]))
+		self._engine_log.start()
+
+		self._definition = SettingsDefinition(self._get_definition_path(),
+		                                      cache_path=os.path.join(self.get_plugin_data_folder(), "fdmprinter.cache"))
+		self._profile_validator = ProfileValidator(self._definition.settings)
+
+		self._progress_model = ProgressModel(os.path.join(self.get_plugin_data_folder(), "progress_model.json"))
+
+		self._update_slice_cache()
+		self._update_scheduler()
+		self._update_engine_pool()
+		self._update_worker_pool()
+
+		if self._settings.get_boolean(["analysis", "enabled"]) and not gcode_analysis.is_available():
+			self._logger.info(u"NumPy is not installed, sliced files won't be analysed")
+
+	#~~ EventHandlerPlugin API
+
+	def on_event(self, event, payload):
+		if event == Events.PRINT_STARTED:
+			# a running print needs the CPU more than any guesswork
+			self._speculative.clear()
+			job_ids = self._scheduler.cancel_preemptible()
+			if job_ids:
+				self._logger.info(u"Print started, cancelled speculative jobs %s" % ", ".join(job_ids))
+			self._lower_engine_priorities()
+
+		elif event in (Events.PRINT_DONE, Events.PRINT_FAILED, Events.PRINT_CANCELLED):
+			# lowered priorities can't be raised again, replace the idle persistent engines instead
+			if self._engine_pool is not None:
+				import threading
+				thread = threading.Thread(target=self._engine_pool.recycle, name="CuraEngineRecycle")
+				thread.daemon = True
+				thread.start()
+
+		elif event == getattr(Events, "FILE_ADDED", Events.UPLOAD):
+			if not self._settings.get_boolean(["speculative", "enabled"]) or self._slice_cache is None:
+				return
+
+			storage = payload.get("storage", payload.get("target"))
+			path = payload.get("path", payload.get("file"))
+			if storage != "local" or not path or not octoprint.filemanager.valid_file_type(path, type="stl"):
+				return
+
+			self._speculative.submit(self._file_manager.path_on_disk("local", path))
+
+	def _slice_speculatively(self, model_path):
+		"""
+		Slices ``model_path`` with the configured profiles (the default profile if there are none) for the current
+		printer profile, solely to get the results into the slicing cache.
+		"""
+
+		if self._slice_cache is None:
+			return
 
-		self._cura_engine_logger.addHandler(cura_logging_handler)
-		self._cura_engine_logger.setLevel(logging.DEBUG)
-		self._cura_engine_logger.propagate = False
+		printer_profile = self._printer_profile_manager.get_current_or_default()
+		profile_paths = [self._slicing_manager.get_profile_path("cura_engine", name) for name in self._settings.get(["speculative", "profiles"]) or []]
 
-		self._profile_struct = self._get_profile_struct()
+		import tempfile
+		for profile_path in profile_paths or [None]:
+			if self._is_printer_busy():
+				return
 
-	def _get_profile_struct(self):
-		default_json_path = os.path.join(self._basefolder, "profiles", "fdmprinter.json")
-		with open(default_json_path, 'r') as f:
+			fd, machinecode_path = tempfile.mkstemp(suffix=".gco")
+			os.close(fd)
+			try:
+				self._logger.info(u"Pre-slicing %s with %s" % (model_path, profile_path or "the default profile"))
+				ok, result = self._slice(model_path, printer_profile, machinecode_path=machinecode_path, profile_path=profile_path,
+				                         priority=PRIORITY_SPECULATIVE)
+				if not ok:
+					self._logger.info(u"Could not pre-slice %s: %s" % (model_path, result))
+			except octoprint.slicing.SlicingCancelled:
+				self._logger.info(u"Pre-slicing of %s got cancelled" % model_path)
+				return
+			finally:
+				os.remove(machinecode_path)
+
+	def _is_printer_busy(self):
+		return self._printer.is_printing()
+
+	def _lower_engine_priorities(self):
+		niceness, io_class = self._get_engine_priority(printing=True)
+		processes = [process for _, process in self._scheduler.get_running_processes()]
+		if self._engine_pool is not None:
+			processes += self._engine_pool.get_processes()
+
+		if processes and niceness and not can_renice():
+			self._logger.warn(u"Can't change the niceness of running engines on this platform, they keep their current niceness")
+			niceness = None
+
+		for process in processes:
 			try:
-				raw_profile_dict = json.loads(f.read(), object_pairs_hook=OrderedDict)
+				lower_process_priority(process.pid, niceness=niceness, io_class=io_class)
+			except OSError:
+				# the engine exited in the meantime
+				pass
 			except:
-				raise IOError("Couldn't load JSON profile from {path}".format(path=json_path))
-
-		profile_struct = OrderedDict()
-		for category in raw_profile_dict["categories"]:
-			temp_dict = OrderedDict()
-			self._find_settings_with_properties(raw_profile_dict["categories"][category], temp_dict)
-			profile_struct[raw_profile_dict["categories"][category]["label"]] = temp_dict.copy()
+				self._logger.exception(u"Could not lower the priority of engine process %s" % process.pid)
+
+	def _get_engine_priority(self, printing=None):
+		if printing is None:
+			printing = self._is_printer_busy()
+		prefix = "printing_" if printing else ""
+		return self._settings.get_int(["resources", prefix + "niceness"]), io_classes.get(self._settings.get(["resources", prefix + "io_class"]))
+
+	def _get_engine_preexec(self, preemptible=False):
+		memory_limit = self._settings.get_int(["resources", "memory_limit"])
+		memory_limit = memory_limit * 1024 * 1024 if memory_limit else None
+
+		if preemptible:
+			# speculative jobs have to stay out of the way
+			return create_preexec(19, IOPRIO_CLASS_IDLE, memory_limit)
+
+		niceness, io_class = self._get_engine_priority()
+		return create_preexec(niceness, io_class, memory_limit)
+
+	def _create_watchdog(self):
+		return EngineWatchdog(timeout=self._settings.get_int(["resources", "timeout"]),
+		                      silence_timeout=self._settings.get_int(["resources", "watchdog_timeout"]))
+
+	#~~ ShutdownPlugin API
+
+	def on_shutdown(self):
+		if self._slice_cache is not None:
+			self._slice_cache.flush()
+		if self._engine_pool is not None:
+			self._engine_pool.close()
+			self._engine_pool = None
+		if self._engine_log is not None:
+			self._engine_log.stop()
+			self._engine_log = None
+
+	def _update_engine_log(self):
+		self._engine_log.configure(job_folder=self._get_job_log_folder() or "",
+		                           max_bytes=self._settings.get_int(["logging", "max_size"]) * 1024 * 1024,
+		                           max_job_logs=self._settings.get_int(["logging", "max_job_logs"]),
+		                           compress=self._settings.get_boolean(["logging", "compress"]))
+
+	def _get_job_log_folder(self):
+		if not self._settings.get_boolean(["logging", "job_logs"]):
+			return None
+		return os.path.join(self.get_plugin_data_folder(), "logs")
+
+	def _update_scheduler(self):
+		max_jobs = self._settings.get_int(["max_concurrent_jobs"])
+		if not max_jobs:
+			import multiprocessing
+			max_jobs = multiprocessing.cpu_count()
+		self._scheduler.set_slots(max_jobs)
+		if self._engine_pool is not None:
+			self._engine_pool.configure(self._get_persistent_engines(), self._scheduler.slots)
+
+	def _update_engine_pool(self):
+		executable = normalize_path(self._settings.get(["cura_engine_path"]))
+		enabled = self._settings.get_boolean(["persistent", "enabled"]) and executable
+
+		if enabled and not persistent.is_available():
+			self._logger.warn(u"pyArcus is not installed, falling back to starting CuraEngine for every job")
+			enabled = False
+		if enabled and not mesh.is_available():
+			self._logger.warn(u"NumPy is not installed, falling back to starting CuraEngine for every job")
+			enabled = False
+
+		pool = self._engine_pool
+		if pool is not None and (not enabled or pool.executable != executable):
+			self._engine_pool = None
+			pool.close()
+			pool = None
+
+		if not enabled:
+			return
 
-		return profile_struct
+		if pool is None:
+			self._engine_pool = persistent.EnginePool(executable, self._get_definition_path(),
+			                                          engines=self._get_persistent_engines(),
+			                                          max_idle=self._scheduler.slots,
+			                                          health_check_interval=self._settings.get_float(["persistent", "health_check_interval"]),
+			                                          preexec_factory=self._get_engine_preexec)
+		else:
+			pool.configure(self._get_persistent_engines(), self._scheduler.slots)
 
-	def _find_settings_with_properties(self, data_dict, struct_dict):
-		if not isinstance(data_dict, dict):
+	def _update_worker_pool(self):
+		urls = [url for url in self._settings.get(["remote", "workers"]) or [] if url]
+		if not self._settings.get_boolean(["remote", "enabled"]) or not urls:
+			self._worker_pool = None
 			return
-		for key in data_dict.keys():
-			if isinstance(data_dict[key], dict) and "default" in data_dict[key].keys():
-				struct_dict[key] = dict()
-				for s_property in settings_properties:
-					if s_property in data_dict[key].keys():
-						struct_dict[key][s_property] = data_dict[key][s_property]
-			self._find_settings_with_properties(data_dict[key], struct_dict)
+
+		self._worker_pool = WorkerPool(urls,
+		                               api_key=self._settings.get(["remote", "api_key"]),
+		                               timeout=self._settings.get_float(["remote", "timeout"]),
+		                               retry_interval=self._settings.get_float(["remote", "retry_interval"]),
+		                               definition_digest=self._definition.digest)
+
+	def _get_persistent_engines(self):
+		return max(1, min(self._settings.get_int(["persistent", "engines"]) or 1, self._scheduler.slots))
+
+	def _update_slice_cache(self):
+		if not self._settings.get_boolean(["cache", "enabled"]):
+			if self._slice_cache is not None:
+				self._slice_cache.flush()
+			self._slice_cache = None
+		elif self._slice_cache is None:
+			from .cache import SliceCache
+			self._slice_cache = SliceCache(os.path.join(self.get_plugin_data_folder(), "cache"),
+			                               max_size=self._get_cache_max_size(),
+			                               compress=self._settings.get_boolean(["cache", "compress"]))
+		else:
+			self._slice_cache.set_max_size(self._get_cache_max_size())
+			self._slice_cache.set_compress(self._settings.get_boolean(["cache", "compress"]))
+
+	def _get_cache_max_size(self):
+		max_size = self._settings.get_int(["cache", "max_size"])
+		if not max_size:
+			return None
+		return max_size * 1024 * 1024
 
 	#~~ SettingsPlugin API
 
 	def get_settings_defaults(self):
 		return {
-			"cura_engine_path": None
+			"cura_engine_path": None,
+			"max_concurrent_jobs": 0, # 0 for one job per CPU core
+			"progress_max_rate": 2.0, # progress updates per second, 0 for unlimited
+			"engine_settings": "minimal", # "minimal" to only pass overridden settings, "full" to pass all of them
+			"engine_settings_file_threshold": 50, # more overrides than this go into a generated definition file
+			"logging": {
+				"max_size": 5, # in MB, the engine log is rotated beyond that
+				"job_logs": True, # also log every job to its own file in the plugin's data folder
+				"max_job_logs": 50, # job logs kept, 0 for all
+				"compress": True, # gzip job logs once the job is done
+				"progress_rate": 1.0, # progress lines logged per second (plus one per stage), 0 for all
+				"verbose": True # log the engine's regular output, warnings and errors are always logged
+			},
+			"validation": {
+				"enabled": True # check profiles against the definition before slicing and saving
+			},
+			"analysis": {
+				"enabled": True # requires NumPy
+			},
+			"mesh": {
+				"preprocess": True, # requires NumPy
+				"max_triangles": 0 # decimate meshes with more triangles, 0 to disable
+			},
+			"cache": {
+				"enabled": True,
+				"max_size": 512, # in MB, 0 for unbounded
+				"compress": False # gzip cached results, trades CPU time for disk space and writes
+			},
+			"plate": {
+				"spacing": 5.0, # in mm between the parts of a packed plate, on top of any brim or raft
+				"rotate": True # allow turning parts by 90° for a tighter fit
+			},
+			"output": {
+				"streaming": False # stream the machine code from the engine and publish every finished layer
+			},
+			"resources": {
+				"niceness": 0, # 0 (unchanged) to 19 (lowest)
+				"io_class": None, # None (unchanged), "best-effort" or "idle", Linux only
+				"printing_niceness": 10, # used instead while the printer is printing
+				"printing_io_class": "best-effort",
+				"memory_limit": 0, # address space limit per engine in MB, 0 for unlimited
+				"timeout": 0, # maximum slicing time per job in seconds, 0 for unlimited
+				"watchdog_timeout": 300 # kill engines silent for longer than this many seconds, 0 to disable
+			},
+			"speculative": {
+				"enabled": False, # pre-slice uploaded STLs into the slicing cache
+				"profiles": [] # names of the profiles to pre-slice with, empty for the default profile
+			},
+			"remote": {
+				"enabled": False, # slice on remote workers (see cura_engine_common/worker.py), falls back to local slicing
+				"workers": [], # worker URLs, e.g. "http://slicer.local:8765"
+				"api_key": None,
+				"timeout": 10.0, # per request in seconds
+				"deadline": 600.0, # seconds a remote job may take before it's sliced locally instead, 0 for unlimited
+				"retry_interval": 60.0 # seconds before a failed worker is tried again
+			},
+			"persistent": {
+				"enabled": False, # requires pyArcus and NumPy and a CuraEngine supporting "connect"
+				"engines": 1, # engines kept running while idle
+				"health_check_interval": 10.0 # in seconds
+			}
 		}
 
+	def on_settings_save(self, data):
+		octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
+		self._update_engine_log()
+		self._update_slice_cache()
+		self._update_scheduler()
+		self._update_engine_pool()
+		self._update_worker_pool()
+
 	#~~ SlicerPlugin API
 
 	def is_slicer_configured(self):
@@ -111,7 +407,7 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 			type="cura_engine",
 			name="Cura Engine 15.10",
 			same_device=True,
-			progress_report=False
+			progress_report=True
 		)
 
 	def get_slicer_profile(self, path):
@@ -133,10 +429,26 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 		return octoprint.slicing.SlicingProfile(slicer_type, "unknown", profile_dict, display_name=display_name, description=description)
 
 	def get_slicer_default_profile(self):
-		profile_dict = get_profile_dict_from_json(os.path.join(self._basefolder, "profiles", "fdmprinter.json"))
+		profile_dict = self._definition.get_defaults()
 		slicer_type = self.get_slicer_properties()["type"]
 		return octoprint.slicing.SlicingProfile(slicer_type, "unknown", profile_dict, display_name="Default profile", description="Default profile for Cura Engine plugin")
 
+	def _load_profile_dict(self, profile_path=None):
+		"""
+		Loads the profile at ``profile_path``, ``None`` if it doesn't exist.
+
+		Without a path that's the profile selected as default for this slicer in OctoPrint or, if there is none, the
+		default profile of the definition - the same fallback OctoPrint's slicing manager uses.
+		"""
+
+		if not profile_path:
+			default_profiles = self._settings.global_get(["slicing", "defaultProfiles"]) or dict()
+			name = default_profiles.get("cura_engine")
+			if not name:
+				return self._definition.get_defaults()
+			profile_path = self._slicing_manager.get_profile_path("cura_engine", name)
+		return get_profile_dict_from_yaml(profile_path)
+
 	def save_slicer_profile(self, path, profile, allow_overwrite=True, overrides=None):
 		# TODO: Manage overrides
 		if os.path.exists(path) and not allow_overwrite:
@@ -148,59 +460,159 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 			profile_dict["_display_name"] = profile.display_name
 		if profile.description is not None:
 			profile_dict["_description"] = profile.description
-		
-		import yaml
-		with octoprint.util.atomic_write(path, "wb") as f:
-			yaml.safe_dump(profile_dict, f, default_flow_style=False, indent="  ", allow_unicode=True)
-
-	def do_slice(self, model_path, printer_profile, machinecode_path=None, profile_path=None, position=None, on_progress=None, on_progress_args=None, on_progress_kwargs=None):
-		try:
-			with self._job_mutex:
 
-				executable = normalize_path(self._settings.get(["cura_engine_path"]))
-				if not executable:
-					self._logger.error(u"Path to CuraEngine is not configured")
-					return False, "Path to CuraEngine is not configured"
+		save_profile_dict_to_yaml(path, profile_dict)
 
-				working_dir = os.path.dirname(executable)
+	def do_slice(self, model_path, printer_profile, machinecode_path=None, profile_path=None, position=None, on_progress=None, on_progress_args=None, on_progress_kwargs=None):
+		# somebody is waiting for this one (slicing from the UI or the API), it goes before batch jobs
+		return self._slice(model_path, printer_profile, machinecode_path=machinecode_path, profile_path=profile_path, position=position,
+		                   on_progress=on_progress, on_progress_args=on_progress_args, on_progress_kwargs=on_progress_kwargs,
+		                   priority=PRIORITY_HIGH)
 
-				if not profile_path:
-					profile_path = self._settings.get(["default_profile"])
-				profile_dict = get_profile_dict_from_yaml(profile_path)
+	def _slice(self, model_path, printer_profile, machinecode_path=None, profile_path=None, position=None, on_progress=None, on_progress_args=None, on_progress_kwargs=None,
+	           profile_dict=None, model=None, priority=PRIORITY_NORMAL):
+		"""
+		Slicing path behind ``do_slice``.
 
-				if "material_diameter" in profile_dict:
-					filament_diameter = float(profile_dict["material_diameter"])
-				else:
-					filament_diameter = None
+		Callers slicing several jobs at once (see ``BatchJob``) may pass an already loaded ``profile_dict`` (which will
+		be modified) and an already read ``model`` mesh to share that work between jobs.
+		"""
 
-				if on_progress:
-					if not on_progress_args:
-						on_progress_args = ()
-					if not on_progress_kwargs:
-						on_progress_kwargs = dict()
+		if not machinecode_path:
+			path, _ = os.path.splitext(model_path)
+			machinecode_path = path + ".gco"
 
-				command_args = self._build_command(executable, model_path, printer_profile, machinecode_path, profile_dict, position)
+		if profile_dict is None:
+			profile_dict = self._load_profile_dict(profile_path)
+			if profile_dict is None:
+				self._logger.error(u"Slicing profile %s doesn't exist" % profile_path)
+				return False, u"Slicing profile {} doesn't exist".format(profile_path)
 
-				self._logger.info(u"Running %r in %s" % (" ".join(command_args), working_dir))
+		try:
+			model_path, temporary_model_path = self._preprocess_model(model_path, printer_profile, profile_dict, position, model=model)
+		except ModelDoesNotFit as e:
+			self._logger.warn(u"Not slicing %s: %s" % (model_path, str(e)))
+			return False, str(e)
+
+		job = self._scheduler.submit(machinecode_path, priority=priority)
+		self._engine_log.bind(job.id)
+		timer = JobTimer(job.id)
+		timer.start("queue_wait")
+		outcome = "error"
+		try:
+			if not self._scheduler.wait_for_slot(job):
+				self._cura_engine_logger.info(u"### Cancelled while queued")
+				outcome = "preempted" if job.preempted else "cancelled"
+				raise octoprint.slicing.SlicingCancelled()
 
-				import sarge
-				p = sarge.run(command_args, cwd=working_dir, async=True, stdout=sarge.Capture(), stderr=sarge.Capture())
-				p.wait_events()
-				self._slicing_commands[machinecode_path] = p.commands[0]
+			timer.start("profile_load")
+			executable = normalize_path(self._settings.get(["cura_engine_path"]))
+			if not executable:
+				self._logger.error(u"Path to CuraEngine is not configured")
+				return False, "Path to CuraEngine is not configured"
 
-			returncode, analysis = self._parse_slicing_output(p, on_progress, on_progress_args, on_progress_kwargs, filament_diameter=filament_diameter)
+			working_dir = os.path.dirname(executable)
 
-			with self._job_mutex:
-				if machinecode_path in self._cancelled_jobs:
-					self._cura_engine_logger.info(u"### Cancelled")
-					raise octoprint.slicing.SlicingCancelled()
+			try:
+				self._check_profile(profile_dict)
+			except ProfileValidationError as e:
+				self._logger.warn(u"Not slicing %s, invalid profile: %s" % (model_path, str(e)))
+				outcome = "invalid"
+				return False, u"Invalid profile, {}".format(e)
+
+			if "material_diameter" in profile_dict:
+				filament_diameter = float(profile_dict["material_diameter"])
+			else:
+				filament_diameter = None
+
+			if on_progress:
+				if not on_progress_args:
+					on_progress_args = ()
+				if not on_progress_kwargs:
+					on_progress_kwargs = dict()
+
+			features = job_features(model_path, profile_dict)
+			job.predicted_duration = self._progress_model.predict(features)
+			reporter = self._create_progress_reporter(job, on_progress, on_progress_args, on_progress_kwargs)
+
+			slice_cache = self._slice_cache
+			cache_key = None
+			if slice_cache is not None:
+				timer.start("cache_lookup")
+				# key on what the engine gets to see, including the printer profile's volume
+				settings = dict(self._get_engine_settings(printer_profile, profile_dict))
+				cache_key = slice_cache.compute_key(model_path, settings, self._definition.digest, executable)
+				analysis = slice_cache.lookup(cache_key, machinecode_path)
+				if analysis is not None:
+					self._logger.info(u"Found slicing result for %s in cache, skipping CuraEngine" % model_path)
+					outcome = "cached"
+					return True, dict(analysis=analysis)
+
+			# only needed on a miss, building it may write the settings file
+			timer.start("command_build")
+			streaming = self._settings.get_boolean(["output", "streaming"])
+			command_args = self._build_command(executable, model_path, printer_profile, machinecode_path, profile_dict, position,
+			                                   stream_output=streaming)
+
+			watchdog = self._create_watchdog()
+			returncode = None
+			if self._worker_pool is not None:
+				returncode, analysis = self._slice_remote(self._worker_pool, job, timer, model_path, printer_profile, profile_dict, machinecode_path,
+				                                          reporter, filament_diameter)
+
+			# speculative jobs have to stay out of the way, run them at the lowest priority in a one-shot engine
+			if returncode is None and self._engine_pool is not None and not job.preemptible:
+				returncode, analysis = self._slice_persistent(self._engine_pool, job, timer, model_path, printer_profile, machinecode_path, profile_dict,
+				                                              reporter, filament_diameter, watchdog)
+
+			if returncode is None:
+				self._logger.info(u"Running job %s: %r in %s" % (job.id, " ".join(command_args), working_dir))
+
+				timer.start("spawn")
+				with open(os.devnull, "wb") as devnull:
+					p = subprocess.Popen(command_args, cwd=working_dir, stdout=subprocess.PIPE if streaming else devnull, stderr=subprocess.PIPE,
+					                     preexec_fn=self._get_engine_preexec(job.preemptible))
+				self._scheduler.attach_process(job, p)
+
+				output_thread = None
+				if streaming:
+					output_thread = self._start_output_streaming(job, p, machinecode_path)
+
+				# until the engine reports its first stage
+				timer.start("engine_startup")
+				returncode, analysis = self._parse_slicing_output(p, reporter=reporter, filament_diameter=filament_diameter,
+				                                                  timer=timer, watchdog=watchdog)
+
+				if output_thread is not None:
+					output_thread.join()
+					if output_thread.error is not None and returncode == 0:
+						self._logger.error(u"Could not write the machine code of job %s to %s: %s" % (job.id, machinecode_path, output_thread.error))
+						outcome = "failed"
+						return False, "Could not write the machine code"
+
+			if job.cancelled:
+				self._cura_engine_logger.info(u"### Cancelled")
+				outcome = "preempted" if job.preempted else "cancelled"
+				raise octoprint.slicing.SlicingCancelled()
 
 			self._cura_engine_logger.info(u"### Finished, returncode %d" % returncode)
 			if returncode == 0:
 				self._logger.info(u"Slicing complete.")
+				self._progress_model.learn(features, timer.phases)
+				timer.start("post_processing")
+				analysis = self._analyse_machinecode(machinecode_path, analysis, filament_diameter)
+				if cache_key is not None:
+					slice_cache.store(cache_key, machinecode_path, analysis)
+				outcome = "success"
 				return True, dict(analysis=analysis)
+			elif watchdog.reason is not None:
+				self._cura_engine_logger.info(u"### Killed, %s" % watchdog.reason)
+				self._logger.warn(u"Killed CuraEngine, %s" % watchdog.reason)
+				outcome = "killed"
+				return False, "Slicing aborted, {}".format(watchdog.reason)
 			else:
 				self._logger.warn(u"Could not slice via Cura, got return code %r" % returncode)
+				outcome = "failed"
 				return False, "Got return code %r" % returncode
 
 		except octoprint.slicing.SlicingCancelled as e:
@@ -210,79 +622,480 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 			return False, "Unknown error, please consult the log file"
 
 		finally:
-			with self._job_mutex:
-				if machinecode_path in self._cancelled_jobs:
-					self._cancelled_jobs.remove(machinecode_path)
-				if machinecode_path in self._slicing_commands:
-					del self._slicing_commands[machinecode_path]
-
+			self._scheduler.finish(job)
+			if temporary_model_path is not None:
+				os.remove(temporary_model_path)
+			self._record_metrics(timer, outcome)
 			self._cura_engine_logger.info("-" * 40)
+			self._engine_log.finish(job.id)
+
+	def _check_profile(self, profile_dict):
+		"""
+		Raises ``ProfileValidationError`` if ``profile_dict`` contains invalid settings, unless validation is disabled.
+		"""
+
+		if not self._settings.get_boolean(["validation", "enabled"]) or self._profile_validator is None:
+			return
+		self._profile_validator.check(profile_dict)
 
-	def _build_command(self, executable, model_path, printer_profile, machinecode_path, profile_dict, position):
+	def _record_metrics(self, timer, outcome):
+		timer.finish(outcome)
+		self._metrics.add(timer)
+
+		phases = ", ".join("%s %.3fs" % (name, duration) for name, duration in timer.phases.items())
+		self._cura_engine_logger.info(u"### Job %s %s after %.3fs: %s" % (timer.job_id, outcome, timer.total, phases))
+		if timer.cpu_time is not None:
+			self._cura_engine_logger.info(u"### Engine CPU time %.3fs, peak RSS %.1f MB" % (timer.cpu_time, timer.peak_rss / (1024.0 * 1024.0)))
+
+	def _slice_remote(self, pool, job, timer, model_path, printer_profile, profile_dict, machinecode_path, reporter, filament_diameter):
+		"""
+		Slices on the least loaded remote worker of ``pool``, moving on to the next one if a worker can't be reached.
+
+		Returns the return code and analysis like ``_parse_slicing_output``, ``(None, None)`` if no worker could
+		slice the job and it has to be sliced locally instead.
+		"""
+
+		settings = self._get_engine_settings(printer_profile, profile_dict)
+
+		timer.start("remote_select")
+		for worker in pool.get_candidates():
+			if job.cancelled:
+				return -1, dict()
+
+			pool.assign(worker)
+			try:
+				timer.start("remote_upload")
+				try:
+					remote_id = worker.submit(settings, model_path)
+				except RemoteWorkerError as e:
+					pool.mark_failed(worker, e)
+					continue
+
+				self._logger.info(u"Running job %s on remote worker %s as %s" % (job.id, worker.url, remote_id))
+				try:
+					timer.start("remote_slice")
+					status = self._wait_for_remote_job(worker, remote_id, job, reporter,
+					                                   deadline=self._settings.get_float(["remote", "deadline"]))
+					if job.cancelled:
+						return -1, dict()
+
+					if status is None:
+						self._logger.warn(u"Remote worker %s did not finish job %s in time, slicing locally" % (worker.url, job.id))
+						return None, None
+
+					if status["state"] != "done":
+						self._logger.warn(u"Remote worker %s could not slice job %s: %s" % (worker.url, job.id, status.get("error")))
+						return status.get("returncode") or -1, dict()
+
+					timer.start("remote_download")
+					worker.download(remote_id, machinecode_path)
+				except RemoteWorkerError as e:
+					if job.cancelled:
+						return -1, dict()
+					pool.mark_failed(worker, e)
+					continue
+				finally:
+					timer.stop()
+					worker.remove(remote_id)
+			finally:
+				pool.unassign(worker)
+
+			analysis = dict()
+			if status.get("printTime") is not None:
+				analysis["estimatedPrintTime"] = status["printTime"]
+			if status.get("filamentVolume") is not None and filament_diameter is not None:
+				analysis["filament"] = {"tool0": _filament_usage(status["filamentVolume"], filament_diameter)}
+			return 0, analysis
+
+		self._logger.warn(u"No remote worker available for job %s, slicing locally" % job.id)
+		return None, None
+
+	def _wait_for_remote_job(self, worker, remote_id, job, reporter, deadline=None):
+		"""
+		Polls the job until it's no longer queued or running. Returns its last status, ``None`` if it took longer than
+		``deadline`` seconds.
+		"""
+
+		import time
+
+		started = time.time()
+		while True:
+			status = worker.get_job(remote_id)
+			if status.get("stage") is not None and status.get("total"):
+				reporter.update(status["stage"], float(status["current"]) / status["total"])
+			elif status.get("progress"):
+				reporter.update(None, status["progress"])
+
+			if status["state"] not in ("queued", "running") or job.cancelled:
+				reporter.flush()
+				return status
+			if deadline and time.time() - started > deadline:
+				return None
+			time.sleep(0.5)
+
+	def _slice_persistent(self, pool, job, timer, model_path, printer_profile, machinecode_path, profile_dict,
+	                      reporter, filament_diameter, watchdog):
+		"""
+		Slices on one of the persistent engines of ``pool``.
+
+		Returns the return code and analysis like ``_parse_slicing_output``, ``(None, None)`` if the job has to be
+		sliced by a one-shot engine instead.
+		"""
+
+		if not model_path.lower().endswith(".stl"):
+			return None, None
+
+		try:
+			model = mesh.read_stl(model_path)
+		except:
+			self._logger.exception(u"Could not read %s for the persistent engine, starting a one-shot engine instead" % model_path)
+			return None, None
+
+		# a persistent engine keeps the settings of earlier jobs, so every job has to send all of them
+		settings = self._get_effective_settings(printer_profile, profile_dict)
+
+		timer.start("engine_connect")
+		try:
+			connection = pool.acquire()
+		except persistent.EngineConnectionError as e:
+			self._logger.warn(u"No persistent engine available (%s), starting a one-shot engine instead" % str(e))
+			return None, None
+
+		try:
+			if not self._scheduler.attach_process(job, connection.process):
+				return -1, dict()
+
+			self._logger.info(u"Running job %s on persistent engine (pid %s)" % (job.id, connection.process.pid))
+
+			timer.start("engine_persistent")
+			try:
+				result = connection.slice(settings, model.triangles, machinecode_path,
+				                          on_progress=lambda progress: reporter.update(None, progress),
+				                          watchdog=watchdog)
+			except persistent.EngineConnectionError as e:
+				if job.cancelled or watchdog.reason is not None:
+					return -1, dict()
+				self._logger.warn(u"Persistent engine failed (%s), starting a one-shot engine instead" % str(e))
+				return None, None
+			finally:
+				timer.stop()
+
+			reporter.flush()
+		finally:
+			pool.release(connection)
+
+		analysis = dict()
+		if "time" in result:
+			analysis["estimatedPrintTime"] = result["time"]
+		if "material" in result and filament_diameter is not None:
+			analysis["filament"] = {"tool0": _filament_usage(result["material"], filament_diameter)}
+		return 0, analysis
+
+	def _preprocess_model(self, model_path, printer_profile, profile_dict, position, model=None):
+		"""
+		Checks the model against the print volume, applies ``position`` and decimates oversized meshes.
+
+		``position`` is in printer coordinates, a positioned model is written in the engine's frame for the settings
+		of ``profile_dict`` (see ``mesh.to_engine_frame``).
+
+		Returns the path of the model to slice plus the path of a temporary preprocessed copy that has to be removed
+		after slicing, ``None`` if the original model can be used as is. Raises ``ModelDoesNotFit`` if the model can
+		never be printed on the printer.
+		"""
+
+		if model is None:
+			model = self._read_model(model_path)
+			if model is None:
+				return model_path, None
+
+		changed = False
+		if position:
+			model = mesh.place_on_bed(model, position)
+			changed = True
+
+		mesh.check_fits(model, printer_profile["volume"], positioned=bool(position))
+		if position:
+			model = mesh.to_engine_frame(model, printer_profile["volume"], center_is_zero=self._is_center_zero(profile_dict))
+
+		max_triangles = self._settings.get_int(["mesh", "max_triangles"])
+		if max_triangles and len(model) > max_triangles:
+			triangles = len(model)
+			model = model.decimated(max_triangles)
+			changed = True
+			self._logger.info(u"Decimated %s from %d to %d triangles" % (model_path, triangles, len(model)))
+
+		if not changed:
+			return model_path, None
+
+		import tempfile
+		fd, temporary_model_path = tempfile.mkstemp(suffix=".stl")
+		os.close(fd)
+		model.write_stl(temporary_model_path)
+		return temporary_model_path, temporary_model_path
+
+	def _is_center_zero(self, profile_dict):
+		"""
+		Whether the engine leaves meshes where they are instead of moving their origin to the center of the bed.
+		"""
+
+		value = profile_dict.get("machine_center_is_zero")
+		if value is None:
+			setting = self._definition.get("machine_center_is_zero")
+			value = setting["default"] if setting is not None else False
+		return u"{}".format(value).strip().lower() in BOOLEAN_TRUES
+
+	def _read_model(self, model_path):
+		"""
+		Reads the mesh of an STL model for preprocessing, ``None`` if preprocessing is disabled or impossible.
+		"""
+
+		if not self._settings.get_boolean(["mesh", "preprocess"]) or not mesh.is_available():
+			return None
+		if not model_path.lower().endswith(".stl"):
+			return None
+
+		try:
+			return mesh.read_stl(model_path)
+		except:
+			self._logger.exception(u"Could not read %s for preprocessing, passing it to the engine as is" % model_path)
+			return None
+
+	def _analyse_machinecode(self, machinecode_path, analysis, filament_diameter):
+		if not self._settings.get_boolean(["analysis", "enabled"]) or not gcode_analysis.is_available():
+			return analysis
+
+		try:
+			result = gcode_analysis.analyse_gcode(machinecode_path, filament_diameter=filament_diameter)
+		except:
+			self._logger.exception(u"Could not analyse sliced machine code %s" % machinecode_path)
+			return analysis
+
+		# the engine knows best about print time and its own filament usage, keep its values where present
+		filament = result["filament"]
+		filament.update(analysis.get("filament", dict()))
+		result.update(analysis)
+		result["filament"] = filament
+		return result
+
+	def _build_command(self, executable, model_path, printer_profile, machinecode_path, profile_dict, position, stream_output=False):
 		if not machinecode_path:
 			path, _ = os.path.splitext(model_path)
 			machinecode_path = path + ".gco"
 
-		# Overwrite the machine size with the data from the printer_profile
-		profile_dict["machine_width"] = printer_profile["volume"]["width"]
-		profile_dict["machine_depth"] = printer_profile["volume"]["depth"]
-		profile_dict["machine_height"] = printer_profile["volume"]["height"]
+		settings = self._get_engine_settings(printer_profile, profile_dict)
+		definition_path = self._get_definition_path()
+
+		if self._settings.get(["engine_settings"]) == "minimal":
+			# Only pass what differs from the definition's defaults, larger sets of overrides are baked into a
+			# generated copy of the definition instead of the command line
+			settings = self._get_overridden_settings(settings)
+			threshold = self._settings.get_int(["engine_settings_file_threshold"])
+			if threshold and len(settings) > threshold:
+				known = [(key, value) for key, value in settings if key in self._definition.settings]
+				definition_path = self._get_settings_file(known)
+				settings = [(key, value) for key, value in settings if key not in self._definition.settings]
 
 		# CuraEngine Usage: <executable_path> slice -v -p -j <fdmprinter_json_path> -s <setting=value> -l <stl_model_path> -o <output_gcode_path>
 		command_args = [executable, 'slice', '-v', '-p']
-		command_args += ['-j', '{path}'.format(path=os.path.join(self._basefolder, "profiles", "fdmprinter.json"))]
-		for key, value in profile_dict.items():
-			# Ignore internal settings
-			if key[0] != '_':
-				command_args += ['-s', '{k}={v}'.format(k=key, v=value)]
+		command_args += ['-j', '{path}'.format(path=definition_path)]
+		for key, value in settings:
+			command_args += ['-s', '{k}={v}'.format(k=key, v=value)]
 		command_args += ['-l', '{path}'.format(path=model_path)]
-		command_args += ['-o', '{path}'.format(path=machinecode_path)]
+		if not stream_output:
+			# without an output file the engine writes the machine code to stdout
+			command_args += ['-o', '{path}'.format(path=machinecode_path)]
 
 		return command_args
 
-	def _parse_slicing_output(self, p, on_progress, on_progress_args, on_progress_kwargs, filament_diameter=None):
-		analysis = dict()
-		while p.returncode is None:
-			line = p.stderr.readline(timeout=0.5)
-			if not line:
-				p.commands[0].poll()
-				continue
-			self._cura_engine_logger.debug(line.strip())
+	def _get_engine_settings(self, printer_profile, profile_dict):
+		# Overwrite the machine size with the data from the printer_profile
+		profile_dict["machine_width"] = printer_profile["volume"]["width"]
+		profile_dict["machine_depth"] = printer_profile["volume"]["depth"]
+		profile_dict["machine_height"] = printer_profile["volume"]["height"]
 
-			if "Progress" in line:
-				try:
-					on_progress_kwargs["_progress"] = float(line.split(' ')[-1].strip()[:-1])
-				except:
-					self._cura_engine_logger.exception("Unable to parse progress from engine output")
-				else:
-					on_progress(*on_progress_args, **on_progress_kwargs)
-
-			elif "Print time: " in line:
-				analysis["estimatedPrintTime"] = line[line.find("Print time: ")+len("Print time: "):]
-			elif "Filament: " in line and filament_diameter is not None:
-				import math
-				# CuraEngine expresses the usage volume in mm^3
-				# usage_volume should be expressed in cm^3
-				# usage_length should be expressed in mm
-				try:
-					usage_volume = float(line[line.find("Filament: ")+len("Filament: "):]) / 1000
-				except:
-					self._cura_engine_logger.exception("Unable to parse filament usage from engine output")
-				else:
-					usage_length = (usage_volume * 1000) / (math.pi * (filament_diameter / 2) ** 2)
-					analysis["filament"] = {"tool0": {"volume": usage_volume, "length": usage_length}}
+		# Ignore internal settings
+		return [(key, value) for key, value in profile_dict.items() if key[0] != '_']
+
+	def _get_effective_settings(self, printer_profile, profile_dict):
+		"""
+		Every setting of the definition with the values of the profile and printer profile applied, plus any settings
+		of the profile unknown to the definition.
+		"""
+
+		settings = self._definition.get_defaults()
+		settings.update(self._get_engine_settings(printer_profile, profile_dict))
+		return sorted(settings.items())
+
+	def _get_definition_path(self):
+		return os.path.join(self._basefolder, "profiles", "fdmprinter.json")
+
+	def _get_overridden_settings(self, settings):
+		overridden = []
+		for key, value in settings:
+			setting = self._definition.get(key)
+			if setting is None or u"{}".format(setting["default"]) != u"{}".format(value):
+				overridden.append((key, value))
+		return overridden
+
+	def _get_settings_file(self, settings):
+		"""
+		Returns the path to a copy of the definition with ``settings`` as its defaults, generating it if necessary.
+		"""
+
+		import hashlib
+		settings_hash = hashlib.sha1(json.dumps(sorted(settings), default=str).encode("utf-8"))
+		settings_hash.update(self._definition.digest.encode("ascii"))
+
+		folder = os.path.join(self.get_plugin_data_folder(), "settings")
+		path = os.path.join(folder, settings_hash.hexdigest() + ".json")
+		if os.path.exists(path):
+			os.utime(path, None)
+			return path
+
+		if not os.path.isdir(folder):
+			os.makedirs(folder)
+		self._definition.write_with_defaults(path, dict(settings))
+
+		# keep only the most recently used settings files around
+		files = sorted((os.path.join(folder, name) for name in os.listdir(folder)), key=os.path.getmtime, reverse=True)
+		for old_path in files[self.MAX_SETTINGS_FILES:]:
+			try:
+				os.remove(old_path)
+			except OSError:
+				pass
+
+		return path
+
+	def _parse_slicing_output(self, p, reporter=None, filament_diameter=None, timer=None, watchdog=None):
+		analysis = dict()
 
-		p.close()
+		if watchdog is not None:
+			watchdog.watch(p)
+
+		sampler = LineSampler(progress_rate=self._settings.get_float(["logging", "progress_rate"]),
+		                      verbose=self._settings.get_boolean(["logging", "verbose"]))
+		reader = EngineOutputReader(p.stderr)
+		while True:
+			lines = reader.read_lines(timeout=0.5)
+			if lines is None:
+				break
+
+			if watchdog is not None:
+				if lines:
+					watchdog.feed()
+				# once killed the pipe gets closed, which ends the loop
+				watchdog.check()
+
+			for line in lines:
+				level = sampler.get_level(line)
+				if level is not None:
+					self._cura_engine_logger.log(level, line.strip())
+
+				if line.startswith("Progress"):
+					match = PROGRESS_PATTERN.match(line)
+					if match is None:
+						self._cura_engine_logger.warn("Unable to parse progress from engine output")
+						continue
+					if timer is not None:
+						timer.start_engine_stage(match.group("stage"))
+					if reporter is not None:
+						if match.group("total"):
+							reporter.update(match.group("stage"), float(match.group("current")) / max(int(match.group("total")), 1))
+						else:
+							# older engines only report the overall progress
+							reporter.update(None, float(match.group("progress")))
+					continue
+
+				match = PRINT_TIME_PATTERN.search(line)
+				if match is not None:
+					analysis["estimatedPrintTime"] = match.group("time")
+					continue
+
+				match = FILAMENT_PATTERN.search(line)
+				if match is not None and filament_diameter is not None:
+					analysis["filament"] = {"tool0": _filament_usage(float(match.group("volume")), filament_diameter)}
+
+		if reporter is not None:
+			reporter.flush()
+
+		p.stderr.close()
+		rusage = wait_for_process(p)
+		if timer is not None:
+			timer.stop()
+			timer.set_resource_usage(rusage)
 		return p.returncode, analysis
 
+	def _start_output_streaming(self, job, p, machinecode_path):
+		"""
+		Copies the machine code the engine writes to stdout into ``machinecode_path`` in a separate thread, announcing
+		every layer once it's on disk, so it can already be read (e.g. uploaded elsewhere) while slicing goes on.
+
+		Any error writing the file ends up in the returned thread's ``error``.
+		"""
+
+		import threading
+
+		def on_layer(layer, size):
+			self._plugin_manager.send_plugin_message(self._identifier, dict(type="slicing_layer",
+			                                                                 job=job.id,
+			                                                                 path=machinecode_path,
+			                                                                 layer=layer,
+			                                                                 size=size))
+
+		def stream():
+			try:
+				sink = LayerSink(machinecode_path, on_layer=on_layer)
+				try:
+					fd = p.stdout.fileno()
+					while True:
+						data = os.read(fd, 64 * 1024)
+						if not data:
+							break
+						sink.write(data)
+				finally:
+					sink.close()
+			except Exception as e:
+				thread.error = e
+				# keep draining so the engine doesn't block on a full pipe
+				for _ in iter(lambda: p.stdout.read(64 * 1024), b""):
+					pass
+			finally:
+				p.stdout.close()
+
+		thread = threading.Thread(target=stream, name="CuraEngineStdout-{}".format(job.id))
+		thread.daemon = True
+		thread.error = None
+		thread.start()
+		return thread
+
+	def _create_progress_reporter(self, job, on_progress, on_progress_args, on_progress_kwargs):
+		"""
+		Reports the monotonic overall progress (0 to 1) to ``on_progress`` and, together with the ETA, on ``job`` and to
+		the frontend.
+		"""
+
+		def report_progress(progress, eta):
+			if on_progress:
+				on_progress_kwargs["_progress"] = progress
+				on_progress(*on_progress_args, **on_progress_kwargs)
+
+			if job is not None:
+				job.progress = progress
+				job.eta = eta
+				self._plugin_manager.send_plugin_message(self._identifier, dict(type="slicing_progress",
+				                                                                 job=job.id,
+				                                                                 path=job.machinecode_path,
+				                                                                 progress=progress,
+				                                                                 eta=eta))
+
+		return ProgressReporter(report_progress, self._progress_model.get_stage_weights(),
+		                        predicted_duration=job.predicted_duration if job is not None else None,
+		                        max_rate=self._settings.get_float(["progress_max_rate"]))
+
 	def cancel_slicing(self, machinecode_path):
-		with self._job_mutex:
-			if machinecode_path in self._slicing_commands:
-				self._cancelled_jobs.append(machinecode_path)
-				command = self._slicing_commands[machinecode_path]
-				if command is not None:
-					command.terminate()
-				self._logger.info(u"Cancelled slicing of %s" % machinecode_path)
+		job_ids = self._scheduler.cancel_by_path(machinecode_path)
+		if job_ids:
+			self._logger.info(u"Cancelled slicing of %s (jobs %s)" % (machinecode_path, ", ".join(job_ids)))
 
 	##~~ BlueprintPlugin API
 
@@ -360,27 +1173,432 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 		r.headers["Location"] = result["resource"]
 		return r
 
+	@octoprint.plugin.BlueprintPlugin.route("/import/bulk", methods=["POST"])
+	def import_cura_engine_profiles(self):
+		"""
+		Imports many Cura JSON profiles at once, uploaded as several files and/or as ZIP or TAR archives.
+
+		All profiles are converted in parallel and validated before any of them is saved, then they are saved all or
+		none. The response reports the outcome per profile.
+		"""
+
+		import datetime
+
+		input_name = "file"
+		input_upload_name = input_name + "." + self._settings.global_get(["server", "uploads", "nameSuffix"])
+		input_upload_path = input_name + "." + self._settings.global_get(["server", "uploads", "pathSuffix"])
+
+		filenames = flask.request.values.getlist(input_upload_name)
+		paths = flask.request.values.getlist(input_upload_path)
+		if not filenames or len(filenames) != len(paths):
+			self._logger.warn("No profile files included for importing, aborting")
+			return flask.make_response("No file included", 400)
+
+		items = []
+		for filename, path in zip(filenames, paths):
+			try:
+				items += importer.read_items(filename, path)
+			except Exception as e:
+				self._logger.exception("Error while reading the imported file %s" % filename)
+				return flask.make_response("Could not read {filename}: {message}".format(filename=filename, message=str(e)), 400)
+		if not items:
+			return flask.make_response("No profiles found in the uploaded files", 400)
+
+		from octoprint.server.api import valid_boolean_trues
+		allow_overwrite = flask.request.values.get("allowOverwrite") in valid_boolean_trues
+		date = octoprint.util.get_formatted_datetime(datetime.datetime.now())
+
+		importer.convert_items(items, get_profile_dict_from_json_data)
+		self._validate_imported_profiles(items, allow_overwrite)
+
+		failed = [item for item in items if item.state == "failed"]
+		if failed:
+			# all or nothing
+			for item in items:
+				if item.state != "failed":
+					item.state = "skipped"
+			status = 409 if all(item.conflict for item in failed) else 400
+			return flask.make_response(flask.jsonify(dict(profiles=[item.as_dict() for item in items])), status)
+
+		try:
+			self._commit_imported_profiles(items, date)
+		except Exception as e:
+			self._logger.exception("Error while saving imported profiles, rolled back")
+			for item in items:
+				if item.state != "failed":
+					item.state = "rolled back"
+			report = dict(profiles=[item.as_dict() for item in items], error=str(e))
+			return flask.make_response(flask.jsonify(report), 500)
+
+		self._logger.info(u"Imported %d profiles" % len(items))
+		return flask.make_response(flask.jsonify(dict(profiles=[item.as_dict() for item in items])), 201)
+
+	def _validate_imported_profiles(self, items, allow_overwrite):
+		names = set()
+		for item in items:
+			if item.state == "failed":
+				continue
+
+			try:
+				item.name = _sanitize_name(item.display_name)
+			except ValueError as e:
+				item.fail(str(e))
+				continue
+
+			known = sum(1 for key in item.profile_dict if key in self._definition.settings)
+			invalid = None
+			try:
+				self._check_profile(item.profile_dict)
+			except ProfileValidationError as e:
+				invalid = e
+
+			if not item.name:
+				item.fail("Profile has no usable name")
+			elif not known:
+				item.fail("Profile contains no settings known to the definition")
+			elif invalid is not None:
+				item.fail(u"Invalid settings: {}".format(invalid))
+			elif item.name in names:
+				item.fail("Another imported profile is named {name} as well".format(name=item.name))
+			elif not allow_overwrite and os.path.exists(self._slicing_manager.get_profile_path("cura_engine", item.name)):
+				item.fail("A profile named {name} already exists".format(name=item.name), conflict=True)
+			names.add(item.name)
+
+	def _commit_imported_profiles(self, items, date):
+		"""
+		Saves all ``items``. If any of them can't be saved, the profiles saved so far are removed again and the ones
+		they replaced are restored before the error is raised.
+		"""
+
+		saved = []
+		try:
+			for item in items:
+				path = self._slicing_manager.get_profile_path("cura_engine", item.name)
+				backup = None
+				if os.path.exists(path):
+					with open(path, "rb") as f:
+						backup = f.read()
+				saved.append((path, backup))
+
+				self._slicing_manager.save_profile("cura_engine",
+				                                   item.name,
+				                                   item.profile_dict,
+				                                   allow_overwrite=True,
+				                                   display_name=item.display_name,
+				                                   description="Imported from {filename} on {date}".format(filename=item.filename, date=date))
+				item.state = "imported"
+		except:
+			for path, backup in reversed(saved):
+				try:
+					if backup is None:
+						if os.path.exists(path):
+							os.remove(path)
+					else:
+						with octoprint.util.atomic_write(path, "wb") as f:
+							f.write(backup)
+				except:
+					self._logger.exception(u"Could not roll back imported profile %s" % path)
+				_profile_cache.invalidate(path)
+			raise
+
+	# Batch slicing
+	@octoprint.plugin.BlueprintPlugin.route("/batch", methods=["POST"])
+	def start_batch(self):
+		from octoprint.filemanager.destinations import FileDestinations
+
+		data = flask.request.json or dict()
+		models = data.get("models") or []
+		profiles = data.get("profiles") or [None]
+		position = data.get("position")
+
+		if not models:
+			return flask.make_response("No models to slice included in request", 400)
+		if len(models) > 1 and len(profiles) > 1:
+			return flask.make_response("A batch slices either many models with one profile or one model with many profiles", 400)
+
+		if "printerProfile" in data:
+			printer_profile = self._printer_profile_manager.get(data["printerProfile"])
+		else:
+			printer_profile = self._printer_profile_manager.get_current_or_default()
+		if printer_profile is None:
+			return flask.make_response("Unknown printer profile {profile}".format(profile=data.get("printerProfile")), 404)
+
+		# Everything shared between the items is only done once per batch: one profile load per profile and one mesh
+		# read per model
+		profile_dicts = dict()
+		for profile in profiles:
+			profile_path = self._slicing_manager.get_profile_path("cura_engine", profile) if profile is not None else None
+			profile_dict = self._load_profile_dict(profile_path)
+			if profile_dict is None:
+				return flask.make_response("Unknown slicing profile {profile}".format(profile=profile), 404)
+			profile_dicts[profile] = profile_dict
+
+		model_paths = dict()
+		for model in models:
+			if not self._file_manager.file_exists(FileDestinations.LOCAL, model):
+				return flask.make_response("Unknown model {model}".format(model=model), 404)
+			model_paths[model] = self._file_manager.path_on_disk(FileDestinations.LOCAL, model)
+		meshes = dict((model, self._read_model(path)) for model, path in model_paths.items())
+
+		items = []
+		for model in models:
+			name, _ = os.path.splitext(model)
+			for profile in profiles:
+				if len(profiles) > 1:
+					output = u"{name}_{profile}.gco".format(name=name, profile=profile or "default")
+				else:
+					output = name + u".gco"
+				items.append(BatchItem(len(items), model, profile, output))
+
+		def slice_item(batch, item):
+			self._slice_batch_item(batch, item, model_paths, printer_profile, position, profile_dicts, meshes)
+
+		batch = BatchJob(items, slice_item, workers=self._scheduler.slots)
+		with self._batch_mutex:
+			self._prune_batches()
+			self._batches[batch.id] = batch
+		batch.start()
+
+		r = flask.make_response(flask.jsonify(batch.as_dict()), 202)
+		r.headers["Location"] = flask.url_for("plugin.cura_engine.get_batch", batch_id=batch.id, _external=True)
+		return r
+
+	def _slice_batch_item(self, batch, item, model_paths, printer_profile, position, profile_dicts, meshes):
+		import tempfile
+		from octoprint.filemanager.destinations import FileDestinations
+		from octoprint.filemanager.util import DiskFileWrapper
+
+		def on_item_progress(_progress=None):
+			item.progress = _progress
+			self._plugin_manager.send_plugin_message(self._identifier, dict(type="batch_progress",
+			                                                                 batch=batch.id,
+			                                                                 progress=batch.progress,
+			                                                                 item=item.as_dict()))
+
+		fd, item.machinecode_path = tempfile.mkstemp(suffix=".gco")
+		os.close(fd)
+
+		item.state = "slicing"
+		try:
+			ok, result = self._slice(model_paths[item.model], printer_profile,
+			                         machinecode_path=item.machinecode_path,
+			                         position=position,
+			                         on_progress=on_item_progress,
+			                         profile_dict=copy_profile(profile_dicts[item.profile]),
+			                         model=meshes[item.model],
+			                         priority=PRIORITY_LOW)
+			if ok:
+				self._file_manager.add_file(FileDestinations.LOCAL, item.output,
+				                            DiskFileWrapper(os.path.basename(item.output), item.machinecode_path),
+				                            allow_overwrite=True)
+				item.analysis = result["analysis"]
+				item.progress = 1.0
+				item.state = "done"
+			else:
+				item.error = result
+				item.state = "failed"
+		except octoprint.slicing.SlicingCancelled:
+			item.state = "cancelled"
+		finally:
+			if os.path.exists(item.machinecode_path):
+				os.remove(item.machinecode_path)
+
+		self._plugin_manager.send_plugin_message(self._identifier, dict(type="batch_progress",
+		                                                                 batch=batch.id,
+		                                                                 progress=batch.progress,
+		                                                                 item=item.as_dict()))
+
+	# Plates
+	@octoprint.plugin.BlueprintPlugin.route("/plate", methods=["POST"])
+	def start_plate(self):
+		"""
+		Packs several models (repeat a model for several copies of it) onto the bed and slices them in one engine run,
+		as a batch of one item.
+		"""
+
+		from octoprint.filemanager.destinations import FileDestinations
+
+		data = flask.request.json or dict()
+		models = data.get("models") or []
+		profile = data.get("profile")
+
+		if not models:
+			return flask.make_response("No models to slice included in request", 400)
+		if not mesh.is_available():
+			return flask.make_response("Packing plates requires NumPy", 501)
+
+		if "printerProfile" in data:
+			printer_profile = self._printer_profile_manager.get(data["printerProfile"])
+		else:
+			printer_profile = self._printer_profile_manager.get_current_or_default()
+		if printer_profile is None:
+			return flask.make_response("Unknown printer profile {profile}".format(profile=data.get("printerProfile")), 404)
+
+		profile_path = self._slicing_manager.get_profile_path("cura_engine", profile) if profile is not None else None
+		profile_dict = self._load_profile_dict(profile_path)
+		if profile_dict is None:
+			return flask.make_response("Unknown slicing profile {profile}".format(profile=profile), 404)
+
+		meshes = dict()
+		for model in models:
+			if model in meshes:
+				continue
+			if not self._file_manager.file_exists(FileDestinations.LOCAL, model) or not model.lower().endswith(".stl"):
+				return flask.make_response("Unknown STL model {model}".format(model=model), 404)
+			try:
+				meshes[model] = mesh.read_stl(self._file_manager.path_on_disk(FileDestinations.LOCAL, model))
+			except mesh.MeshError as e:
+				return flask.make_response(str(e), 400)
+
+		settings = self._definition.get_defaults()
+		settings.update(profile_dict)
+		try:
+			plate, placements = packing.arrange([meshes[model] for model in models], printer_profile["volume"],
+			                                    spacing=self._settings.get_float(["plate", "spacing"]),
+			                                    margin=packing.get_adhesion_margin(settings),
+			                                    disallowed_areas=settings.get("machine_disallowed_areas"),
+			                                    allow_rotation=self._settings.get_boolean(["plate", "rotate"]))
+		except ModelDoesNotFit as e:
+			return flask.make_response(str(e), 409)
+
+		# the parts are placed in printer coordinates, the engine gets the plate in its own frame
+		plate = mesh.to_engine_frame(plate, printer_profile["volume"], center_is_zero=self._is_center_zero(settings))
+
+		name, _ = os.path.splitext(models[0])
+		output = data.get("output") or u"{name}_plate.gco".format(name=name)
+		item = BatchItem(0, u", ".join(models), profile, output)
+
+		def slice_plate(batch, item):
+			import tempfile
+			fd, plate_path = tempfile.mkstemp(suffix=".stl")
+			os.close(fd)
+			try:
+				plate.write_stl(plate_path)
+				self._slice_batch_item(batch, item, {item.model: plate_path}, printer_profile, None,
+				                       {profile: profile_dict}, {item.model: plate})
+			finally:
+				os.remove(plate_path)
+
+		batch = BatchJob([item], slice_plate)
+		with self._batch_mutex:
+			self._prune_batches()
+			self._batches[batch.id] = batch
+		batch.start()
+
+		result = batch.as_dict()
+		result["placements"] = [dict(model=model, x=x, y=y, rotated=rotated) for model, (x, y, rotated) in zip(models, placements)]
+		r = flask.make_response(flask.jsonify(result), 202)
+		r.headers["Location"] = flask.url_for("plugin.cura_engine.get_batch", batch_id=batch.id, _external=True)
+		return r
+
+	@octoprint.plugin.BlueprintPlugin.route("/batch/<batch_id>", methods=["GET"])
+	def get_batch(self, batch_id):
+		with self._batch_mutex:
+			batch = self._batches.get(batch_id)
+		if batch is None:
+			return flask.make_response("Unknown batch {batch_id}".format(batch_id=batch_id), 404)
+		return flask.jsonify(batch.as_dict())
+
+	@octoprint.plugin.BlueprintPlugin.route("/batch/<batch_id>", methods=["DELETE"])
+	def cancel_batch(self, batch_id):
+		with self._batch_mutex:
+			batch = self._batches.get(batch_id)
+		if batch is None:
+			return flask.make_response("Unknown batch {batch_id}".format(batch_id=batch_id), 404)
+
+		batch.cancel()
+		for item in batch.items:
+			if item.state == "slicing":
+				self._scheduler.cancel_by_path(item.machinecode_path)
+		self._logger.info(u"Cancelled slicing batch %s" % batch_id)
+		return NO_CONTENT
+
+	def _prune_batches(self):
+		finished = sorted((batch for batch in self._batches.values() if batch.finished_at is not None),
+		                  key=lambda batch: batch.finished_at)
+		for batch in finished[:-self.MAX_FINISHED_BATCHES]:
+			del self._batches[batch.id]
+
+	# Slicing jobs
+	@octoprint.plugin.BlueprintPlugin.route("/jobs", methods=["GET"])
+	def get_slicing_jobs(self):
+		return flask.jsonify(dict(jobs=self._scheduler.get_jobs()))
+
+	@octoprint.plugin.BlueprintPlugin.route("/jobs/<job_id>", methods=["DELETE"])
+	def cancel_slicing_job(self, job_id):
+		if not self._scheduler.cancel(job_id):
+			return flask.make_response("Unknown slicing job {job_id}".format(job_id=job_id), 404)
+		self._logger.info(u"Cancelled slicing job %s" % job_id)
+		return NO_CONTENT
+
+	# Slicing cache
+	@octoprint.plugin.BlueprintPlugin.route("/cache", methods=["GET"])
+	def get_cache_stats(self):
+		if self._slice_cache is None:
+			return flask.jsonify(dict(enabled=False))
+		return flask.jsonify(dict(enabled=True, **self._slice_cache.get_stats()))
+
+	@octoprint.plugin.BlueprintPlugin.route("/cache", methods=["DELETE"])
+	def invalidate_cache(self):
+		if self._slice_cache is not None:
+			self._slice_cache.invalidate()
+		return NO_CONTENT
+
+	# Job metrics
+	@octoprint.plugin.BlueprintPlugin.route("/metrics", methods=["GET"])
+	def get_metrics(self):
+		if flask.request.values.get("format", "json") == "prometheus":
+			response = flask.make_response(self._metrics.as_prometheus(), 200)
+			response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+			return response
+		return flask.jsonify(self._metrics.as_dict())
+
 	# Profile editor
 	@octoprint.plugin.BlueprintPlugin.route("/getProfileEditorStruct", methods=["GET"])
 	def get_profile_editor_structure(self):
+		body, gzipped, etag = self._get_editor_struct_payload()
+		return _cacheable_response(body, etag, gzipped=gzipped)
+
+	def _get_editor_struct_payload(self):
+		digest = self._definition.digest
+		payload = self._editor_struct_payload
+		if payload is not None and payload[0] == digest:
+			return payload[1:]
+
 		# Filter out the non-editable settings
-		profile_editor_struct = self._profile_struct.copy()
-		for category in profile_editor_struct.keys():
-			for setting in profile_editor_struct[category]:
+		profile_editor_struct = self._definition.get_profile_struct()
+		for category in list(profile_editor_struct.keys()):
+			for setting in list(profile_editor_struct[category]):
 				if setting not in editable_profile_settings:
 					del profile_editor_struct[category][setting]
 			if len(profile_editor_struct[category].keys()) == 0:
 				del profile_editor_struct[category]
 
-		return flask.make_response(json.dumps(profile_editor_struct), 200)
+		import hashlib
+
+		body = json.dumps(profile_editor_struct).encode("utf-8")
+		# of the body, not just the definition, the editable settings may change with the plugin
+		payload = (digest, body, _gzip(body), hashlib.sha1(body).hexdigest())
+		self._editor_struct_payload = payload
+		return payload[1:]
 
 	@octoprint.plugin.BlueprintPlugin.route("/getProfileDict", methods=["GET"])
 	def get_profile_dict_for_editor(self):
 		filename = flask.request.values["profile_id"] + ".profile"
 		profile_path = os.path.join(self._settings.getBaseFolder("slicingProfiles"), "cura_engine", filename)
-		profile_dict = get_profile_dict_from_yaml(profile_path)
 
-		return flask.make_response(flask.jsonify(profile_dict), 200)
+		try:
+			stat = os.stat(profile_path)
+		except OSError:
+			return flask.make_response("Unknown profile {profile_id}".format(profile_id=flask.request.values["profile_id"]), 404)
+
+		# same signature the profile cache validates its entries against
+		etag = "{:x}-{:x}-{:x}".format(int(stat.st_mtime * 1000000), stat.st_size, stat.st_ino)
+		if etag in flask.request.if_none_match:
+			return _not_modified(etag)
+
+		profile_dict = get_profile_dict_from_yaml(profile_path)
+		return _cacheable_response(json.dumps(profile_dict).encode("utf-8"), etag)
 
 	@octoprint.plugin.BlueprintPlugin.route("/profileEditorSave", methods=["POST"])
 	def save_edited_profile(self):
@@ -395,20 +1613,29 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 		profile_path = os.path.join(self._settings.getBaseFolder("slicingProfiles"), "cura_engine", profile_filename)
 		profile_dict = get_profile_dict_from_yaml(profile_path)
 
+		edited = dict()
 		for setting in edited_profile_dict.keys():
-			# TODO: Check for valid data_type
 			if edited_profile_dict[setting] != "":
-				profile_dict[setting] = self._parse_values_from_editor(edited_profile_dict[setting])
+				edited[setting] = self._parse_values_from_editor(setting, edited_profile_dict[setting])
 
 		try:
-			with octoprint.util.atomic_write(profile_path, "wb") as f:
-				yaml.safe_dump(profile_dict, f, default_flow_style=False, indent="  ", allow_unicode=True)
+			self._check_profile(edited)
+		except ProfileValidationError as e:
+			return flask.make_response(flask.jsonify(dict(errors=e.errors)), 400)
+		profile_dict.update(edited)
+
+		try:
+			save_profile_dict_to_yaml(profile_path, profile_dict)
 		except:
 			return flask.make_response("Unable to save edited profile to disk", 500)
 
 		return NO_CONTENT
 
-	def _parse_values_from_editor(self, value):
+	def _parse_values_from_editor(self, key, value):
+		setting = self._definition.get(key)
+		if self._profile_validator is not None and setting is not None and setting.get("type"):
+			return self._profile_validator.coerce(key, value)
+
 		if value == 'on':
 			return True
 		if value == 'off':
@@ -423,6 +1650,55 @@ class CuraEnginePlugin(octoprint.plugin.SlicerPlugin,
 			pass
 		return value
 
+def _filament_usage(volume, filament_diameter):
+	# CuraEngine expresses the usage volume in mm^3
+	# usage_volume should be expressed in cm^3
+	# usage_length should be expressed in mm
+	usage_volume = volume / 1000
+	usage_length = (usage_volume * 1000) / (math.pi * (filament_diameter / 2) ** 2)
+	return {"volume": usage_volume, "length": usage_length}
+
+
+def _gzip(data):
+	import gzip
+	import io
+
+	buf = io.BytesIO()
+	with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6) as f:
+		f.write(data)
+	return buf.getvalue()
+
+
+def _not_modified(etag):
+	response = flask.make_response("", 304)
+	response.headers["ETag"] = '"{}"'.format(etag)
+	return response
+
+
+def _cacheable_response(body, etag, gzipped=None):
+	"""
+	JSON response for ``body`` that clients may cache and revalidate against ``etag``, gzipped if the client accepts it.
+	"""
+
+	if etag in flask.request.if_none_match:
+		return _not_modified(etag)
+
+	if "gzip" in flask.request.headers.get("Accept-Encoding", ""):
+		if gzipped is None:
+			gzipped = _gzip(body)
+		response = flask.make_response(gzipped, 200)
+		response.headers["Content-Encoding"] = "gzip"
+	else:
+		response = flask.make_response(body, 200)
+
+	response.headers["Content-Type"] = "application/json"
+	response.headers["ETag"] = '"{}"'.format(etag)
+	response.headers["Vary"] = "Accept-Encoding"
+	# cache, but always revalidate
+	response.headers["Cache-Control"] = "no-cache"
+	return response
+
+
 def _sanitize_name(name):
 	if name is None:
 		return None
@@ -439,33 +1715,33 @@ def _sanitize_name(name):
 def get_profile_dict_from_json(json_path):
 	if not os.path.exists(json_path) or not os.path.isfile(json_path):
 		return None # TODO: Raise exception ?
-	profile_dict = dict()
-	with open(json_path, 'r') as f:
+	with open(json_path, 'rb') as f:
 		try:
-			raw_profile_dict = json.loads(f.read())
-		except:
+			return get_profile_dict_from_json_data(f.read())
+		except ValueError:
 			raise IOError("Couldn't load JSON profile from {path}".format(path=json_path))
-	_find_settings(profile_dict, raw_profile_dict)
+
+def get_profile_dict_from_json_data(data):
+	profile_dict = dict()
+	_find_settings(profile_dict, json.loads(data.decode("utf-8")))
 	return profile_dict
 
 def get_profile_dict_from_yaml(yaml_path):
 	if not os.path.exists(yaml_path) or not os.path.isfile(yaml_path):
 		return None # TODO: Raise exception ?
-	profile_dict = dict()
-	with open(yaml_path, "r") as f:
-		try:
-			profile_dict = yaml.safe_load(f)
-		except:
-			raise IOError("Couldn't load YAML profile from {path}".format(path=yaml_path))
-	return profile_dict
+	try:
+		return _profile_cache.load(yaml_path)
+	except:
+		raise IOError("Couldn't load YAML profile from {path}".format(path=yaml_path))
+
+def save_profile_dict_to_yaml(yaml_path, profile_dict):
+	_profile_cache.save(yaml_path, profile_dict)
 
 def _find_settings(plain_dict, data_dict):
 	if not isinstance(data_dict, dict):
 		return
-	for key in data_dict.keys():
-		if isinstance(data_dict[key], dict) and "default" in data_dict[key]:
-			plain_dict[key] = data_dict[key]["default"]
-		_find_settings(plain_dict, data_dict[key])
+	for key, setting in iter_settings(data_dict):
+		plain_dict[key] = setting["default"]
 
 
 
@@ -0,0 +1,230 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import math
+import mmap
+import os
+import re
+
+from collections import OrderedDict
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+# CuraEngine writes its moves as "G0/G1 [F..] [X..] [Y..] [Z..] [E..]", always in that order, so one pattern with
+# optional groups is enough to pick apart every line we are interested in without a per-line Python loop
+_COMMAND_PATTERN = re.compile(br"^(?:"
+                              br"(?P<move>G[01])(?!\d)(?: F(?P<f>\S+))?(?: X(?P<x>\S+))?(?: Y(?P<y>\S+))?(?: Z(?P<z>\S+))?(?: E(?P<e>\S+))?"
+                              br"|(?P<reset>G92)(?!\d)(?: X\S+)?(?: Y\S+)?(?: Z\S+)?(?: E(?P<reset_e>\S+))?"
+                              br"|(?P<positioning>G9[01])(?!\d)"
+                              br"|(?P<extrusion>M8[23])(?!\d)"
+                              br"|T(?P<tool>\d+)"
+                              br"|;LAYER:(?P<layer>-?\d+)"
+                              br")", re.M)
+
+_COLUMNS = dict((name, index) for index, name in enumerate(("move", "f", "x", "y", "z", "e", "reset", "reset_e", "positioning", "extrusion", "tool", "layer")))
+
+
+def is_available():
+	return numpy is not None
+
+
+def analyse_gcode(path, filament_diameter=None, chunk_size=16*1024*1024):
+	"""
+	Analyses the G-code file at ``path`` in chunks of roughly ``chunk_size`` bytes.
+
+	The file is memory mapped and every chunk is processed with NumPy, so even files of several hundred megabytes are
+	never loaded into memory as a whole. Returns a dict with the layer count, per-layer extrusion and time, the
+	bounding box of all extruding moves, travel and extrusion distances, the estimated print time and the filament
+	usage per tool. Requires NumPy.
+	"""
+
+	if numpy is None:
+		raise RuntimeError("NumPy is required for G-code analysis")
+
+	state = _AnalysisState()
+	if os.path.getsize(path) == 0:
+		return state.result(filament_diameter)
+
+	with open(path, "rb") as f:
+		mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			start = 0
+			size = len(mapped)
+			while start < size:
+				end = min(start + chunk_size, size)
+				if end < size:
+					# chunks end on line boundaries, lines longer than a chunk extend it
+					newline = mapped.rfind(b"\n", start, end)
+					if newline < start:
+						newline = mapped.find(b"\n", end)
+					end = newline + 1 if newline >= 0 else size
+				_analyse_chunk(mapped[start:end], state)
+				start = end
+		finally:
+			mapped.close()
+
+	return state.result(filament_diameter)
+
+
+class _AnalysisState(object):
+	"""
+	Machine state carried over from one chunk to the next plus the accumulated results.
+	"""
+
+	def __init__(self):
+		self.position = [0.0, 0.0, 0.0, 0.0] # x, y, z, e
+		self.feedrate = 0.0
+		self.relative_positioning = False
+		self.relative_extrusion = False
+		self.tool = 0
+		self.layer = -1
+
+		self.layers = dict()
+		self.tools = dict()
+		self.bounds = None
+		self.travel_distance = 0.0
+		self.extrusion_distance = 0.0
+		self.time = 0.0
+
+	def add_bounds(self, minimum, maximum):
+		if self.bounds is None:
+			self.bounds = (list(minimum), list(maximum))
+		else:
+			self.bounds = ([min(a, b) for a, b in zip(self.bounds[0], minimum)],
+			               [max(a, b) for a, b in zip(self.bounds[1], maximum)])
+
+	def result(self, filament_diameter):
+		layers = [dict(layer=layer, extrusion=extrusion, time=time)
+		          for layer, (extrusion, time) in sorted(self.layers.items()) if layer >= 0]
+
+		filament = OrderedDict()
+		for tool, length in sorted(self.tools.items()):
+			entry = dict(length=length)
+			if filament_diameter:
+				entry["volume"] = length * math.pi * (filament_diameter / 2.0) ** 2 / 1000.0
+			filament["tool{}".format(tool)] = entry
+
+		result = dict(layerCount=len(layers),
+		              layers=layers,
+		              filament=filament,
+		              travelDistance=self.travel_distance,
+		              extrusionDistance=self.extrusion_distance,
+		              estimatedPrintTime=self.time)
+
+		if self.bounds is not None:
+			minimum, maximum = self.bounds
+			result["printingArea"] = dict(minX=minimum[0], maxX=maximum[0],
+			                              minY=minimum[1], maxY=maximum[1],
+			                              minZ=minimum[2], maxZ=maximum[2])
+			result["dimensions"] = dict(width=maximum[0] - minimum[0],
+			                            depth=maximum[1] - minimum[1],
+			                            height=maximum[2] - minimum[2])
+
+		return result
+
+
+def _analyse_chunk(chunk, state):
+	rows = _COMMAND_PATTERN.findall(chunk)
+	if not rows:
+		return
+
+	table = numpy.array(rows)
+	is_move = table[:, _COLUMNS["move"]] != b""
+	is_reset = table[:, _COLUMNS["reset"]] != b""
+
+	# modal state: positioning/extrusion mode, tool and layer only change on their own commands
+	positioning = _column(table, "positioning", lambda col: numpy.where(col == b"G91", 1.0, 0.0))
+	relative_positioning = _forward_fill(positioning, float(state.relative_positioning)) > 0.5
+	extrusion = _column(table, "extrusion", lambda col: numpy.where(col == b"M83", 1.0, 0.0))
+	relative_extrusion = (_forward_fill(extrusion, float(state.relative_extrusion)) > 0.5) | relative_positioning
+	tools = _forward_fill(_column(table, "tool"), float(state.tool)).astype(numpy.int64)
+	layers = _forward_fill(_column(table, "layer"), float(state.layer)).astype(numpy.int64)
+	feedrates = _forward_fill(_column(table, "f"), state.feedrate)
+
+	# positions, relative values only count on moves, G92 always sets E absolutely
+	axes = []
+	for index, name in enumerate(("x", "y", "z")):
+		values = numpy.where(is_move, _column(table, name), numpy.nan)
+		axes.append(_accumulate(values, relative_positioning, state.position[index]))
+
+	e_values = numpy.where(is_move, _column(table, "e"), numpy.nan)
+	e_values = numpy.where(is_reset, _column(table, "reset_e"), e_values)
+	e_positions = _accumulate(e_values, relative_extrusion & ~is_reset, state.position[3])
+
+	previous = [numpy.concatenate(([state.position[index]], values[:-1])) for index, values in enumerate(axes + [e_positions])]
+	deltas = [values - prev for values, prev in zip(axes + [e_positions], previous)]
+	extruded = numpy.where(is_move, deltas[3], 0.0)
+	distance = numpy.where(is_move, numpy.sqrt(deltas[0] ** 2 + deltas[1] ** 2 + deltas[2] ** 2), 0.0)
+
+	is_extruding = is_move & (extruded > 0) & (distance > 0)
+	is_travel = is_move & ~is_extruding & (distance > 0)
+
+	# moves without any XYZ movement (retractions, primes) take as long as the extruder needs
+	feedrates_per_second = numpy.where(feedrates > 0, feedrates / 60.0, numpy.inf)
+	times = numpy.where(distance > 0, distance, numpy.abs(extruded)) / feedrates_per_second
+
+	state.travel_distance += float(distance[is_travel].sum())
+	state.extrusion_distance += float(distance[is_extruding].sum())
+	state.time += float(times.sum())
+
+	layer_numbers, layer_index = numpy.unique(layers, return_inverse=True)
+	layer_extrusion = numpy.bincount(layer_index, weights=extruded, minlength=len(layer_numbers))
+	layer_times = numpy.bincount(layer_index, weights=times, minlength=len(layer_numbers))
+	for layer, layer_extruded, layer_time in zip(layer_numbers, layer_extrusion, layer_times):
+		extrusion_total, time_total = state.layers.get(int(layer), (0.0, 0.0))
+		state.layers[int(layer)] = (extrusion_total + float(layer_extruded), time_total + float(layer_time))
+
+	tool_numbers, tool_index = numpy.unique(tools, return_inverse=True)
+	tool_extrusion = numpy.bincount(tool_index, weights=extruded, minlength=len(tool_numbers))
+	for tool, tool_extruded in zip(tool_numbers, tool_extrusion):
+		if tool_extruded != 0 or int(tool) in state.tools:
+			state.tools[int(tool)] = state.tools.get(int(tool), 0.0) + float(tool_extruded)
+
+	if is_extruding.any():
+		points = numpy.concatenate((numpy.column_stack([values[is_extruding] for values in axes]),
+		                            numpy.column_stack([values[is_extruding] for values in previous[:3]])))
+		state.add_bounds([float(value) for value in points.min(axis=0)],
+		                 [float(value) for value in points.max(axis=0)])
+
+	state.position = [float(axes[0][-1]), float(axes[1][-1]), float(axes[2][-1]), float(e_positions[-1])]
+	state.feedrate = float(feedrates[-1])
+	state.relative_positioning = bool(_forward_fill(positioning, float(state.relative_positioning))[-1] > 0.5)
+	state.relative_extrusion = bool(_forward_fill(extrusion, float(state.relative_extrusion))[-1] > 0.5)
+	state.tool = int(tools[-1])
+	state.layer = int(layers[-1])
+
+
+def _column(table, name, convert=None):
+	column = table[:, _COLUMNS[name]]
+	given = column != b""
+	if convert is not None:
+		values = convert(column)
+	else:
+		values = numpy.where(given, column, b"nan").astype(numpy.float64)
+	return numpy.where(given, values, numpy.nan)
+
+
+def _forward_fill(values, initial):
+	"""
+	Replaces every NaN in ``values`` with the last preceding non-NaN value, or ``initial`` if there is none.
+	"""
+
+	values = numpy.concatenate(([initial], values))
+	indices = numpy.where(numpy.isnan(values), 0, numpy.arange(len(values)))
+	numpy.maximum.accumulate(indices, out=indices)
+	return values[indices][1:]
+
+
+def _accumulate(values, relative, initial):
+	"""
+	Turns a column of absolute and relative coordinates (NaN for "unchanged") into absolute positions.
+	"""
+
+	given = ~numpy.isnan(values)
+	offsets = numpy.cumsum(numpy.where(given & relative, values, 0.0))
+	absolute = numpy.where(given & ~relative, values - offsets, numpy.nan)
+	return _forward_fill(absolute, initial) + offsets
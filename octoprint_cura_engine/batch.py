@@ -0,0 +1,123 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+import uuid
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+
+class BatchItem(object):
+	"""
+	One model/profile combination of a batch.
+	"""
+
+	def __init__(self, index, model, profile, output):
+		self.index = index
+		self.model = model
+		self.profile = profile
+		self.output = output
+
+		self.state = "queued"
+		self.progress = 0.0
+		self.error = None
+		self.analysis = None
+
+		# path the engine writes to while the item is being sliced
+		self.machinecode_path = None
+
+	def as_dict(self):
+		return dict(index=self.index,
+		            model=self.model,
+		            profile=self.profile,
+		            output=self.output,
+		            state=self.state,
+		            progress=self.progress,
+		            error=self.error,
+		            analysis=self.analysis)
+
+
+class BatchJob(object):
+	"""
+	A set of slicing items processed as one unit by up to ``workers`` threads.
+
+	``slice_item`` is called for every item and is expected to update the item's state, progress and result.
+	"""
+
+	def __init__(self, items, slice_item, workers=1):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.batch")
+
+		self.id = str(uuid.uuid4())
+		self.items = items
+		self.created_at = time.time()
+		self.finished_at = None
+		self.cancelled = False
+
+		self._slice_item = slice_item
+		self._workers = max(1, min(workers, len(items)))
+		self._queue = queue.Queue()
+		self._remaining = len(items)
+		self._mutex = threading.Lock()
+
+	@property
+	def state(self):
+		if self.finished_at is None:
+			return "running"
+		if self.cancelled:
+			return "cancelled"
+		if any(item.state == "failed" for item in self.items):
+			return "failed"
+		return "done"
+
+	@property
+	def progress(self):
+		if not self.items:
+			return 1.0
+		return sum(1.0 if item.state in ("done", "failed", "cancelled") else item.progress for item in self.items) / len(self.items)
+
+	def start(self):
+		for item in self.items:
+			self._queue.put(item)
+
+		for _ in range(self._workers):
+			thread = threading.Thread(target=self._work, name="CuraEngineBatch-" + self.id[:8])
+			thread.daemon = True
+			thread.start()
+
+	def cancel(self):
+		self.cancelled = True
+
+	def as_dict(self):
+		return dict(id=self.id,
+		            state=self.state,
+		            progress=self.progress,
+		            createdAt=self.created_at,
+		            finishedAt=self.finished_at,
+		            items=[item.as_dict() for item in self.items])
+
+	def _work(self):
+		while True:
+			try:
+				item = self._queue.get_nowait()
+			except queue.Empty:
+				return
+
+			if self.cancelled:
+				item.state = "cancelled"
+			else:
+				try:
+					self._slice_item(self, item)
+				except:
+					self._logger.exception(u"Error while slicing item {index} of batch {id}".format(index=item.index, id=self.id))
+					item.state = "failed"
+					item.error = "Unknown error, please consult the log file"
+
+			with self._mutex:
+				self._remaining -= 1
+				if self._remaining == 0:
+					self.finished_at = time.time()
@@ -0,0 +1,302 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import octoprint.util
+
+from collections import OrderedDict
+
+
+class SliceCache(object):
+	"""
+	Persistent, content addressed cache of slicing results.
+
+	Every entry is stored as ``<key>.gcode`` inside the cache folder, or gzipped as ``<key>.gcode.gz`` with
+	``compress``, the metadata of all entries (size, last access, compression and the summary of the ``analysis``
+	dict reported by the engine) lives in ``index.json`` next to it. Per layer analysis data is kept separately in
+	``<key>.layers.json``. Entries are evicted in least recently used order as soon as the total size of the cache
+	exceeds ``max_size`` bytes.
+
+	Machine code is always copied in and out of the cache, never linked, so neither side can modify the other's
+	file. Copying and compressing happen outside of the cache's lock.
+	"""
+
+	INDEX_FILENAME = "index.json"
+
+	# hits only update access times, the index is saved at most this often for them (in seconds)
+	INDEX_SAVE_INTERVAL = 60.0
+
+	def __init__(self, folder, max_size=None, compress=False):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.cache")
+
+		self._folder = folder
+		self._index_path = os.path.join(folder, self.INDEX_FILENAME)
+		self._max_size = max_size
+		self._compress = compress
+
+		self._mutex = threading.RLock()
+		self._entries = OrderedDict()
+		self._hits = 0
+		self._misses = 0
+		self._dirty = False
+		self._saved_at = 0.0
+
+		# executable path -> (size, mtime, digest), the engine binary is only rehashed when it changes
+		self._executable_digests = dict()
+
+		if not os.path.isdir(folder):
+			os.makedirs(folder)
+		self._load_index()
+
+	#~~ key computation
+
+	def compute_key(self, model_path, profile_dict, definition_digest, executable):
+		hasher = hashlib.sha1()
+		hasher.update(_file_digest(model_path).encode("ascii"))
+		hasher.update(json.dumps(profile_dict, sort_keys=True, default=str).encode("utf-8"))
+		hasher.update(definition_digest.encode("ascii"))
+		hasher.update(self._executable_digest(executable).encode("ascii"))
+		return hasher.hexdigest()
+
+	def _executable_digest(self, executable):
+		stat = os.stat(executable)
+		with self._mutex:
+			cached = self._executable_digests.get(executable)
+			if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+				return cached[2]
+
+		digest = _file_digest(executable)
+		with self._mutex:
+			self._executable_digests[executable] = (stat.st_size, stat.st_mtime, digest)
+		return digest
+
+	#~~ lookup & store
+
+	def lookup(self, key, machinecode_path):
+		"""
+		Copies (or decompresses) the cached machine code for ``key`` to ``machinecode_path``.
+
+		Returns the stored ``analysis`` dict on a hit, ``None`` on a miss.
+		"""
+
+		with self._mutex:
+			entry = self._entries.get(key)
+			if entry is None:
+				self._misses += 1
+				return None
+			compressed = entry.get("compressed", False)
+			has_layers = entry.get("layers", False)
+
+		# the entry might get evicted meanwhile, its file then either stays readable or is already gone
+		try:
+			if compressed:
+				_decompress(self._entry_path(key, True), machinecode_path)
+			else:
+				shutil.copyfile(self._entry_path(key), machinecode_path)
+
+			layers = None
+			if has_layers:
+				with open(self._layers_path(key), "r") as f:
+					layers = json.loads(f.read())
+		except:
+			self._logger.exception(u"Could not restore cached slicing result {key} to {path}".format(key=key, path=machinecode_path))
+			with self._mutex:
+				if self._entries.get(key) is entry:
+					self._remove_entry(key)
+					self._save_index()
+				self._misses += 1
+			return None
+
+		with self._mutex:
+			# mark as most recently used, unless it was evicted or replaced in the meantime
+			if self._entries.get(key) is entry:
+				del self._entries[key]
+				entry["last_access"] = time.time()
+				self._entries[key] = entry
+				self._dirty = True
+				if time.time() - self._saved_at >= self.INDEX_SAVE_INTERVAL:
+					self._save_index()
+			self._hits += 1
+
+			analysis = dict(entry["analysis"])
+
+		if layers is not None:
+			analysis["layers"] = layers
+		return analysis
+
+	def store(self, key, machinecode_path, analysis):
+		if not os.path.isfile(machinecode_path):
+			return
+
+		with self._mutex:
+			compressed = self._compress
+
+		summary = dict(analysis) if analysis else dict()
+		layers = summary.pop("layers", None)
+
+		# prepare everything next to the final files first, a half written entry must never look valid
+		entry_path = self._entry_path(key, compressed)
+		temporary = entry_path + ".{}.tmp".format(threading.current_thread().ident)
+		layers_temporary = self._layers_path(key) + ".{}.tmp".format(threading.current_thread().ident)
+		try:
+			if compressed:
+				_compress(machinecode_path, temporary)
+			else:
+				shutil.copyfile(machinecode_path, temporary)
+			if layers is not None:
+				with open(layers_temporary, "w") as f:
+					f.write(json.dumps(layers))
+		except:
+			self._logger.exception(u"Could not add slicing result {key} to cache".format(key=key))
+			_remove_quietly(temporary)
+			_remove_quietly(layers_temporary)
+			return
+
+		with self._mutex:
+			if key in self._entries:
+				self._remove_entry(key)
+
+			try:
+				os.rename(temporary, entry_path)
+				if layers is not None:
+					os.rename(layers_temporary, self._layers_path(key))
+			except:
+				self._logger.exception(u"Could not add slicing result {key} to cache".format(key=key))
+				_remove_quietly(temporary)
+				_remove_quietly(layers_temporary)
+				_remove_quietly(entry_path)
+				return
+
+			self._entries[key] = dict(size=os.path.getsize(entry_path),
+			                          last_access=time.time(),
+			                          compressed=compressed,
+			                          layers=layers is not None,
+			                          analysis=summary)
+			self._evict()
+			self._save_index()
+
+	def invalidate(self):
+		with self._mutex:
+			for key in list(self._entries):
+				self._remove_entry(key)
+			self._hits = 0
+			self._misses = 0
+			self._save_index()
+		self._logger.info(u"Slicing cache invalidated")
+
+	def flush(self):
+		"""
+		Saves access times not yet written to the index.
+		"""
+
+		with self._mutex:
+			if self._dirty:
+				self._save_index()
+
+	def set_max_size(self, max_size):
+		with self._mutex:
+			self._max_size = max_size
+			self._evict()
+			self._save_index()
+
+	def set_compress(self, compress):
+		"""
+		Whether to gzip new entries, existing entries stay as they are.
+		"""
+
+		with self._mutex:
+			self._compress = compress
+
+	def get_stats(self):
+		with self._mutex:
+			return dict(entries=len(self._entries),
+			            size=sum(entry["size"] for entry in self._entries.values()),
+			            max_size=self._max_size,
+			            hits=self._hits,
+			            misses=self._misses)
+
+	#~~ internals
+
+	def _entry_path(self, key, compressed=False):
+		return os.path.join(self._folder, key + (".gcode.gz" if compressed else ".gcode"))
+
+	def _layers_path(self, key):
+		return os.path.join(self._folder, key + ".layers.json")
+
+	def _evict(self):
+		if not self._max_size:
+			return
+
+		size = sum(entry["size"] for entry in self._entries.values())
+		while size > self._max_size and self._entries:
+			key = next(iter(self._entries))
+			size -= self._entries[key]["size"]
+			self._remove_entry(key)
+
+	def _remove_entry(self, key):
+		entry = self._entries.pop(key, None)
+		_remove_quietly(self._entry_path(key, entry is not None and entry.get("compressed", False)))
+		_remove_quietly(self._layers_path(key))
+
+	def _load_index(self):
+		if not os.path.exists(self._index_path):
+			return
+
+		try:
+			with open(self._index_path, "r") as f:
+				entries = json.loads(f.read())
+		except:
+			self._logger.exception(u"Could not load slicing cache index from {path}, starting empty".format(path=self._index_path))
+			return
+
+		for key, entry in sorted(entries.items(), key=lambda item: item[1].get("last_access", 0)):
+			if os.path.exists(self._entry_path(key, entry.get("compressed", False))):
+				self._entries[key] = entry
+
+	def _save_index(self):
+		try:
+			with octoprint.util.atomic_write(self._index_path, "wb") as f:
+				f.write(json.dumps(self._entries).encode("utf-8"))
+		except:
+			self._logger.exception(u"Could not save slicing cache index to {path}".format(path=self._index_path))
+		else:
+			self._dirty = False
+			self._saved_at = time.time()
+
+
+def _file_digest(path, block_size=1024*1024):
+	hasher = hashlib.sha1()
+	with open(path, "rb") as f:
+		while True:
+			block = f.read(block_size)
+			if not block:
+				break
+			hasher.update(block)
+	return hasher.hexdigest()
+
+
+def _remove_quietly(path):
+	try:
+		os.remove(path)
+	except OSError:
+		pass
+
+
+def _compress(source, target):
+	with open(source, "rb") as f_in:
+		with gzip.open(target, "wb", 6) as f_out:
+			shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def _decompress(source, target):
+	with gzip.open(source, "rb") as f_in:
+		with open(target, "wb") as f_out:
+			shutil.copyfileobj(f_in, f_out, 1024 * 1024)
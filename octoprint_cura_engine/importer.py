@@ -0,0 +1,88 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import io
+import logging
+import os
+import tarfile
+import zipfile
+
+
+# archive members larger than this are not considered profiles
+MAX_PROFILE_SIZE = 16 * 1024 * 1024
+
+
+class ImportItem(object):
+	"""
+	One profile of a bulk import, read from ``filename`` (an uploaded file or an archive member).
+	"""
+
+	def __init__(self, filename, data):
+		self.filename = filename
+		self.data = data
+
+		name, _ = os.path.splitext(os.path.basename(filename))
+		self.display_name = name
+		self.name = None
+		self.profile_dict = None
+
+		self.state = "pending"
+		self.error = None
+		# failed only because a profile of the same name exists
+		self.conflict = False
+
+	def fail(self, error, conflict=False):
+		self.state = "failed"
+		self.error = error
+		self.conflict = conflict
+
+	def as_dict(self):
+		return dict(file=self.filename,
+		            name=self.name,
+		            displayName=self.display_name,
+		            settings=len(self.profile_dict) if self.profile_dict is not None else None,
+		            state=self.state,
+		            error=self.error)
+
+
+def read_items(filename, path):
+	"""
+	Reads the profiles of an uploaded file, which is either a single JSON profile or a ZIP or (compressed) TAR
+	archive of them. Only the ``.json`` members of archives are considered.
+	"""
+
+	if zipfile.is_zipfile(path):
+		with zipfile.ZipFile(path) as archive:
+			return [ImportItem(info.filename, archive.read(info)) for info in archive.infolist()
+			        if _is_profile(info.filename, info.file_size)]
+
+	if tarfile.is_tarfile(path):
+		with tarfile.open(path) as archive:
+			return [ImportItem(member.name, archive.extractfile(member).read()) for member in archive.getmembers()
+			        if member.isfile() and _is_profile(member.name, member.size)]
+
+	with io.open(path, "rb") as f:
+		return [ImportItem(filename, f.read())]
+
+
+def convert_items(items, convert):
+	"""
+	Converts the data of all ``items`` into profile dicts via ``convert``, one after the other. Items that can't be
+	converted are marked as failed.
+	"""
+
+	logger = logging.getLogger("octoprint.plugins.cura_engine.importer")
+
+	for item in items:
+		try:
+			item.profile_dict = convert(item.data)
+		except Exception as e:
+			logger.warn(u"Could not convert imported profile %s: %s" % (item.filename, str(e)))
+			item.fail("Could not convert profile: {}".format(e))
+		finally:
+			item.data = None
+
+
+def _is_profile(name, size):
+	basename = os.path.basename(name)
+	return name.lower().endswith(".json") and not basename.startswith(".") and size <= MAX_PROFILE_SIZE
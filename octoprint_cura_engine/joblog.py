@@ -0,0 +1,248 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import gzip
+import logging
+import logging.handlers
+import os
+import shutil
+import threading
+import time
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+
+class EngineLog(object):
+	"""
+	Asynchronous logging of everything the plugin logs about its engines to ``logger``.
+
+	Records are only put on a queue by the logging threads, a background thread writes them to the rotating
+	``logfile`` and, for records logged while a job is bound to the logging thread (see ``bind``), to a log file per
+	job in ``job_folder``. Finished job logs are optionally gzipped, only the newest ``max_job_logs`` are kept.
+	"""
+
+	def __init__(self, logger, logfile, job_folder=None, max_bytes=2*1024*1024, backup_count=1, max_job_logs=50, compress=False):
+		self._logger = logger
+		self._local = threading.local()
+		self._queue = queue.Queue()
+
+		formatter = logging.Formatter("%(asctime)s %(message)s")
+		self._file_handler = logging.handlers.RotatingFileHandler(logfile, maxBytes=max_bytes, backupCount=backup_count)
+		self._file_handler.setFormatter(formatter)
+		self._file_handler.addFilter(_SkipControlRecords())
+
+		self._job_handler = JobLogHandler(job_folder, max_job_logs=max_job_logs, compress=compress)
+		self._job_handler.setFormatter(formatter)
+
+		self._queue_handler = _QueueHandler(self._queue)
+		self._queue_handler.addFilter(_JobContext(self._local))
+		self._thread = None
+
+	def start(self):
+		self._thread = threading.Thread(target=self._work, name="CuraEngineLog")
+		self._thread.daemon = True
+		self._thread.start()
+
+		self._logger.addHandler(self._queue_handler)
+		self._logger.setLevel(logging.DEBUG)
+		self._logger.propagate = False
+
+	def stop(self):
+		self._logger.removeHandler(self._queue_handler)
+		if self._thread is not None:
+			self._queue.put(None)
+			self._thread.join()
+			self._thread = None
+		self._job_handler.close()
+		self._file_handler.close()
+
+	def configure(self, job_folder=None, max_bytes=None, max_job_logs=None, compress=None):
+		if max_bytes is not None:
+			self._file_handler.maxBytes = max_bytes
+		self._job_handler.configure(job_folder=job_folder, max_job_logs=max_job_logs, compress=compress)
+
+	def bind(self, job_id):
+		"""
+		Also logs all records of the current thread to the log file of ``job_id``.
+		"""
+
+		self._local.job_id = job_id
+
+	def finish(self, job_id):
+		"""
+		Ends the log of ``job_id`` once everything logged for it so far has been written.
+		"""
+
+		if getattr(self._local, "job_id", None) == job_id:
+			self._local.job_id = None
+		self._queue.put(logging.makeLogRecord(dict(name=self._logger.name, levelno=logging.DEBUG, msg="",
+		                                           job_id=job_id, job_finished=True)))
+
+	def _work(self):
+		while True:
+			record = self._queue.get()
+			if record is None:
+				return
+
+			for handler in (self._file_handler, self._job_handler):
+				try:
+					handler.handle(record)
+				except:
+					handler.handleError(record)
+
+
+class JobLogHandler(logging.Handler):
+	"""
+	Writes records carrying a ``job_id`` to ``<job_folder>/<job_id>.log``, closing the file when the job finishes.
+	"""
+
+	def __init__(self, job_folder, max_job_logs=50, compress=False):
+		logging.Handler.__init__(self)
+		self._folder = job_folder
+		self._max_job_logs = max_job_logs
+		self._compress = compress
+		self._files = dict()
+
+	def configure(self, job_folder=None, max_job_logs=None, compress=None):
+		# takes effect for jobs started from now on, already open files are written to the end
+		self.acquire()
+		try:
+			if job_folder is not None:
+				self._folder = job_folder or None
+			if max_job_logs is not None:
+				self._max_job_logs = max_job_logs
+			if compress is not None:
+				self._compress = compress
+		finally:
+			self.release()
+
+	def emit(self, record):
+		job_id = getattr(record, "job_id", None)
+		if job_id is None:
+			return
+
+		if getattr(record, "job_finished", False):
+			self._finish(job_id)
+			return
+
+		f = self._files.get(job_id)
+		if f is None:
+			if not self._folder:
+				return
+			if not os.path.isdir(self._folder):
+				os.makedirs(self._folder)
+			f = self._files[job_id] = open(os.path.join(self._folder, job_id + ".log"), "a")
+		f.write(self.format(record) + "\n")
+
+	def close(self):
+		for job_id in list(self._files):
+			self._finish(job_id)
+		logging.Handler.close(self)
+
+	def _finish(self, job_id):
+		f = self._files.pop(job_id, None)
+		if f is None:
+			return
+		f.close()
+
+		if self._compress:
+			path = f.name
+			with open(path, "rb") as f_in:
+				with gzip.open(path + ".gz", "wb") as f_out:
+					shutil.copyfileobj(f_in, f_out)
+			os.remove(path)
+
+		self._prune()
+
+	def _prune(self):
+		if not self._max_job_logs or not self._folder:
+			return
+
+		paths = [os.path.join(self._folder, name) for name in os.listdir(self._folder) if name.endswith((".log", ".log.gz"))]
+		paths.sort(key=os.path.getmtime, reverse=True)
+		for path in paths[self._max_job_logs:]:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+
+class LineSampler(object):
+	"""
+	Decides which lines of engine output get logged and at which level.
+
+	Warnings and errors are always logged. ``Progress`` lines are logged at most ``progress_rate`` times per second
+	(all of them for 0) and whenever a new stage starts, any other output only if ``verbose``.
+	"""
+
+	def __init__(self, progress_rate=1.0, verbose=True):
+		self._interval = 1.0 / progress_rate if progress_rate else 0.0
+		self._verbose = verbose
+		self._last_progress = None
+		self._stage = None
+
+	def get_level(self, line):
+		"""
+		Level to log ``line`` at, ``None`` if it should be dropped.
+		"""
+
+		if line.startswith("Progress"):
+			now = time.time()
+			stage = line.split(":", 2)[1] if line.count(":") >= 2 else None
+			if self._last_progress is not None and stage == self._stage and now - self._last_progress < self._interval:
+				return None
+			self._last_progress = now
+			self._stage = stage
+			return logging.DEBUG
+
+		lower = line.lower()
+		if "error" in lower:
+			return logging.ERROR
+		if "warning" in lower:
+			return logging.WARNING
+		return logging.DEBUG if self._verbose else None
+
+
+class _JobContext(logging.Filter):
+	"""
+	Stamps every record with the job bound to the thread logging it.
+	"""
+
+	def __init__(self, local):
+		logging.Filter.__init__(self)
+		self._local = local
+
+	def filter(self, record):
+		if not hasattr(record, "job_id"):
+			record.job_id = getattr(self._local, "job_id", None)
+		return True
+
+
+class _SkipControlRecords(logging.Filter):
+	def filter(self, record):
+		return not getattr(record, "job_finished", False)
+
+
+class _QueueHandler(logging.Handler):
+	"""
+	Puts records on a queue for another thread to write, like ``logging.handlers.QueueHandler`` (which Python 2
+	lacks).
+	"""
+
+	def __init__(self, queue):
+		logging.Handler.__init__(self)
+		self._queue = queue
+
+	def emit(self, record):
+		try:
+			# everything needed to format the record has to be resolved in the logging thread
+			record.msg = self.format(record)
+			record.args = None
+			record.exc_info = None
+			record.exc_text = None
+			self._queue.put_nowait(record)
+		except:
+			self.handleError(record)
@@ -0,0 +1,240 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import math
+import os
+import re
+import struct
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+_STL_HEADER_SIZE = 80
+_ASCII_VERTEX_PATTERN = re.compile(br"vertex\s+(\S+)\s+(\S+)\s+(\S+)")
+
+if numpy is not None:
+	_STL_RECORD = numpy.dtype([("normal", "<f4", (3,)),
+	                           ("vertices", "<f4", (3, 3)),
+	                           ("attributes", "<u2")])
+
+
+class MeshError(Exception):
+	pass
+
+
+def is_available():
+	return numpy is not None
+
+
+class Mesh(object):
+	"""
+	Triangle soup backed by a NumPy array of shape ``(triangles, 3, 3)``.
+	"""
+
+	def __init__(self, triangles):
+		self.triangles = triangles
+
+	def __len__(self):
+		return len(self.triangles)
+
+	@property
+	def bounds(self):
+		vertices = self.triangles.reshape(-1, 3)
+		return vertices.min(axis=0), vertices.max(axis=0)
+
+	@property
+	def size(self):
+		minimum, maximum = self.bounds
+		return maximum - minimum
+
+	def footprint_radius(self, center):
+		"""
+		Largest distance of any vertex from ``center`` in the XY plane.
+		"""
+
+		vertices = self.triangles.reshape(-1, 3)
+		return float(numpy.hypot(vertices[:, 0] - center[0], vertices[:, 1] - center[1]).max())
+
+	def translated(self, offset):
+		return Mesh(self.triangles + numpy.asarray(offset, dtype=self.triangles.dtype))
+
+	def rotated_quarter(self):
+		"""
+		Rotates the mesh by 90° counterclockwise around the Z axis.
+		"""
+
+		triangles = self.triangles[:, :, [1, 0, 2]]
+		triangles[:, :, 0] *= -1
+		return Mesh(triangles)
+
+	def decimated(self, max_triangles, max_iterations=8):
+		"""
+		Reduces the mesh to at most roughly ``max_triangles`` triangles through vertex clustering.
+
+		All vertices within the same cell of a regular grid are merged into their mean, triangles collapsing in the
+		process are dropped. The cell size is estimated from the surface area and grown until the budget is met.
+		"""
+
+		if len(self) <= max_triangles:
+			return self
+
+		area = self.surface_area()
+		cell = math.sqrt(area / max_triangles) if area > 0 else float(self.size.max()) / math.sqrt(max_triangles)
+
+		triangles = self.triangles
+		for _ in range(max_iterations):
+			triangles = _cluster_vertices(self.triangles, cell)
+			if len(triangles) <= max_triangles:
+				break
+			cell *= math.sqrt(float(len(triangles)) / max_triangles) * 1.1
+
+		return Mesh(triangles)
+
+	def surface_area(self):
+		edges_a = self.triangles[:, 1] - self.triangles[:, 0]
+		edges_b = self.triangles[:, 2] - self.triangles[:, 0]
+		return float(numpy.linalg.norm(numpy.cross(edges_a, edges_b), axis=1).sum() / 2.0)
+
+	def write_stl(self, path):
+		records = numpy.zeros(len(self), dtype=_STL_RECORD)
+		records["vertices"] = self.triangles
+		with open(path, "wb") as f:
+			f.write(b"Binary STL written by OctoPrint-CuraEngine".ljust(_STL_HEADER_SIZE, b" "))
+			f.write(struct.pack("<I", len(self)))
+			records.tofile(f)
+
+
+def read_stl(path):
+	"""
+	Reads a binary or ASCII STL file into a ``Mesh``. Requires NumPy.
+	"""
+
+	if numpy is None:
+		raise MeshError("NumPy is required for reading meshes")
+
+	file_size = os.path.getsize(path)
+	with open(path, "rb") as f:
+		header = f.read(_STL_HEADER_SIZE + 4)
+		if len(header) == _STL_HEADER_SIZE + 4:
+			count = struct.unpack("<I", header[_STL_HEADER_SIZE:])[0]
+			if file_size == _STL_HEADER_SIZE + 4 + count * _STL_RECORD.itemsize:
+				records = numpy.fromfile(f, dtype=_STL_RECORD, count=count)
+				return Mesh(records["vertices"].astype(numpy.float64))
+
+		if not header.lstrip().startswith(b"solid"):
+			raise MeshError("{path} is neither a binary nor an ASCII STL file".format(path=path))
+
+		f.seek(0)
+		content = f.read()
+
+	vertices = _ASCII_VERTEX_PATTERN.findall(content)
+	if not vertices or len(vertices) % 3:
+		raise MeshError("{path} doesn't contain a valid ASCII STL mesh".format(path=path))
+	try:
+		return Mesh(numpy.array(vertices).astype(numpy.float64).reshape(-1, 3, 3))
+	except ValueError:
+		raise MeshError("{path} contains invalid vertex coordinates".format(path=path))
+
+
+def merge(meshes):
+	"""
+	Combines several meshes into one.
+	"""
+
+	return Mesh(numpy.concatenate([mesh.triangles for mesh in meshes]))
+
+
+def _cluster_vertices(triangles, cell):
+	vertices = triangles.reshape(-1, 3)
+	cells = numpy.floor((vertices - vertices.min(axis=0)) / cell).astype(numpy.int64)
+	dimensions = cells.max(axis=0) + 1
+	keys = (cells[:, 0] * dimensions[1] + cells[:, 1]) * dimensions[2] + cells[:, 2]
+	_, cluster = numpy.unique(keys, return_inverse=True)
+	cluster = cluster.reshape(-1)
+	count = int(cluster.max()) + 1
+
+	# every cluster is represented by the mean of its vertices
+	weights = numpy.bincount(cluster, minlength=count).astype(numpy.float64)
+	representatives = numpy.column_stack([numpy.bincount(cluster, weights=vertices[:, axis], minlength=count) / weights
+	                                      for axis in range(3)])
+
+	indices = cluster.reshape(-1, 3)
+	keep = (indices[:, 0] != indices[:, 1]) & (indices[:, 1] != indices[:, 2]) & (indices[:, 0] != indices[:, 2])
+	indices = indices[keep]
+
+	# collapsed neighbourhoods often leave several copies of the same triangle behind
+	ordered = numpy.sort(indices, axis=1).astype(numpy.int64)
+	_, unique = numpy.unique((ordered[:, 0] * count + ordered[:, 1]) * count + ordered[:, 2], return_index=True)
+	indices = indices[numpy.sort(unique)]
+
+	return representatives[indices]
+
+
+class ModelDoesNotFit(MeshError):
+	pass
+
+
+def place_on_bed(mesh, position):
+	"""
+	Translates ``mesh`` so that the center of its footprint ends up at ``position`` and it rests on the bed.
+	"""
+
+	minimum, maximum = mesh.bounds
+	center = (minimum + maximum) / 2.0
+	return mesh.translated((position["x"] - center[0], position["y"] - center[1], -minimum[2]))
+
+
+def to_engine_frame(mesh, volume, center_is_zero=False):
+	"""
+	Translates ``mesh`` from printer coordinates into the frame CuraEngine reads meshes in.
+
+	Unless ``machine_center_is_zero`` is set the engine moves every mesh by half the width and depth of the bed, so
+	the origin of the mesh ends up in the center of the bed.
+	"""
+
+	if center_is_zero:
+		return mesh
+	return mesh.translated((-float(volume["width"]) / 2.0, -float(volume["depth"]) / 2.0, 0.0))
+
+
+def check_fits(mesh, volume, positioned=False, tolerance=1e-3):
+	"""
+	Raises ``ModelDoesNotFit`` if ``mesh`` can't be printed within the print ``volume`` of a printer profile.
+
+	A ``positioned`` mesh has to lie within the volume where it is, otherwise it only has to be small enough.
+	"""
+
+	width = float(volume["width"])
+	depth = float(volume["depth"])
+	height = float(volume["height"])
+	minimum, maximum = mesh.bounds
+	size = maximum - minimum
+
+	if size[2] > height + tolerance:
+		raise ModelDoesNotFit("Model is {size:.1f}mm high, the print volume only {height:.1f}mm".format(size=size[2], height=height))
+
+	if volume.get("origin", "lowerleft") == "center":
+		origin = (-width / 2.0, -depth / 2.0)
+	else:
+		origin = (0.0, 0.0)
+
+	if volume.get("formFactor", "rectangular") == "circular":
+		radius = width / 2.0
+		if positioned:
+			center = (origin[0] + width / 2.0, origin[1] + depth / 2.0)
+		else:
+			center = (minimum + maximum) / 2.0
+		footprint = mesh.footprint_radius(center)
+		if footprint > radius + tolerance:
+			raise ModelDoesNotFit("Model reaches {footprint:.1f}mm from the center of the bed, its radius is only {radius:.1f}mm".format(footprint=footprint, radius=radius))
+
+	elif positioned:
+		if minimum[0] < origin[0] - tolerance or maximum[0] > origin[0] + width + tolerance \
+				or minimum[1] < origin[1] - tolerance or maximum[1] > origin[1] + depth + tolerance:
+			raise ModelDoesNotFit("Model at its requested position exceeds the bed")
+
+	elif size[0] > width + tolerance or size[1] > depth + tolerance:
+		raise ModelDoesNotFit("Model footprint of {x:.1f}x{y:.1f}mm exceeds the bed of {width:.1f}x{depth:.1f}mm".format(x=size[0], y=size[1], width=width, depth=depth))
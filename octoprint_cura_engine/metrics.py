@@ -0,0 +1,239 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import errno
+import os
+import sys
+import threading
+import time
+
+from collections import OrderedDict, deque
+
+
+# upper bounds of the histogram buckets in seconds
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+# upper bounds of the histogram buckets in bytes
+MEMORY_BUCKETS = tuple(size * 1024 * 1024 for size in (16, 32, 64, 128, 256, 512, 1024, 2048, 4096))
+
+
+class JobTimer(object):
+	"""
+	Wall clock breakdown of a single slicing job into consecutive phases.
+
+	``start(phase)`` ends the currently running phase (if any) and starts the next one, phases may be entered
+	repeatedly and accumulate. Engine stages parsed from the progress output are recorded as ``engine_<stage>``.
+	"""
+
+	def __init__(self, job_id=None):
+		self.job_id = job_id
+		self.started_at = time.time()
+		self.finished_at = None
+		self.phases = OrderedDict()
+		self.outcome = None
+		self.cpu_time = None
+		self.peak_rss = None
+
+		self._current = None
+		self._current_start = None
+
+	@property
+	def current(self):
+		return self._current
+
+	def record(self, phase, duration):
+		self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+	def start(self, phase):
+		now = time.time()
+		self._stop(now)
+		self._current = phase
+		self._current_start = now
+
+	def start_engine_stage(self, stage):
+		phase = "engine_" + (stage or "unknown")
+		if phase != self._current:
+			self.start(phase)
+
+	def stop(self):
+		self._stop(time.time())
+
+	def finish(self, outcome):
+		self.stop()
+		self.outcome = outcome
+		self.finished_at = time.time()
+
+	def set_resource_usage(self, rusage):
+		if rusage is None:
+			return
+		self.cpu_time = rusage.ru_utime + rusage.ru_stime
+		# ru_maxrss is reported in kilobytes on Linux, in bytes on macOS
+		self.peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+	@property
+	def total(self):
+		end = self.finished_at if self.finished_at is not None else time.time()
+		return end - self.started_at
+
+	def as_dict(self):
+		return dict(job=self.job_id,
+		            outcome=self.outcome,
+		            startedAt=self.started_at,
+		            total=self.total,
+		            phases=dict(self.phases),
+		            cpuTime=self.cpu_time,
+		            peakRss=self.peak_rss)
+
+	def _stop(self, now):
+		if self._current is not None:
+			self.record(self._current, now - self._current_start)
+			self._current = None
+			self._current_start = None
+
+
+class MetricsRegistry(object):
+	"""
+	Keeps the timings of the last ``window`` jobs and summarizes them, and cumulative histograms of all jobs since
+	startup for Prometheus, which expects histograms to only ever grow.
+	"""
+
+	def __init__(self, window=500):
+		self._mutex = threading.Lock()
+		self._jobs = deque(maxlen=window)
+		self._outcomes = dict()
+		self._phase_histograms = OrderedDict()
+		self._rss_histogram = _Histogram(MEMORY_BUCKETS)
+
+	def add(self, timer):
+		with self._mutex:
+			self._jobs.append(timer)
+			self._outcomes[timer.outcome] = self._outcomes.get(timer.outcome, 0) + 1
+
+			for name, values in _collect_durations([timer]).items():
+				histogram = self._phase_histograms.get(name)
+				if histogram is None:
+					histogram = self._phase_histograms[name] = _Histogram(DURATION_BUCKETS)
+				for value in values:
+					histogram.observe(value)
+			if timer.peak_rss is not None:
+				self._rss_histogram.observe(timer.peak_rss)
+
+	def as_dict(self, recent=20):
+		with self._mutex:
+			jobs = list(self._jobs)
+			outcomes = dict(self._outcomes)
+
+		phases = OrderedDict()
+		for name, values in _collect_durations(jobs).items():
+			phases[name] = _summarize(values, DURATION_BUCKETS)
+
+		rss = [job.peak_rss for job in jobs if job.peak_rss is not None]
+		return dict(outcomes=outcomes,
+		            window=len(jobs),
+		            phases=phases,
+		            peakRss=_summarize(rss, MEMORY_BUCKETS),
+		            recent=[job.as_dict() for job in jobs[-recent:]])
+
+	def as_prometheus(self):
+		lines = ["# HELP cura_engine_jobs_total Slicing jobs by outcome since startup",
+		         "# TYPE cura_engine_jobs_total counter"]
+
+		with self._mutex:
+			for outcome, count in sorted(self._outcomes.items(), key=lambda item: str(item[0])):
+				lines.append('cura_engine_jobs_total{{outcome="{outcome}"}} {count}'.format(outcome=outcome, count=count))
+
+			lines += ["# HELP cura_engine_job_phase_seconds Duration of slicing job phases since startup",
+			          "# TYPE cura_engine_job_phase_seconds histogram"]
+			for name, histogram in self._phase_histograms.items():
+				lines += histogram.as_prometheus("cura_engine_job_phase_seconds", 'phase="{}"'.format(name))
+
+			lines += ["# HELP cura_engine_peak_rss_bytes Peak resident set size of the engine since startup",
+			          "# TYPE cura_engine_peak_rss_bytes histogram"]
+			lines += self._rss_histogram.as_prometheus("cura_engine_peak_rss_bytes", None)
+
+		return "\n".join(lines) + "\n"
+
+
+class _Histogram(object):
+	"""
+	Cumulative bucket counts, sum and count of all values observed so far.
+	"""
+
+	def __init__(self, buckets):
+		self.buckets = buckets
+		self.counts = [0] * len(buckets)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		for index, bound in enumerate(self.buckets):
+			if value <= bound:
+				self.counts[index] += 1
+		self.sum += value
+		self.count += 1
+
+	def as_prometheus(self, name, labels):
+		prefix = labels + "," if labels else ""
+		suffix = "{" + labels + "}" if labels else ""
+
+		lines = []
+		for bound, count in zip(self.buckets, self.counts):
+			lines.append('{name}_bucket{{{prefix}le="{bound}"}} {count}'.format(name=name, prefix=prefix, bound=bound, count=count))
+		lines.append('{name}_bucket{{{prefix}le="+Inf"}} {count}'.format(name=name, prefix=prefix, count=self.count))
+		lines.append("{name}_sum{suffix} {sum}".format(name=name, suffix=suffix, sum=self.sum))
+		lines.append("{name}_count{suffix} {count}".format(name=name, suffix=suffix, count=self.count))
+		return lines
+
+
+def wait_for_process(process):
+	"""
+	Waits for ``process`` to exit and returns its resource usage, ``None`` where that isn't available.
+	"""
+
+	if not hasattr(os, "wait4"):
+		process.wait()
+		return None
+
+	try:
+		_, status, rusage = os.wait4(process.pid, 0)
+	except OSError as e:
+		if e.errno != errno.ECHILD:
+			raise
+		# somebody else (e.g. Popen.send_signal) already reaped the process
+		process.wait()
+		return None
+
+	if os.WIFSIGNALED(status):
+		process.returncode = -os.WTERMSIG(status)
+	else:
+		process.returncode = os.WEXITSTATUS(status)
+	return rusage
+
+
+def _collect_durations(jobs):
+	durations = OrderedDict()
+	for job in jobs:
+		for name, duration in job.phases.items():
+			durations.setdefault(name, []).append(duration)
+		durations.setdefault("total", []).append(job.total)
+		if job.cpu_time is not None:
+			durations.setdefault("engine_cpu", []).append(job.cpu_time)
+	return durations
+
+
+def _summarize(values, buckets):
+	if not values:
+		return dict(count=0)
+
+	ordered = sorted(values)
+	return dict(count=len(ordered),
+	            sum=sum(ordered),
+	            mean=sum(ordered) / len(ordered),
+	            p50=_percentile(ordered, 0.5),
+	            p95=_percentile(ordered, 0.95),
+	            max=ordered[-1],
+	            buckets=[[bound, sum(1 for value in ordered if value <= bound)] for bound in buckets])
+
+
+def _percentile(ordered, fraction):
+	return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
@@ -0,0 +1,93 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import io
+import os
+
+
+LAYER_MARKER = b"\n;LAYER:"
+
+
+class LayerSink(object):
+	"""
+	Writes machine code streamed from the engine to ``path``, whole layers at a time.
+
+	Data is held back until the layer it belongs to is complete, which is the case as soon as the next ``;LAYER:``
+	comment arrives. Complete layers are written, flushed and announced via ``on_layer(layer, size)``, ``size`` being
+	the number of bytes in the file so far, so consumers can start reading the file before the engine is done. The
+	file is only synced to disk once, on ``close``.
+	"""
+
+	# write out data even without a layer boundary once this much has piled up
+	MAX_PENDING = 8 * 1024 * 1024
+
+	def __init__(self, path, on_layer=None):
+		self.path = path
+		self.size = 0
+		self.layers = 0
+
+		self._on_layer = on_layer
+		self._file = io.open(path, "wb")
+
+		self._pending = []
+		self._pending_size = 0
+		# end of the data seen so far, a marker might continue in the next chunk
+		self._tail = b""
+		self._markers = 0
+
+	def write(self, data):
+		if not data:
+			return
+
+		window = self._tail + data
+		boundary = None
+		index = window.find(LAYER_MARKER)
+		while index >= 0:
+			self._markers += 1
+			boundary = index + 1
+			index = window.find(LAYER_MARKER, boundary)
+
+		self._pending.append(data)
+		self._pending_size += len(data)
+		self._tail = window[-(len(LAYER_MARKER) - 1):]
+
+		if boundary is not None:
+			pending = b"".join(self._pending)
+			# the boundary is relative to the window, which ends where the pending data ends
+			boundary = max(0, len(pending) - len(window) + boundary)
+			self._write(pending[:boundary])
+			rest = pending[boundary:]
+			self._pending = [rest] if rest else []
+			self._pending_size = len(rest)
+			# everything up to the last marker is done, the layer it starts isn't
+			self._publish(self._markers - 1)
+		elif self._pending_size > self.MAX_PENDING:
+			self._write(b"".join(self._pending))
+			self._pending = []
+			self._pending_size = 0
+
+	def close(self):
+		if self._pending:
+			self._write(b"".join(self._pending))
+			self._pending = []
+			self._pending_size = 0
+		self._publish(self._markers)
+
+		os.fsync(self._file.fileno())
+		self._file.close()
+		return self.size
+
+	def _write(self, data):
+		if not data:
+			return
+		self._file.write(data)
+		self._file.flush()
+		self.size += len(data)
+
+	def _publish(self, layers):
+		if layers <= self.layers:
+			return
+		self.layers = layers
+		if self._on_layer is not None:
+			# zero based index of the last complete layer
+			self._on_layer(layers - 1, self.size)
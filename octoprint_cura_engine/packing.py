@@ -0,0 +1,168 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import math
+
+from . import mesh
+from .mesh import ModelDoesNotFit
+
+
+class PlateFull(ModelDoesNotFit):
+	pass
+
+
+def get_bed(volume):
+	"""
+	Usable rectangle ``(x, y, width, depth)`` of the bed of a printer profile's ``volume``, in the printer's coordinates.
+
+	Circular beds are reduced to their inscribed square.
+	"""
+
+	width = float(volume["width"])
+	depth = float(volume["depth"])
+	if volume.get("origin", "lowerleft") == "center":
+		x, y = -width / 2.0, -depth / 2.0
+	else:
+		x, y = 0.0, 0.0
+
+	if volume.get("formFactor", "rectangular") == "circular":
+		side = width / math.sqrt(2.0)
+		return x + (width - side) / 2.0, y + (depth - side) / 2.0, side, side
+	return x, y, width, depth
+
+
+def get_disallowed_rects(bed_center, disallowed_areas):
+	"""
+	Bounding rectangles of ``disallowed_areas``, polygons given relative to the bed's center like in Cura's machine
+	definitions, in the printer's coordinates.
+	"""
+
+	if not disallowed_areas:
+		return []
+	if not isinstance(disallowed_areas, (list, tuple)):
+		disallowed_areas = json.loads(disallowed_areas)
+
+	rects = []
+	for polygon in disallowed_areas:
+		if not polygon:
+			continue
+		xs = [float(point[0]) for point in polygon]
+		ys = [float(point[1]) for point in polygon]
+		rects.append((bed_center[0] + min(xs), bed_center[1] + min(ys), max(xs) - min(xs), max(ys) - min(ys)))
+	return rects
+
+
+def get_adhesion_margin(settings):
+	"""
+	How far the build plate adhesion of the profile ``settings`` reaches out around every part.
+	"""
+
+	adhesion_type = settings.get("adhesion_type")
+	if adhesion_type == "brim":
+		return float(settings.get("brim_line_count", 0)) * float(settings.get("skirt_line_width", 0))
+	elif adhesion_type == "raft":
+		return float(settings.get("raft_margin", 0))
+	return 0.0
+
+
+def pack(sizes, bed, spacing=0.0, obstacles=None, allow_rotation=True):
+	"""
+	Packs rectangles of ``sizes`` (``(width, depth)`` tuples) onto the ``bed`` rectangle without overlapping each
+	other or any of the ``obstacles`` rectangles, keeping ``spacing`` between all of them.
+
+	Uses MaxRects with the best short side fit heuristic, placing the largest rectangles first. Returns the center
+	and whether it was rotated by 90° for every rectangle, in the order of ``sizes``. Raises ``PlateFull`` if not all
+	rectangles fit.
+	"""
+
+	free = [tuple(bed)]
+	for x, y, width, depth in obstacles or []:
+		free = _split(free, (x - spacing / 2.0, y - spacing / 2.0, width + spacing, depth + spacing))
+
+	order = sorted(range(len(sizes)), key=lambda index: (max(sizes[index]), sizes[index][0] * sizes[index][1]), reverse=True)
+	placements = [None] * len(sizes)
+	for index in order:
+		width, depth = sizes[index][0] + spacing, sizes[index][1] + spacing
+
+		best = None
+		for rect in free:
+			for rotated, (w, d) in enumerate([(width, depth), (depth, width)] if allow_rotation else [(width, depth)]):
+				if w > rect[2] or d > rect[3]:
+					continue
+				leftover = (min(rect[2] - w, rect[3] - d), max(rect[2] - w, rect[3] - d))
+				if best is None or leftover < best[0]:
+					best = (leftover, (rect[0], rect[1], w, d), bool(rotated))
+
+		if best is None:
+			raise PlateFull("Could not fit part {index} of {width:.1f}x{depth:.1f}mm onto the bed".format(index=index, width=sizes[index][0], depth=sizes[index][1]))
+
+		_, used, rotated = best
+		free = _split(free, used)
+		placements[index] = (used[0] + used[2] / 2.0, used[1] + used[3] / 2.0, rotated)
+
+	return placements
+
+
+def arrange(meshes, volume, spacing=0.0, margin=0.0, disallowed_areas=None, allow_rotation=True):
+	"""
+	Packs ``meshes`` onto the bed of a printer profile's ``volume`` and combines them into one mesh, to be sliced in
+	a single run. ``margin`` is kept free around every part (e.g. for a brim) in addition to ``spacing``.
+
+	Returns the combined mesh and the placements (center and rotation) of the parts. Raises ``ModelDoesNotFit`` if a
+	part is too high for the printer and ``PlateFull`` if not all parts fit onto the bed.
+	"""
+
+	for part in meshes:
+		mesh.check_fits(part, volume)
+
+	bed = get_bed(volume)
+	center = (bed[0] + bed[2] / 2.0, bed[1] + bed[3] / 2.0)
+	obstacles = get_disallowed_rects(center, disallowed_areas)
+
+	sizes = [(float(part.size[0]) + 2 * margin, float(part.size[1]) + 2 * margin) for part in meshes]
+	placements = pack(sizes, bed, spacing=spacing, obstacles=obstacles, allow_rotation=allow_rotation)
+
+	parts = []
+	for part, (x, y, rotated) in zip(meshes, placements):
+		if rotated:
+			part = part.rotated_quarter()
+		parts.append(mesh.place_on_bed(part, dict(x=x, y=y)))
+	return mesh.merge(parts), placements
+
+
+def _split(free, used):
+	"""
+	Removes the ``used`` rectangle from the ``free`` ones, the remaining space is kept as maximal (overlapping)
+	rectangles.
+	"""
+
+	ux, uy, uw, ud = used
+	result = []
+	for rect in free:
+		x, y, w, d = rect
+		if ux >= x + w or ux + uw <= x or uy >= y + d or uy + ud <= y:
+			result.append(rect)
+			continue
+
+		if ux > x:
+			result.append((x, y, ux - x, d))
+		if ux + uw < x + w:
+			result.append((ux + uw, y, x + w - ux - uw, d))
+		if uy > y:
+			result.append((x, y, w, uy - y))
+		if uy + ud < y + d:
+			result.append((x, uy + ud, w, y + d - uy - ud))
+
+	# drop rectangles lying within others
+	pruned = []
+	for index, rect in enumerate(result):
+		if not any(other != rect and _contains(other, rect) or other == rect and other_index < index
+		           for other_index, other in enumerate(result) if other_index != index):
+			pruned.append(rect)
+	return pruned
+
+
+def _contains(outer, inner):
+	return outer[0] <= inner[0] and outer[1] <= inner[1] \
+	       and inner[0] + inner[2] <= outer[0] + outer[2] and inner[1] + inner[3] <= outer[1] + outer[3]
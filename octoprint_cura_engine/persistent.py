@@ -0,0 +1,349 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import octoprint.util
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+try:
+	# pyArcus, the socket library Cura talks to CuraEngine's "connect" mode with
+	import Arcus
+except ImportError:
+	Arcus = None
+
+
+PROTO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proto", "Cura.proto")
+
+
+def is_available():
+	return Arcus is not None
+
+
+class EngineConnectionError(Exception):
+	pass
+
+
+if Arcus is not None:
+	class _QueueListener(Arcus.SocketListener):
+		"""
+		Moves everything received on an Arcus socket into a queue, Arcus calls its listeners from its own thread.
+		"""
+
+		def __init__(self, socket, messages):
+			Arcus.SocketListener.__init__(self)
+			self._socket = socket
+			self._messages = messages
+
+		def stateChanged(self, state):
+			pass
+
+		def messageReceived(self):
+			self._messages.put(("message", self._socket.takeNextMessage()))
+
+		def error(self, error):
+			if error.isFatalError():
+				self._messages.put(("error", error.getErrorMessage()))
+
+
+class EngineConnection(object):
+	"""
+	A long-lived CuraEngine process in "connect" mode.
+
+	The engine loads the settings definition once at startup and then slices one job after the other, receiving each
+	job's setting overrides and mesh over a local socket instead of the command line.
+	"""
+
+	def __init__(self, executable, definition_path, startup_timeout=10.0, preexec=None):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.persistent")
+		self._engine_logger = logging.getLogger("octoprint.plugins.cura_engine.engine")
+
+		self.executable = executable
+		self.definition_path = definition_path
+		self.process = None
+
+		self._startup_timeout = startup_timeout
+		self._preexec = preexec
+		self._socket = None
+		self._listener = None
+		self._messages = queue.Queue()
+
+	@property
+	def alive(self):
+		return self.process is not None and self.process.poll() is None \
+		       and self._socket is not None and self._socket.getState() == Arcus.SocketState.Connected
+
+	def start(self):
+		port = _find_free_port()
+
+		self._socket = Arcus.Socket()
+		if not self._socket.registerAllMessageTypes(PROTO_PATH):
+			raise EngineConnectionError("Could not register the message types in {}".format(PROTO_PATH))
+		self._listener = _QueueListener(self._socket, self._messages)
+		self._socket.addListener(self._listener)
+		self._socket.listen("127.0.0.1", port)
+
+		command_args = [self.executable, "connect", "127.0.0.1:{port}".format(port=port), "-j", self.definition_path]
+		self._logger.info(u"Starting persistent engine: %r" % " ".join(command_args))
+		with open(os.devnull, "wb") as devnull:
+			self.process = subprocess.Popen(command_args, cwd=os.path.dirname(self.executable), stdout=devnull, stderr=subprocess.PIPE,
+			                                preexec_fn=self._preexec)
+
+		thread = threading.Thread(target=self._log_output, args=(self.process,), name="CuraEngineOutput-{}".format(port))
+		thread.daemon = True
+		thread.start()
+
+		deadline = time.time() + self._startup_timeout
+		while self._socket.getState() != Arcus.SocketState.Connected:
+			if self.process.poll() is not None or time.time() > deadline:
+				self.close()
+				raise EngineConnectionError("Engine did not connect on port {}".format(port))
+			time.sleep(0.05)
+
+	def slice(self, settings, triangles, machinecode_path, on_progress=None, watchdog=None):
+		"""
+		Slices the ``triangles`` (float32 array of shape (n, 3, 3)) with ``settings`` and writes the result to
+		``machinecode_path``. ``on_progress`` is called with the overall progress between 0 and 1.
+
+		The engine keeps settings from earlier jobs, so ``settings`` has to contain every setting, not just the ones
+		differing from the definition's defaults.
+
+		Returns a dict with the engine's print time estimate in seconds and the used material in mm^3, where
+		reported. Raises ``EngineConnectionError`` if the engine dies or the connection breaks while slicing, which
+		includes ``watchdog`` killing it.
+		"""
+
+		if not self.alive:
+			raise EngineConnectionError("Engine is not running")
+
+		# drop leftovers of an earlier, aborted job
+		while not self._messages.empty():
+			self._messages.get_nowait()
+
+		setting_list = self._socket.createMessage("cura.proto.SettingList")
+		for key, value in settings:
+			setting = setting_list.addRepeatedMessage("settings")
+			setting.name = key
+			setting.value = u"{}".format(value).encode("utf-8")
+		self._socket.sendMessage(setting_list)
+
+		if watchdog is not None:
+			watchdog.watch(self.process)
+
+		slice_message = self._socket.createMessage("cura.proto.Slice")
+		object_list = slice_message.addRepeatedMessage("object_lists")
+		obj = object_list.addRepeatedMessage("objects")
+		obj.id = 1
+		obj.vertices = triangles.astype("<f4").tobytes()
+		self._socket.sendMessage(slice_message)
+
+		result = dict()
+		prefix = b""
+		layers_path = machinecode_path + ".layers"
+		try:
+			with open(layers_path, "wb") as layers:
+				while True:
+					try:
+						kind, message = self._messages.get(timeout=0.5)
+					except queue.Empty:
+						if watchdog is not None:
+							watchdog.check()
+						if not self.alive:
+							raise EngineConnectionError("Engine went away while slicing")
+						continue
+
+					if watchdog is not None:
+						watchdog.feed()
+					if kind == "error":
+						raise EngineConnectionError(message)
+
+					type_name = message.getTypeName()
+					if type_name == "cura.proto.Progress":
+						if on_progress is not None:
+							on_progress(message.amount)
+					elif type_name == "cura.proto.GCodeLayer":
+						layers.write(message.data)
+					elif type_name == "cura.proto.GCodePrefix":
+						prefix = message.data
+					elif type_name == "cura.proto.ObjectPrintTime":
+						result["time"] = message.time
+						result["material"] = message.material_amount
+					elif type_name == "cura.proto.SlicingFinished":
+						break
+
+			# the prefix (header with print time, material usage, ...) is only known at the very end
+			with open(machinecode_path, "wb") as output:
+				output.write(prefix)
+				with open(layers_path, "rb") as layers:
+					shutil.copyfileobj(layers, output)
+		finally:
+			try:
+				os.remove(layers_path)
+			except OSError:
+				pass
+
+		return result
+
+	def close(self):
+		if self._socket is not None:
+			try:
+				self._socket.close()
+			except:
+				self._logger.exception(u"Error while closing the socket of the persistent engine")
+			self._socket = None
+
+		if self.process is not None and self.process.poll() is None:
+			try:
+				self.process.terminate()
+				self.process.wait()
+			except:
+				self._logger.exception(u"Error while stopping the persistent engine")
+
+	def _log_output(self, process):
+		for line in iter(process.stderr.readline, b""):
+			self._engine_logger.debug(line.decode("utf-8", "replace").rstrip())
+		process.stderr.close()
+
+
+class EnginePool(object):
+	"""
+	Keeps ``engines`` persistent engines warm and hands them out to slicing jobs one at a time.
+
+	Idle engines are health checked every ``health_check_interval`` seconds, engines that died are replaced. If more
+	jobs run in parallel than there are warm engines, additional engines get started on demand and are kept as long
+	as ``max_idle`` allows.
+	"""
+
+	def __init__(self, executable, definition_path, engines=1, max_idle=1, health_check_interval=10.0, preexec_factory=None):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.persistent")
+
+		self.executable = executable
+		self.definition_path = definition_path
+
+		# called for every engine started, so limits and priorities can follow the printer's state
+		self._preexec_factory = preexec_factory
+		self._engines = engines
+		self._max_idle = max(engines, max_idle)
+		self._busy = 0
+		self._idle = []
+		self._mutex = threading.Lock()
+		self._closed = False
+
+		self._timer = octoprint.util.RepeatedTimer(health_check_interval, self._check_health, run_first=True, daemon=True)
+		self._timer.start()
+
+	def configure(self, engines, max_idle):
+		with self._mutex:
+			self._engines = engines
+			self._max_idle = max(engines, max_idle)
+			surplus = self._idle[self._max_idle:]
+			del self._idle[self._max_idle:]
+
+		for connection in surplus:
+			connection.close()
+
+	def acquire(self):
+		"""
+		Returns a running engine connection, starting a new one if no healthy idle one is available.
+		"""
+
+		with self._mutex:
+			if self._closed:
+				raise EngineConnectionError("Engine pool has been closed")
+			self._busy += 1
+			while self._idle:
+				connection = self._idle.pop()
+				if connection.alive:
+					return connection
+				connection.close()
+
+		try:
+			return self._start_connection()
+		except:
+			with self._mutex:
+				self._busy -= 1
+			raise
+
+	def release(self, connection):
+		with self._mutex:
+			self._busy -= 1
+			if not self._closed and connection.alive and len(self._idle) < self._max_idle:
+				self._idle.append(connection)
+				return
+		connection.close()
+
+	def get_processes(self):
+		with self._mutex:
+			return [connection.process for connection in self._idle]
+
+	def recycle(self):
+		"""
+		Replaces the idle engines by fresh ones, e.g. to get rid of lowered priorities.
+		"""
+
+		with self._mutex:
+			idle, self._idle = self._idle, []
+		for connection in idle:
+			connection.close()
+		self._check_health()
+
+	def close(self):
+		self._timer.cancel()
+		with self._mutex:
+			self._closed = True
+			idle, self._idle = self._idle, []
+		for connection in idle:
+			connection.close()
+
+	def _start_connection(self):
+		preexec = self._preexec_factory() if self._preexec_factory is not None else None
+		connection = EngineConnection(self.executable, self.definition_path, preexec=preexec)
+		connection.start()
+		return connection
+
+	def _check_health(self):
+		with self._mutex:
+			if self._closed:
+				return
+			dead = [connection for connection in self._idle if not connection.alive]
+			self._idle = [connection for connection in self._idle if connection.alive]
+			missing = self._engines - len(self._idle) - self._busy
+
+		for connection in dead:
+			self._logger.warn(u"Persistent engine (pid %s) died, restarting it" % connection.process.pid)
+			connection.close()
+
+		for _ in range(missing):
+			try:
+				connection = self._start_connection()
+			except EngineConnectionError as e:
+				self._logger.error(u"Could not start persistent engine: %s" % str(e))
+				return
+			except:
+				self._logger.exception(u"Could not start persistent engine")
+				return
+
+			with self._mutex:
+				if self._closed:
+					connection.close()
+					return
+				self._idle.append(connection)
+
+
+def _find_free_port():
+	s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	try:
+		s.bind(("127.0.0.1", 0))
+		return s.getsockname()[1]
+	finally:
+		s.close()
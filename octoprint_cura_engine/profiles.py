@@ -0,0 +1,77 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import copy
+import os
+import threading
+
+import octoprint.util
+import yaml
+
+from collections import OrderedDict
+
+try:
+	# libyaml based C implementation, considerably faster than the pure Python one
+	from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+	from yaml import SafeLoader, SafeDumper
+
+
+class ProfileCache(object):
+	"""
+	In-process LRU cache of parsed YAML slicing profiles.
+
+	Entries are keyed on the profile's path and validated against its mtime, size and inode on every lookup, so
+	profiles changed on disk by other means are picked up transparently. Callers always get their own copy of the
+	profile and are free to modify it.
+	"""
+
+	def __init__(self, max_entries=128):
+		self._max_entries = max_entries
+		self._mutex = threading.Lock()
+		self._entries = OrderedDict()
+
+	def load(self, path):
+		stat = os.stat(path)
+		signature = (stat.st_mtime, stat.st_size, stat.st_ino)
+
+		with self._mutex:
+			entry = self._entries.pop(path, None)
+			if entry is not None and entry[0] == signature:
+				self._entries[path] = entry
+				return copy_profile(entry[1])
+
+		with open(path, "rb") as f:
+			profile_dict = yaml.load(f, Loader=SafeLoader)
+
+		self._put(path, signature, profile_dict)
+		return copy_profile(profile_dict)
+
+	def save(self, path, profile_dict):
+		with octoprint.util.atomic_write(path, "wb") as f:
+			yaml.dump(profile_dict, f, Dumper=SafeDumper, default_flow_style=False, indent=2, allow_unicode=True, encoding="utf-8")
+
+		stat = os.stat(path)
+		self._put(path, (stat.st_mtime, stat.st_size, stat.st_ino), copy_profile(profile_dict))
+
+	def invalidate(self, path=None):
+		with self._mutex:
+			if path is None:
+				self._entries.clear()
+			else:
+				self._entries.pop(path, None)
+
+	def _put(self, path, signature, profile_dict):
+		with self._mutex:
+			self._entries.pop(path, None)
+			self._entries[path] = (signature, profile_dict)
+			while len(self._entries) > self._max_entries:
+				self._entries.popitem(last=False)
+
+
+def copy_profile(profile_dict):
+	# profiles are flat mappings of mostly immutable scalars, only container values (polygons, ...) need a deep copy
+	if not isinstance(profile_dict, dict):
+		return profile_dict
+	return dict((key, copy.deepcopy(value) if isinstance(value, (dict, list)) else value)
+	            for key, value in profile_dict.items())
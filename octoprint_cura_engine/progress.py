@@ -0,0 +1,260 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+import octoprint.util
+
+from collections import OrderedDict
+
+from cura_engine_common.engine import ProgressThrottle
+
+
+# share of the engine's run time per stage, in the order the stages run, used until the first jobs have been observed
+DEFAULT_STAGE_WEIGHTS = OrderedDict([("slice", 0.1), ("layerparts", 0.05), ("inset+skin", 0.3), ("support", 0.1), ("export", 0.45)])
+
+FEATURE_NAMES = ("constant", "model_size", "model_size_per_layer_height", "model_size_times_infill")
+
+
+class ProgressTracker(object):
+	"""
+	Combines the engine's per stage progress into one monotonic value between 0 and 1, each stage contributing
+	according to its weight.
+	"""
+
+	def __init__(self, weights):
+		self._stages = list(weights.keys())
+		self._weights = dict(weights)
+		self._current = None
+		self.progress = 0.0
+
+	def update(self, stage, fraction):
+		"""
+		``fraction`` is the progress within ``stage``, or the overall progress if the engine doesn't report stages
+		(``stage`` is ``None``).
+		"""
+
+		fraction = min(max(fraction, 0.0), 1.0)
+		if stage is None:
+			value = fraction
+		else:
+			if stage not in self._weights:
+				# unknown stage, assume an average one running right after the current one
+				self._weights[stage] = sum(self._weights.values()) / len(self._weights) if self._weights else 1.0
+				index = self._stages.index(self._current) + 1 if self._current in self._stages else len(self._stages)
+				self._stages.insert(index, stage)
+			self._current = stage
+
+			index = self._stages.index(stage)
+			done = sum(self._weights[name] for name in self._stages[:index])
+			value = (done + self._weights[stage] * fraction) / sum(self._weights.values())
+
+		self.progress = max(self.progress, min(value, 1.0))
+		return self.progress
+
+
+class ProgressReporter(object):
+	"""
+	Tracks the progress of one job and hands it to ``callback`` together with the estimated remaining seconds
+	(``None`` if unknown) at most ``max_rate`` times per second.
+	"""
+
+	def __init__(self, callback, weights, predicted_duration=None, max_rate=None):
+		self._callback = callback
+		self._tracker = ProgressTracker(weights)
+		self._throttle = ProgressThrottle(self._report, max_rate)
+		self._predicted_duration = predicted_duration
+		self._started = time.time()
+
+	def update(self, stage, fraction):
+		self._throttle.update(self._tracker.update(stage, fraction))
+
+	def flush(self):
+		self._throttle.flush()
+
+	def _report(self, progress):
+		self._callback(progress, estimate_remaining(progress, time.time() - self._started, self._predicted_duration))
+
+
+class ProgressModel(object):
+	"""
+	What the plugin learned from past jobs, persisted as JSON at ``path``.
+
+	Keeps the average share of the engine's run time of every stage and a linear regression of the engine's run time
+	on a few job features (see ``job_features``). The regression is updated incrementally with exponential forgetting,
+	so it follows hardware and engine changes.
+	"""
+
+	MIN_SAMPLES = 3
+
+	def __init__(self, path, smoothing=0.2, forgetting=0.98, regularization=1e-3):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.progress")
+
+		self._path = path
+		self._smoothing = smoothing
+		self._forgetting = forgetting
+		self._regularization = regularization
+		self._mutex = threading.Lock()
+
+		size = len(FEATURE_NAMES)
+		self._weights = OrderedDict(DEFAULT_STAGE_WEIGHTS)
+		self._xtx = [[0.0] * size for _ in range(size)]
+		self._xty = [0.0] * size
+		self._samples = 0
+		self._coefficients = None
+
+		self._load()
+
+	def get_stage_weights(self):
+		with self._mutex:
+			return OrderedDict(self._weights)
+
+	def predict(self, features):
+		"""
+		Predicted run time of the engine in seconds, ``None`` while there isn't enough data.
+		"""
+
+		with self._mutex:
+			coefficients = self._coefficients
+		if coefficients is None:
+			return None
+
+		prediction = sum(c * x for c, x in zip(coefficients, features))
+		return prediction if prediction > 0 else None
+
+	def learn(self, features, phases):
+		"""
+		Updates the model with the ``phases`` (as recorded by ``JobTimer``) of a successful job.
+		"""
+
+		stages = OrderedDict((name[len("engine_"):], duration) for name, duration in phases.items()
+		                     if name.startswith("engine_") and name != "engine_connect")
+		duration = sum(stages.values())
+		if duration <= 0:
+			return
+
+		with self._mutex:
+			# stage shares, only if the engine reported its stages
+			stages.pop("startup", None)
+			stage_total = sum(stages.values())
+			if len(stages) > 1 and stage_total > 0:
+				weights = OrderedDict()
+				for name, stage_duration in stages.items():
+					share = stage_duration / stage_total
+					if name in self._weights:
+						share = (1 - self._smoothing) * self._weights[name] + self._smoothing * share
+					weights[name] = share
+				self._weights = weights
+
+			for i, xi in enumerate(features):
+				for j, xj in enumerate(features):
+					self._xtx[i][j] = self._forgetting * self._xtx[i][j] + xi * xj
+				self._xty[i] = self._forgetting * self._xty[i] + xi * duration
+			self._samples += 1
+
+			if self._samples >= self.MIN_SAMPLES:
+				self._coefficients = _solve(self._xtx, self._xty, self._regularization)
+
+			data = self._as_dict()
+
+		try:
+			with octoprint.util.atomic_write(self._path, "wb") as f:
+				f.write(json.dumps(data).encode("utf-8"))
+		except:
+			self._logger.exception(u"Could not save the progress model to %s" % self._path)
+
+	def _as_dict(self):
+		return dict(features=list(FEATURE_NAMES),
+		            stages=list(self._weights.items()),
+		            xtx=self._xtx,
+		            xty=self._xty,
+		            samples=self._samples)
+
+	def _load(self):
+		if not os.path.exists(self._path):
+			return
+
+		try:
+			with io.open(self._path, "rb") as f:
+				data = json.loads(f.read().decode("utf-8"))
+
+			if data.get("features") != list(FEATURE_NAMES):
+				self._logger.info(u"Progress model at %s was built from different features, starting over" % self._path)
+				return
+
+			self._weights = OrderedDict((name, weight) for name, weight in data["stages"])
+			self._xtx = data["xtx"]
+			self._xty = data["xty"]
+			self._samples = data["samples"]
+			if self._samples >= self.MIN_SAMPLES:
+				self._coefficients = _solve(self._xtx, self._xty, self._regularization)
+		except:
+			self._logger.exception(u"Could not load the progress model from %s, starting over" % self._path)
+
+
+def job_features(model_path, profile_dict):
+	"""
+	Features of a job the engine's run time is regressed on: the model's size (in MB, a proxy for its complexity),
+	scaled by the inverse layer height (number of layers) and by the infill density (amount of infill).
+	"""
+
+	size = os.stat(model_path).st_size / (1024.0 * 1024.0)
+	layer_height = _to_float(profile_dict.get("layer_height"), 0.1) or 0.1
+	infill = _to_float(profile_dict.get("infill_sparse_density"), 20.0)
+	return [1.0, size, size / layer_height, size * infill / 100.0]
+
+
+def estimate_remaining(progress, elapsed, predicted_duration=None):
+	"""
+	Remaining seconds, blending the predicted duration with an extrapolation of the progress so far. The further
+	the job, the more the extrapolation counts.
+	"""
+
+	extrapolated = None
+	if progress > 0.01:
+		extrapolated = elapsed / progress - elapsed
+
+	if predicted_duration is None:
+		return extrapolated
+
+	predicted = max(predicted_duration - elapsed, 0.0)
+	if extrapolated is None:
+		return predicted
+	return (1 - progress) * predicted + progress * extrapolated
+
+
+def _to_float(value, default):
+	try:
+		return float(value)
+	except (TypeError, ValueError):
+		return default
+
+
+def _solve(xtx, xty, regularization):
+	"""
+	Solves ``(xtx + regularization * I) * c = xty`` via Gaussian elimination with partial pivoting.
+	"""
+
+	size = len(xty)
+	matrix = [[xtx[i][j] + (regularization if i == j else 0.0) for j in range(size)] + [xty[i]] for i in range(size)]
+
+	for column in range(size):
+		pivot = max(range(column, size), key=lambda row: abs(matrix[row][column]))
+		if abs(matrix[pivot][column]) < 1e-12:
+			return None
+		matrix[column], matrix[pivot] = matrix[pivot], matrix[column]
+
+		for row in range(column + 1, size):
+			factor = matrix[row][column] / matrix[column][column]
+			for k in range(column, size + 1):
+				matrix[row][k] -= factor * matrix[column][k]
+
+	coefficients = [0.0] * size
+	for row in reversed(range(size)):
+		coefficients[row] = (matrix[row][size] - sum(matrix[row][k] * coefficients[k] for k in range(row + 1, size))) / matrix[row][row]
+	return coefficients
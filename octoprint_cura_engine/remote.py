@@ -0,0 +1,122 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+import requests
+
+
+class RemoteWorkerError(Exception):
+	pass
+
+
+class RemoteWorker(object):
+	"""
+	Client for one slicing worker (see ``cura_engine_common.worker``).
+	"""
+
+	def __init__(self, url, api_key=None, timeout=10.0):
+		self.url = url.rstrip("/")
+		self.failed_at = None
+
+		self._timeout = timeout
+		self._session = requests.Session()
+		if api_key:
+			self._session.headers["X-Api-Key"] = api_key
+
+	def get_status(self):
+		return self._request("get", "/status").json()
+
+	def submit(self, settings, model_path):
+		job_id = self._request("post", "/jobs", json=dict(settings=settings)).json()["id"]
+		with open(model_path, "rb") as f:
+			self._request("put", "/jobs/{}/model".format(job_id), data=f)
+		return job_id
+
+	def get_job(self, job_id):
+		return self._request("get", "/jobs/{}".format(job_id)).json()
+
+	def download(self, job_id, machinecode_path):
+		response = self._request("get", "/jobs/{}/gcode".format(job_id), stream=True)
+		with open(machinecode_path, "wb") as f:
+			for chunk in response.iter_content(chunk_size=64 * 1024):
+				f.write(chunk)
+
+	def remove(self, job_id):
+		try:
+			self._request("delete", "/jobs/{}".format(job_id))
+		except RemoteWorkerError:
+			pass
+
+	def _request(self, method, path, **kwargs):
+		try:
+			response = self._session.request(method, self.url + path, timeout=self._timeout, **kwargs)
+		except requests.RequestException as e:
+			raise RemoteWorkerError("{} is not reachable: {}".format(self.url, e))
+
+		if response.status_code >= 400:
+			raise RemoteWorkerError("{} {} on {} failed with status {}".format(method.upper(), path, self.url, response.status_code))
+		return response
+
+
+class WorkerPool(object):
+	"""
+	Spreads jobs over the remote workers, least loaded first.
+
+	Workers that fail are skipped for ``retry_interval`` seconds, as are workers whose settings definition doesn't
+	match ``definition_digest`` - they would slice with different settings.
+	"""
+
+	def __init__(self, urls, api_key=None, timeout=10.0, retry_interval=60.0, definition_digest=None):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.remote")
+
+		self.urls = list(urls)
+		self._workers = [RemoteWorker(url, api_key=api_key, timeout=timeout) for url in self.urls]
+		self._retry_interval = retry_interval
+		self._definition_digest = definition_digest
+		self._mutex = threading.Lock()
+		# jobs handed out by this pool per worker url, covers the time before the worker reports them itself
+		self._assigned = dict((url, 0) for url in self.urls)
+
+	def get_candidates(self):
+		"""
+		Available workers, least loaded first.
+		"""
+
+		now = time.time()
+		candidates = []
+		for worker in self._workers:
+			if worker.failed_at is not None and now - worker.failed_at < self._retry_interval:
+				continue
+
+			try:
+				status = worker.get_status()
+			except RemoteWorkerError as e:
+				self.mark_failed(worker, e)
+				continue
+
+			if self._definition_digest is not None and status.get("definition") != self._definition_digest:
+				self.mark_failed(worker, RemoteWorkerError("{} uses settings definition {}, not {}".format(worker.url, status.get("definition"),
+				                                                                                          self._definition_digest)))
+				continue
+
+			with self._mutex:
+				busy = max(status["running"] + status["queued"], self._assigned[worker.url])
+			candidates.append((float(busy) / max(status["slots"], 1), worker))
+
+		candidates.sort(key=lambda candidate: candidate[0])
+		return [worker for _, worker in candidates]
+
+	def assign(self, worker):
+		with self._mutex:
+			self._assigned[worker.url] += 1
+
+	def unassign(self, worker):
+		with self._mutex:
+			self._assigned[worker.url] -= 1
+
+	def mark_failed(self, worker, error):
+		self._logger.warn(u"Remote worker %s failed, not using it for %ds: %s" % (worker.url, self._retry_interval, str(error)))
+		worker.failed_at = time.time()
@@ -0,0 +1,199 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+
+from collections import OrderedDict
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+# jobs at this priority or lower are cancelled whenever a job of higher priority needs their slot
+PRIORITY_SPECULATIVE = 30
+
+
+class SlicingJob(object):
+	"""
+	A single slicing job, either waiting for a free engine slot or running.
+	"""
+
+	def __init__(self, machinecode_path, priority=PRIORITY_NORMAL):
+		self.id = str(uuid.uuid4())
+		self.machinecode_path = machinecode_path
+		self.priority = priority
+		self.state = "queued"
+		self.cancelled = False
+		self.process = None
+		self.preempted = False
+
+		self.progress = 0.0
+		# estimated remaining and predicted total engine run time in seconds
+		self.eta = None
+		self.predicted_duration = None
+
+		self.queued_at = time.time()
+		self.started_at = None
+
+	@property
+	def preemptible(self):
+		return self.priority >= PRIORITY_SPECULATIVE
+
+	def as_dict(self):
+		return dict(id=self.id,
+		            path=self.machinecode_path,
+		            priority=self.priority,
+		            state=self.state,
+		            cancelled=self.cancelled,
+		            preempted=self.preempted,
+		            progress=self.progress,
+		            eta=self.eta,
+		            predictedDuration=self.predicted_duration,
+		            queuedAt=self.queued_at,
+		            startedAt=self.started_at)
+
+
+class JobScheduler(object):
+	"""
+	Bounded pool of engine slots with a priority queue in front of it.
+
+	Jobs are handed out in order of priority, jobs of the same priority in FIFO order. ``do_slice`` calls happen in
+	their own threads, so instead of running the jobs itself the scheduler makes those threads wait until their job
+	has been granted one of the ``slots``.
+
+	Preemptible jobs (``PRIORITY_SPECULATIVE``) only use otherwise idle slots: submitting any other job while all slots
+	are taken cancels one of the running preemptible jobs.
+	"""
+
+	def __init__(self, slots=1):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.scheduler")
+
+		self._slots = max(1, slots)
+		self._running = 0
+
+		self._condition = threading.Condition()
+		self._queue = []
+		self._sequence = itertools.count()
+		self._jobs = OrderedDict()
+
+	@property
+	def slots(self):
+		return self._slots
+
+	def set_slots(self, slots):
+		with self._condition:
+			self._slots = max(1, slots)
+			self._condition.notify_all()
+
+	def submit(self, machinecode_path, priority=PRIORITY_NORMAL):
+		job = SlicingJob(machinecode_path, priority=priority)
+		with self._condition:
+			self._jobs[job.id] = job
+			heapq.heappush(self._queue, (priority, next(self._sequence), job))
+			if not job.preemptible and self._running >= self._slots:
+				self._preempt()
+			self._condition.notify_all()
+		return job
+
+	def wait_for_slot(self, job):
+		"""
+		Blocks until ``job`` may start. Returns ``False`` if it got cancelled while waiting.
+		"""
+
+		with self._condition:
+			while True:
+				if job.cancelled:
+					return False
+
+				self._discard_cancelled()
+				if self._running < self._slots and self._queue and self._queue[0][2] is job:
+					heapq.heappop(self._queue)
+					self._running += 1
+					job.state = "running"
+					job.started_at = time.time()
+					return True
+
+				self._condition.wait()
+
+	def attach_process(self, job, process):
+		"""
+		Registers the engine process of a running job so that it can be cancelled. Returns ``False`` (and terminates
+		the process) if the job was cancelled before the process got attached.
+		"""
+
+		with self._condition:
+			job.process = process
+			if job.cancelled:
+				_terminate(process)
+				return False
+			return True
+
+	def finish(self, job):
+		with self._condition:
+			if job.state == "running":
+				self._running -= 1
+			job.state = "done"
+			job.process = None
+			self._jobs.pop(job.id, None)
+			self._condition.notify_all()
+
+	def cancel(self, job_id):
+		with self._condition:
+			job = self._jobs.get(job_id)
+			if job is None:
+				return False
+			self._cancel(job)
+			return True
+
+	def cancel_by_path(self, machinecode_path):
+		with self._condition:
+			jobs = [job for job in self._jobs.values() if job.machinecode_path == machinecode_path]
+			for job in jobs:
+				self._cancel(job)
+			return [job.id for job in jobs]
+
+	def cancel_preemptible(self):
+		with self._condition:
+			jobs = [job for job in self._jobs.values() if job.preemptible and not job.cancelled]
+			for job in jobs:
+				job.preempted = True
+				self._cancel(job)
+			return [job.id for job in jobs]
+
+	def get_running_processes(self):
+		with self._condition:
+			return [(job, job.process) for job in self._jobs.values() if job.process is not None and not job.cancelled]
+
+	def get_jobs(self):
+		with self._condition:
+			return [job.as_dict() for job in self._jobs.values()]
+
+	def _cancel(self, job):
+		job.cancelled = True
+		if job.process is not None:
+			_terminate(job.process)
+		self._condition.notify_all()
+
+	def _preempt(self):
+		for job in self._jobs.values():
+			if job.preemptible and job.state == "running" and not job.cancelled:
+				self._logger.info(u"Preempting speculative job %s" % job.id)
+				job.preempted = True
+				self._cancel(job)
+				return
+
+	def _discard_cancelled(self):
+		while self._queue and self._queue[0][2].cancelled:
+			heapq.heappop(self._queue)
+
+
+def _terminate(process):
+	try:
+		process.terminate()
+	except:
+		logging.getLogger("octoprint.plugins.cura_engine.scheduler").exception(u"Could not terminate engine process")
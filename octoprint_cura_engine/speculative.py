@@ -0,0 +1,69 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import threading
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue
+
+
+class SpeculativeSlicer(object):
+	"""
+	Pre-slices uploaded models in the background, one model at a time.
+
+	``slice_model`` is called with the path of every submitted model and is expected to slice it into the slicing
+	cache. Models taken from the queue while ``is_paused`` returns ``True`` are dropped.
+	"""
+
+	def __init__(self, slice_model, is_paused):
+		self._logger = logging.getLogger("octoprint.plugins.cura_engine.speculative")
+
+		self._slice_model = slice_model
+		self._is_paused = is_paused
+
+		self._queue = queue.Queue()
+		self._pending = set()
+		self._mutex = threading.Lock()
+		self._thread = None
+
+	def submit(self, model_path):
+		with self._mutex:
+			if model_path in self._pending:
+				return
+			self._pending.add(model_path)
+			self._queue.put(model_path)
+
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._work, name="CuraEngineSpeculative")
+				self._thread.daemon = True
+				self._thread.start()
+
+	def clear(self):
+		with self._mutex:
+			while True:
+				try:
+					self._queue.get_nowait()
+				except queue.Empty:
+					break
+			self._pending.clear()
+
+	def _work(self):
+		while True:
+			model_path = self._queue.get()
+			with self._mutex:
+				if model_path not in self._pending:
+					# cleared while waiting
+					continue
+				self._pending.discard(model_path)
+
+			if self._is_paused():
+				self._logger.info(u"Not pre-slicing %s, the printer is busy" % model_path)
+				continue
+
+			try:
+				self._slice_model(model_path)
+			except:
+				self._logger.exception(u"Error while pre-slicing %s" % model_path)
@@ -14,6 +14,23 @@ $(function() {
             return self.pathBroken() || self.pathOk();
         });
 
+        self.configMaxConcurrentJobs = ko.observable();
+        self.configCacheEnabled = ko.observable();
+        self.configCacheMaxSize = ko.observable();
+        self.cacheStats = ko.observable();
+        self.cacheStatsText = ko.computed(function() {
+            var stats = self.cacheStats();
+            if (!stats || !stats.enabled) {
+                return "";
+            }
+            return _.sprintf(gettext("%(entries)d entries, %(size)s used, %(hits)d hits, %(misses)d misses"), {
+                entries: stats.entries,
+                size: formatSize(stats.size),
+                hits: stats.hits,
+                misses: stats.misses
+            });
+        });
+
         self.fileName = ko.observable();
         self.placeholderName = ko.observable();
         self.placeholderDisplayName = ko.observable();
@@ -71,9 +88,32 @@ $(function() {
 
         self.showPluginConfig = function() {
             self.configPathCuraEngine(self.settingsViewModel.settings.plugins.cura_engine.cura_engine_path());
+            self.configMaxConcurrentJobs(self.settingsViewModel.settings.plugins.cura_engine.max_concurrent_jobs());
+            self.configCacheEnabled(self.settingsViewModel.settings.plugins.cura_engine.cache.enabled());
+            self.configCacheMaxSize(self.settingsViewModel.settings.plugins.cura_engine.cache.max_size());
+            self.requestCacheStats();
             self.configurationDialog.modal();
         }
 
+        self.requestCacheStats = function() {
+            $.ajax({
+                url: PLUGIN_BASEURL + "cura_engine/cache",
+                type: "GET",
+                dataType: "json",
+                success: function(data) {
+                    self.cacheStats(data);
+                }
+            });
+        }
+
+        self.invalidateCache = function() {
+            $.ajax({
+                url: PLUGIN_BASEURL + "cura_engine/cache",
+                type: "DELETE",
+                success: self.requestCacheStats
+            });
+        }
+
         self.testCuraEnginePath = function() {
             $.ajax({
                 url: API_BASEURL + "util/test",
@@ -123,6 +163,11 @@ $(function() {
                 plugins: {
                     cura_engine: {
                         cura_engine_path: self.configPathCuraEngine(),
+                        max_concurrent_jobs: parseInt(self.configMaxConcurrentJobs()),
+                        cache: {
+                            enabled: self.configCacheEnabled(),
+                            max_size: parseInt(self.configCacheMaxSize())
+                        }
                     }
                 }
             }
@@ -283,27 +328,44 @@ $(function() {
 
             self.profileUnderEditID(data.key);
 
-            $.ajax({
-                url: PLUGIN_BASEURL + "cura_engine/getProfileDict",
-                type: "GET",
-                dataType: "json",
-                data: {profile_id: data.key},
-                success: function(data){
-                    self.profileUnderEdit(data);
-                }
+            self.cachedGetJson(PLUGIN_BASEURL + "cura_engine/getProfileDict", {profile_id: data.key}, function(data){
+                self.profileUnderEdit(data);
             });
 
+            self.cachedGetJson(PLUGIN_BASEURL + "cura_engine/getProfileEditorStruct", {}, function(data){
+                self.profileEditorStruct(data);
+            });
+
+            self.editProfileDialog.modal("show");
+        }
+
+        // responses of the profile editor endpoints by url, revalidated against their ETag on every request
+        self.editorResponseCache = {};
+
+        self.cachedGetJson = function(url, data, callback) {
+            var key = url + "?" + $.param(data);
+            var cached = self.editorResponseCache[key];
+
             $.ajax({
-                url: PLUGIN_BASEURL + "cura_engine/getProfileEditorStruct",
+                url: url,
                 type: "GET",
                 dataType: "json",
-                success: function(data){
-                    self.profileEditorStruct(data);
+                data: data,
+                headers: cached ? {"If-None-Match": cached.etag} : {},
+                success: function(response, textStatus, xhr) {
+                    if (xhr.status == 304 && cached) {
+                        callback(cached.data);
+                        return;
+                    }
+
+                    var etag = xhr.getResponseHeader("ETag");
+                    if (etag) {
+                        self.editorResponseCache[key] = {etag: etag, data: response};
+                    }
+                    callback(response);
                 }
             });
-
-            self.editProfileDialog.modal("show");
-        }
+        };
 
         ko.bindingHandlers.createSettingsFields = {
             init: function (element, valueAccessor, allBindingsAccessor, viewModel, bindingContext) {
@@ -405,8 +467,19 @@ $(function() {
                 .done(function(){
                     self.editProfileDialog.modal("hide");
                 })
-                .fail(function(){
-                    console.log("FAIL");
+                .fail(function(jqXHR){
+                    if (jqXHR.status == 400 && jqXHR.responseJSON && jqXHR.responseJSON.errors) {
+                        var errors = _.map(jqXHR.responseJSON.errors, function(error, key) {
+                            return key + ": " + error;
+                        });
+                        new PNotify({
+                            title: gettext("Invalid profile settings"),
+                            text: errors.join("<br>"),
+                            type: "error"
+                        });
+                    } else {
+                        console.log("FAIL");
+                    }
                 });
         }
     }
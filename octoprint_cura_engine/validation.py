@@ -0,0 +1,173 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import math
+
+from collections import OrderedDict
+
+
+BOOLEAN_TRUES = ("true", "yes", "on", "1")
+BOOLEAN_FALSES = ("false", "no", "off", "0")
+
+
+class ProfileValidationError(Exception):
+	"""
+	Raised for profiles with invalid settings, ``errors`` maps every invalid setting to what's wrong with it.
+	"""
+
+	def __init__(self, errors):
+		Exception.__init__(self, "; ".join(u"{}: {}".format(key, error) for key, error in errors.items()))
+		self.errors = errors
+
+
+class ProfileValidator(object):
+	"""
+	Checks profile values against the ``type``, ``min_value``, ``max_value`` and ``options`` of the settings in a
+	definition index (see ``SettingsDefinition.settings``).
+
+	The checks are built once per definition, validating a profile only runs the prebuilt check of every setting it
+	contains. Settings unknown to the definition are left alone.
+	"""
+
+	def __init__(self, settings):
+		self._types = dict()
+		self._checks = dict()
+		for key, setting in settings.items():
+			self._types[key] = setting.get("type")
+			check = _build_check(setting)
+			if check is not None:
+				self._checks[key] = check
+
+	def validate(self, profile_dict):
+		"""
+		Returns the errors of the settings in ``profile_dict`` ordered by key, empty if all of them are valid.
+		"""
+
+		errors = OrderedDict()
+		for key in sorted(profile_dict):
+			check = self._checks.get(key)
+			if check is None:
+				continue
+			error = check(profile_dict[key])
+			if error is not None:
+				errors[key] = error
+		return errors
+
+	def check(self, profile_dict):
+		"""
+		Raises ``ProfileValidationError`` if any setting in ``profile_dict`` is invalid.
+		"""
+
+		errors = self.validate(profile_dict)
+		if errors:
+			raise ProfileValidationError(errors)
+
+	def coerce(self, key, value):
+		"""
+		Converts the string ``value`` entered for ``key`` (e.g. in the profile editor) to the setting's type. Values
+		that don't convert are returned as is, for ``validate`` to report them.
+		"""
+
+		setting_type = self._types.get(key)
+		if setting_type == "boolean":
+			return _to_boolean(value, value)
+		elif setting_type == "int":
+			return _to_int(value, value)
+		elif setting_type == "float":
+			return _to_float(value, value)
+		elif setting_type in ("polygon", "polygons"):
+			try:
+				return json.loads(value)
+			except (TypeError, ValueError):
+				return value
+		return value
+
+
+def _build_check(setting):
+	setting_type = setting.get("type")
+
+	if setting_type in ("int", "float"):
+		convert = _to_int if setting_type == "int" else _to_float
+		minimum = _to_float(setting.get("min_value"), None)
+		maximum = _to_float(setting.get("max_value"), None)
+
+		def check_number(value):
+			number = convert(value, None)
+			if number is None:
+				return u"must be a{} {}, not {!r}".format("n" if setting_type == "int" else "", setting_type, value)
+			if minimum is not None and number < minimum:
+				return u"must be at least {}, not {}".format(setting["min_value"], number)
+			if maximum is not None and number > maximum:
+				return u"must be at most {}, not {}".format(setting["max_value"], number)
+			return None
+		return check_number
+
+	elif setting_type == "boolean":
+		def check_boolean(value):
+			if _to_boolean(value, None) is None:
+				return u"must be true or false, not {!r}".format(value)
+			return None
+		return check_boolean
+
+	elif setting_type == "enum" and setting.get("options"):
+		options = list(setting["options"])
+		# labels and the definition's own default are accepted as well, fdmprinter.json doesn't always use the keys
+		accepted = set(options) | set(setting["options"].values()) | set([setting.get("default")])
+
+		def check_enum(value):
+			if value not in accepted:
+				return u"must be one of {}, not {!r}".format(", ".join(options), value)
+			return None
+		return check_enum
+
+	elif setting_type in ("polygon", "polygons"):
+		def check_polygons(value):
+			if not isinstance(value, (list, tuple)):
+				try:
+					value = json.loads(value)
+				except (TypeError, ValueError):
+					return u"must be a list of points, not {!r}".format(value)
+			polygons = value if setting_type == "polygons" else [value]
+			if not isinstance(polygons, (list, tuple)) or not all(_is_polygon(polygon) for polygon in polygons):
+				return u"must be a {} of [x, y] points".format("list of polygons" if setting_type == "polygons" else "polygon")
+			return None
+		return check_polygons
+
+	return None
+
+
+def _is_polygon(polygon):
+	return isinstance(polygon, (list, tuple)) \
+	       and all(isinstance(point, (list, tuple)) and len(point) == 2 and all(_to_float(c, None) is not None for c in point)
+	               for point in polygon)
+
+
+def _to_float(value, default):
+	if isinstance(value, bool):
+		return default
+	try:
+		number = float(value)
+	except (TypeError, ValueError):
+		return default
+	if math.isnan(number) or math.isinf(number):
+		return default
+	return number
+
+
+def _to_int(value, default):
+	number = _to_float(value, None)
+	if number is None or number != int(number):
+		return default
+	return int(number)
+
+
+def _to_boolean(value, default):
+	if isinstance(value, bool):
+		return value
+	normalized = u"{}".format(value).strip().lower()
+	if normalized in BOOLEAN_TRUES:
+		return True
+	if normalized in BOOLEAN_FALSES:
+		return False
+	return default
@@ -0,0 +1,84 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine import analysis
+
+
+GCODE = b"""\
+;FLAVOR:RepRap
+G21
+G90
+M82
+G92 E0
+;LAYER:0
+G0 F6000 X0 Y0 Z0.2
+G1 F600 X10 Y0 E1
+G1 X10 Y10 E2
+G10
+G0 F6000 X0 Y10
+G11
+;LAYER:1
+G1 F600 X0 Y0 E3
+M84
+"""
+
+
+class CommandPatternTest(unittest.TestCase):
+
+	def test_moves(self):
+		match = analysis._COMMAND_PATTERN.match(b"G1 F600 X10 Y0 E1")
+		self.assertEqual(match.group("move"), b"G1")
+		self.assertEqual(match.group("x"), b"10")
+		self.assertEqual(match.group("e"), b"1")
+
+	def test_retractions_are_not_moves(self):
+		for line in (b"G10", b"G11", b"G10 P1 L2 X5"):
+			match = analysis._COMMAND_PATTERN.match(line)
+			self.assertTrue(match is None or match.group("move") is None, line)
+
+
+@unittest.skipUnless(analysis.is_available(), "requires NumPy")
+class AnalyseGcodeTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "test.gcode")
+		with open(self.path, "wb") as f:
+			f.write(GCODE)
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_totals(self):
+		result = analysis.analyse_gcode(self.path, filament_diameter=1.75)
+
+		self.assertEqual(result["layerCount"], 2)
+		self.assertEqual([layer["extrusion"] for layer in result["layers"]], [2.0, 1.0])
+		self.assertAlmostEqual(result["extrusionDistance"], 30.0)
+		self.assertAlmostEqual(result["travelDistance"], 0.2 + 10.0)
+		self.assertAlmostEqual(result["filament"]["tool0"]["length"], 3.0)
+		self.assertAlmostEqual(result["filament"]["tool0"]["volume"], 3.0 * 3.14159265 * 0.875 ** 2 / 1000.0, places=6)
+		# 30mm at 10mm/s and 10.2mm at 100mm/s
+		self.assertAlmostEqual(result["estimatedPrintTime"], 3.0 + 0.102, places=3)
+		self.assertEqual(result["dimensions"], dict(width=10.0, depth=10.0, height=0.0))
+
+	def test_chunks_give_the_same_result(self):
+		whole = analysis.analyse_gcode(self.path)
+		# smaller than most lines
+		chunked = analysis.analyse_gcode(self.path, chunk_size=16)
+
+		self.assertAlmostEqual(chunked.pop("estimatedPrintTime"), whole.pop("estimatedPrintTime"))
+		for chunked_layer, whole_layer in zip(chunked.pop("layers"), whole.pop("layers")):
+			self.assertAlmostEqual(chunked_layer.pop("time"), whole_layer.pop("time"))
+			self.assertEqual(chunked_layer, whole_layer)
+		self.assertEqual(chunked, whole)
+
+	def test_empty_file(self):
+		with open(self.path, "wb"):
+			pass
+		self.assertEqual(analysis.analyse_gcode(self.path)["layerCount"], 0)
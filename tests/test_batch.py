@@ -0,0 +1,216 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import flask
+import octoprint_cura_engine
+
+from octoprint_cura_engine import mesh
+from octoprint_cura_engine.batch import BatchItem, BatchJob
+
+from .util import FakeFileManager, FakePrinterProfileManager, FakeSlicingManager, create_model, create_plugin, set_default_profile
+
+
+def create_items(count):
+	return [BatchItem(index, "model{}.stl".format(index), "profile", "model{}.gco".format(index)) for index in range(count)]
+
+
+def wait_for(batch, timeout=5.0):
+	deadline = time.time() + timeout
+	while batch.finished_at is None and time.time() < deadline:
+		time.sleep(0.01)
+	return batch.finished_at is not None
+
+
+def succeed(batch, item):
+	item.state = "done"
+	item.progress = 1.0
+
+
+class BatchJobTest(unittest.TestCase):
+
+	def test_all_items_done(self):
+		batch = BatchJob(create_items(5), succeed, workers=2)
+		self.assertEqual(batch.state, "running")
+		batch.start()
+
+		self.assertTrue(wait_for(batch))
+		self.assertEqual(batch.state, "done")
+		self.assertEqual(batch.progress, 1.0)
+		self.assertEqual([item["state"] for item in batch.as_dict()["items"]], ["done"] * 5)
+
+	def test_failing_item(self):
+		def slice_item(batch, item):
+			if item.index == 1:
+				raise RuntimeError("boom")
+			succeed(batch, item)
+
+		batch = BatchJob(create_items(3), slice_item)
+		batch.start()
+
+		self.assertTrue(wait_for(batch))
+		self.assertEqual(batch.state, "failed")
+		self.assertEqual([item.state for item in batch.items], ["done", "failed", "done"])
+		self.assertIsNotNone(batch.items[1].error)
+
+	def test_workers_run_in_parallel(self):
+		running = []
+		peak = []
+		mutex = threading.Lock()
+
+		def slice_item(batch, item):
+			with mutex:
+				running.append(item)
+				peak.append(len(running))
+			time.sleep(0.05)
+			with mutex:
+				running.remove(item)
+			succeed(batch, item)
+
+		batch = BatchJob(create_items(6), slice_item, workers=3)
+		batch.start()
+
+		self.assertTrue(wait_for(batch))
+		self.assertEqual(max(peak), 3)
+
+	def test_cancel(self):
+		started = threading.Event()
+		release = threading.Event()
+
+		def slice_item(batch, item):
+			started.set()
+			release.wait(5.0)
+			item.state = "cancelled" if batch.cancelled else "done"
+
+		batch = BatchJob(create_items(3), slice_item)
+		batch.start()
+		self.assertTrue(started.wait(5.0))
+		batch.cancel()
+		release.set()
+
+		self.assertTrue(wait_for(batch))
+		self.assertEqual(batch.state, "cancelled")
+		self.assertEqual([item.state for item in batch.items], ["cancelled"] * 3)
+
+	def test_progress(self):
+		items = create_items(4)
+		batch = BatchJob(items, succeed)
+		items[0].state = "done"
+		items[1].state = "failed"
+		items[2].progress = 0.5
+
+		self.assertEqual(batch.progress, (1.0 + 1.0 + 0.5 + 0.0) / 4)
+		self.assertEqual(BatchJob([], succeed).progress, 1.0)
+
+
+class BatchEndpointTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.plugin._file_manager = FakeFileManager(self.folder)
+		self.plugin._printer_profile_manager = FakePrinterProfileManager()
+		self.plugin._slicing_manager = FakeSlicingManager(self.folder)
+		create_model(self.folder)
+
+		self.app = flask.Flask(__name__)
+		self.app.add_url_rule("/batch/<batch_id>", "plugin.cura_engine.get_batch", self.plugin.get_batch)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_default_profile(self):
+		profile_path = self.plugin._slicing_manager.get_profile_path("cura_engine", "fine")
+		octoprint_cura_engine.save_profile_dict_to_yaml(profile_path, dict(self.plugin._definition.get_defaults(), layer_height=0.05))
+		set_default_profile(self.plugin, "fine")
+
+		batch = self._start(dict(models=["cube.stl"]))
+		self.assertEqual([item.profile for item in batch.items], [None])
+		self.assertEqual(batch.state, "done")
+		self.assertTrue(os.path.exists(os.path.join(self.folder, "cube.gco")))
+
+	def test_without_default_profile(self):
+		set_default_profile(self.plugin, None)
+		self.assertEqual(self._start(dict(models=["cube.stl"])).state, "done")
+
+	def test_unknown_profile(self):
+		with self.app.test_request_context(json=dict(models=["cube.stl"], profiles=["unknown"])):
+			response = self.plugin.start_batch()
+		self.assertEqual(response.status_code, 404)
+
+	def _start(self, data):
+		with self.app.test_request_context(json=data):
+			response = self.plugin.start_batch()
+		self.assertEqual(response.status_code, 202, response.get_data())
+
+		batch = self.plugin._batches[response.get_json()["id"]]
+		self.assertTrue(wait_for(batch, timeout=30.0))
+		return batch
+
+
+@unittest.skipUnless(mesh.is_available(), "NumPy is not available")
+class PlateEndpointTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.plugin._file_manager = FakeFileManager(self.folder)
+		self.plugin._printer_profile_manager = FakePrinterProfileManager()
+		self.plugin._slicing_manager = FakeSlicingManager(self.folder)
+		create_model(self.folder)
+
+		self.app = flask.Flask(__name__)
+		self.app.add_url_rule("/batch/<batch_id>", "plugin.cura_engine.get_batch", self.plugin.get_batch)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_without_default_profile(self):
+		set_default_profile(self.plugin, None)
+		batch, _ = self._start(dict(models=["cube.stl"]))
+		self.assertEqual(batch.state, "done")
+		self.assertTrue(os.path.exists(os.path.join(self.folder, "cube_plate.gco")))
+
+	def test_plate_in_the_engine_frame(self):
+		bounds = []
+		build_command = self.plugin._build_command
+		def record_model(executable, model_path, *args, **kwargs):
+			bounds.append(mesh.read_stl(model_path).bounds)
+			return build_command(executable, model_path, *args, **kwargs)
+		self.plugin._build_command = record_model
+
+		batch, placements = self._start(dict(models=["cube.stl"]))
+		self.assertEqual(batch.state, "done")
+
+		# the engine moves the plate by half the bed of 200x200mm, so the cube ends up where it was placed
+		x, y = placements[0]["x"], placements[0]["y"]
+		minimum, maximum = bounds[0]
+		self.assertEqual(minimum.tolist(), [x - 105.0, y - 105.0, 0.0])
+		self.assertEqual(maximum.tolist(), [x - 95.0, y - 95.0, 10.0])
+
+	def test_unknown_profile(self):
+		with self.app.test_request_context(json=dict(models=["cube.stl"], profile="unknown")):
+			response = self.plugin.start_plate()
+		self.assertEqual(response.status_code, 404)
+
+	def _start(self, data):
+		with self.app.test_request_context(json=data):
+			response = self.plugin.start_plate()
+		self.assertEqual(response.status_code, 202, response.get_data())
+
+		result = response.get_json()
+		batch = self.plugin._batches[result["id"]]
+		self.assertTrue(wait_for(batch, timeout=30.0))
+		return batch, result["placements"]
+
+
+if __name__ == "__main__":
+	unittest.main()
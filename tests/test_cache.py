@@ -0,0 +1,131 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine.cache import SliceCache
+
+
+ANALYSIS = dict(estimatedPrintTime=60.0,
+                layerCount=2,
+                layers=[dict(layer=0, extrusion=1.0, time=30.0), dict(layer=1, extrusion=1.0, time=30.0)])
+
+
+class SliceCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.cache_folder = os.path.join(self.folder, "cache")
+		self.model_path = self._write("model.stl", b"solid cube\nendsolid cube\n")
+		self.executable = self._write("CuraEngine", b"#!/bin/sh\n")
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_key_depends_on_all_inputs(self):
+		cache = SliceCache(self.cache_folder)
+		key = cache.compute_key(self.model_path, dict(layer_height=0.1), "definition", self.executable)
+
+		self.assertEqual(key, cache.compute_key(self.model_path, dict(layer_height=0.1), "definition", self.executable))
+		self.assertNotEqual(key, cache.compute_key(self.model_path, dict(layer_height=0.2), "definition", self.executable))
+		self.assertNotEqual(key, cache.compute_key(self.model_path, dict(layer_height=0.1), "other", self.executable))
+
+		self._write("model.stl", b"solid other\nendsolid other\n")
+		self.assertNotEqual(key, cache.compute_key(self.model_path, dict(layer_height=0.1), "definition", self.executable))
+
+	def test_miss_then_hit(self):
+		cache = SliceCache(self.cache_folder)
+		target = os.path.join(self.folder, "restored.gco")
+
+		self.assertIsNone(cache.lookup("key", target))
+		cache.store("key", self._write("output.gco", b"G28\n"), ANALYSIS)
+		self.assertEqual(cache.lookup("key", target), ANALYSIS)
+		self._assert_content(target, b"G28\n")
+		self.assertEqual(cache.get_stats()["hits"], 1)
+		self.assertEqual(cache.get_stats()["misses"], 1)
+
+	def test_compressed_entries(self):
+		cache = SliceCache(self.cache_folder, compress=True)
+		cache.store("key", self._write("output.gco", b"G28\n" * 100), ANALYSIS)
+		self.assertTrue(os.path.exists(os.path.join(self.cache_folder, "key.gcode.gz")))
+
+		target = os.path.join(self.folder, "restored.gco")
+		self.assertEqual(cache.lookup("key", target), ANALYSIS)
+		self._assert_content(target, b"G28\n" * 100)
+
+	def test_entries_are_copies(self):
+		cache = SliceCache(self.cache_folder)
+		output = self._write("output.gco", b"G28\n")
+		cache.store("key", output, ANALYSIS)
+
+		# modifying either side must not touch the other
+		self._write("output.gco", b"G1 X10\n")
+		target = os.path.join(self.folder, "restored.gco")
+		cache.lookup("key", target)
+		self._assert_content(target, b"G28\n")
+		with open(target, "ab") as f:
+			f.write(b"M84\n")
+		cache.lookup("key", os.path.join(self.folder, "again.gco"))
+		self._assert_content(os.path.join(self.folder, "again.gco"), b"G28\n")
+
+	def test_evicts_least_recently_used(self):
+		cache = SliceCache(self.cache_folder, max_size=10)
+		cache.store("a", self._write("a.gco", b"1234"), ANALYSIS)
+		cache.store("b", self._write("b.gco", b"1234"), ANALYSIS)
+		cache.lookup("a", os.path.join(self.folder, "restored.gco"))
+		cache.store("c", self._write("c.gco", b"1234"), ANALYSIS)
+
+		self.assertIsNone(cache.lookup("b", os.path.join(self.folder, "restored.gco")))
+		self.assertIsNotNone(cache.lookup("a", os.path.join(self.folder, "restored.gco")))
+		self.assertIsNotNone(cache.lookup("c", os.path.join(self.folder, "restored.gco")))
+		self.assertFalse(os.path.exists(os.path.join(self.cache_folder, "b.gcode")))
+		self.assertFalse(os.path.exists(os.path.join(self.cache_folder, "b.layers.json")))
+
+	def test_index_keeps_summary_only(self):
+		cache = SliceCache(self.cache_folder)
+		cache.store("key", self._write("output.gco", b"G28\n"), ANALYSIS)
+
+		with open(os.path.join(self.cache_folder, "index.json")) as f:
+			index = json.loads(f.read())
+		self.assertNotIn("layers", index["key"]["analysis"])
+		self.assertEqual(index["key"]["analysis"]["layerCount"], 2)
+
+		# layers survive a restart
+		restarted = SliceCache(self.cache_folder)
+		self.assertEqual(restarted.lookup("key", os.path.join(self.folder, "restored.gco")), ANALYSIS)
+
+	def test_hits_defer_index_writes(self):
+		cache = SliceCache(self.cache_folder)
+		cache.store("key", self._write("output.gco", b"G28\n"), ANALYSIS)
+		index_path = os.path.join(self.cache_folder, "index.json")
+		saved = os.path.getmtime(index_path)
+		os.utime(index_path, (saved - 10, saved - 10))
+
+		for _ in range(5):
+			cache.lookup("key", os.path.join(self.folder, "restored.gco"))
+		self.assertEqual(os.path.getmtime(index_path), saved - 10)
+
+		cache.flush()
+		self.assertNotEqual(os.path.getmtime(index_path), saved - 10)
+
+	def test_invalidate(self):
+		cache = SliceCache(self.cache_folder)
+		cache.store("key", self._write("output.gco", b"G28\n"), ANALYSIS)
+		cache.invalidate()
+
+		self.assertEqual(cache.get_stats()["entries"], 0)
+		self.assertEqual(sorted(os.listdir(self.cache_folder)), ["index.json"])
+
+	def _write(self, name, data):
+		path = os.path.join(self.folder, name)
+		with open(path, "wb") as f:
+			f.write(data)
+		return path
+
+	def _assert_content(self, path, data):
+		with open(path, "rb") as f:
+			self.assertEqual(f.read(), data)
@@ -0,0 +1,96 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from cura_engine_common.definition import iter_settings
+
+from .util import PRINTER_PROFILE, create_plugin
+
+
+def get_settings(command):
+	return [command[index + 1] for index, arg in enumerate(command) if arg == "-s"]
+
+
+def get_definition(command):
+	return command[command.index("-j") + 1]
+
+
+class BuildCommandTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.defaults = self.plugin._definition.get_defaults()
+		self.model_path = os.path.join(self.folder, "cube.stl")
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def _build(self, profile_dict, machinecode_path=None, stream_output=False):
+		return self.plugin._build_command("CuraEngine", self.model_path, PRINTER_PROFILE, machinecode_path, profile_dict,
+		                                  None, stream_output=stream_output)
+
+	def test_only_overridden_settings_passed(self):
+		profile = dict(self.defaults, layer_height=0.25, _internal="ignored")
+		command = self._build(profile, machinecode_path="/tmp/out.gco")
+
+		self.assertEqual(command[:4], ["CuraEngine", "slice", "-v", "-p"])
+		self.assertEqual(get_definition(command), self.plugin._get_definition_path())
+		# the printer profile's volume differs from the definition's default machine size
+		self.assertEqual(sorted(get_settings(command)), ["layer_height=0.25", "machine_depth=200", "machine_height=200", "machine_width=200"])
+		self.assertEqual(command[-4:], ["-l", self.model_path, "-o", "/tmp/out.gco"])
+
+	def test_unknown_settings_passed(self):
+		command = self._build(dict(self.defaults, some_new_setting=1))
+		self.assertIn("some_new_setting=1", get_settings(command))
+
+	def test_default_output_path(self):
+		command = self._build(dict(self.defaults))
+		self.assertEqual(command[-1], os.path.join(self.folder, "cube.gco"))
+
+	def test_streamed_output(self):
+		command = self._build(dict(self.defaults), stream_output=True)
+		self.assertNotIn("-o", command)
+		self.assertEqual(command[-2:], ["-l", self.model_path])
+
+	def test_all_settings_passed(self):
+		self.plugin._settings._values["engine_settings"] = "full"
+		command = self._build(dict(self.defaults))
+		self.assertEqual(len(get_settings(command)), len(self.defaults))
+
+	def test_many_overrides_go_into_a_settings_file(self):
+		self.plugin._settings._values["engine_settings_file_threshold"] = 2
+		profile = dict(self.defaults, layer_height=0.25, infill_sparse_density=42, some_new_setting=1)
+		command = self._build(profile)
+
+		# only what the definition doesn't know remains on the command line
+		self.assertEqual(get_settings(command), ["some_new_setting=1"])
+
+		definition_path = get_definition(command)
+		self.assertEqual(os.path.dirname(definition_path), os.path.join(self.plugin.get_plugin_data_folder(), "settings"))
+		with open(definition_path, "rb") as f:
+			defaults = dict(iter_settings(json.loads(f.read().decode("utf-8"))))
+		self.assertEqual(defaults["layer_height"]["default"], 0.25)
+		self.assertEqual(defaults["infill_sparse_density"]["default"], 42)
+		self.assertEqual(defaults["machine_width"]["default"], 200)
+
+		# the same overrides reuse the generated file
+		self.assertEqual(get_definition(self._build(dict(profile))), definition_path)
+
+	def test_effective_settings(self):
+		settings = dict(self.plugin._get_effective_settings(PRINTER_PROFILE, dict(layer_height=0.25, _internal=1)))
+
+		self.assertEqual(settings["layer_height"], 0.25)
+		self.assertEqual(settings["machine_width"], 200)
+		self.assertEqual(settings["infill_sparse_density"], self.defaults["infill_sparse_density"])
+		self.assertNotIn("_internal", settings)
+
+
+if __name__ == "__main__":
+	unittest.main()
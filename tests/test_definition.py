@@ -0,0 +1,140 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from collections import OrderedDict
+
+from cura_engine_common.definition import SettingsDefinition, iter_settings
+
+
+DEFINITION = OrderedDict([
+	("machine_settings", OrderedDict([
+		("machine_width", dict(default=200, type="int")),
+	])),
+	("categories", OrderedDict([
+		("resolution", OrderedDict([
+			("label", "Quality"),
+			("settings", OrderedDict([
+				("layer_height", OrderedDict([
+					("label", "Layer Height"),
+					("default", 0.1),
+					("type", "float"),
+					("unit", "mm"),
+					("children", OrderedDict([
+						("layer_height_0", dict(label="Initial Layer Height", default=0.3, type="float", visible=False)),
+					])),
+				])),
+			])),
+		])),
+		("infill", OrderedDict([
+			("label", "Infill"),
+			("settings", OrderedDict([
+				("infill_sparse_density", dict(label="Infill Density", default=20, type="float", min_value="0")),
+			])),
+		])),
+	])),
+])
+
+
+class SettingsDefinitionTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "definition.json")
+		self.cache_path = os.path.join(self.folder, "definition.index")
+		self._write_definition(DEFINITION)
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def _write_definition(self, definition):
+		with open(self.path, "wb") as f:
+			f.write(json.dumps(definition).encode("utf-8"))
+
+	def test_index(self):
+		definition = SettingsDefinition(self.path)
+
+		self.assertEqual(list(definition.settings), ["machine_width", "layer_height", "layer_height_0", "infill_sparse_density"])
+		self.assertEqual(definition.categories, OrderedDict([("Quality", ["layer_height", "layer_height_0"]),
+		                                                     ("Infill", ["infill_sparse_density"])]))
+		self.assertIsNone(definition.get("machine_width")["category"])
+		self.assertEqual(definition.get("layer_height_0")["category"], "Quality")
+		self.assertNotIn("visible", definition.get("layer_height_0"))
+		self.assertIsNone(definition.get("unknown"))
+
+	def test_defaults(self):
+		definition = SettingsDefinition(self.path)
+		self.assertEqual(definition.get_defaults(), dict(machine_width=200, layer_height=0.1, layer_height_0=0.3, infill_sparse_density=20))
+
+	def test_profile_struct(self):
+		struct = SettingsDefinition(self.path).get_profile_struct()
+
+		self.assertEqual(list(struct), ["Quality", "Infill"])
+		self.assertEqual(struct["Quality"]["layer_height"], dict(label="Layer Height", default=0.1, type="float", unit="mm"))
+		self.assertNotIn("category", struct["Infill"]["infill_sparse_density"])
+
+	def test_cache_reused(self):
+		SettingsDefinition(self.path, cache_path=self.cache_path).settings
+		self.assertTrue(os.path.exists(self.cache_path))
+
+		# tamper with the cached index, an unchanged definition must not be parsed again
+		with open(self.cache_path, "rb") as f:
+			index = pickle.load(f)
+		index["settings"]["machine_width"]["default"] = 300
+		with open(self.cache_path, "wb") as f:
+			pickle.dump(index, f)
+
+		definition = SettingsDefinition(self.path, cache_path=self.cache_path)
+		self.assertEqual(definition.get("machine_width")["default"], 300)
+
+	def test_cache_rebuilt_on_change(self):
+		first = SettingsDefinition(self.path, cache_path=self.cache_path)
+		digest = first.digest
+
+		changed = json.loads(json.dumps(DEFINITION), object_pairs_hook=OrderedDict)
+		changed["machine_settings"]["machine_width"]["default"] = 2500
+		self._write_definition(changed)
+
+		second = SettingsDefinition(self.path, cache_path=self.cache_path)
+		self.assertEqual(second.get("machine_width")["default"], 2500)
+		self.assertNotEqual(second.digest, digest)
+
+	def test_broken_cache_rebuilt(self):
+		with open(self.cache_path, "wb") as f:
+			f.write(b"garbage")
+
+		definition = SettingsDefinition(self.path, cache_path=self.cache_path)
+		self.assertEqual(definition.get("machine_width")["default"], 200)
+
+	def test_broken_definition(self):
+		with open(self.path, "wb") as f:
+			f.write(b"{")
+		with self.assertRaises(IOError):
+			SettingsDefinition(self.path).settings
+
+	def test_write_with_defaults(self):
+		target = os.path.join(self.folder, "written.json")
+		SettingsDefinition(self.path).write_with_defaults(target, dict(layer_height_0=0.2, machine_width=150))
+
+		with open(target, "rb") as f:
+			written = json.loads(f.read().decode("utf-8"), object_pairs_hook=OrderedDict)
+		defaults = dict((key, setting["default"]) for key, setting in iter_settings(written))
+		self.assertEqual(defaults, dict(machine_width=150, layer_height=0.1, layer_height_0=0.2, infill_sparse_density=20))
+		self.assertFalse(written["categories"]["resolution"]["settings"]["layer_height"]["children"]["layer_height_0"]["visible"])
+
+	def test_bundled_definition(self):
+		path = os.path.join(os.path.dirname(__file__), "..", "octoprint_cura_engine", "profiles", "fdmprinter.json")
+		definition = SettingsDefinition(path)
+		self.assertIn("layer_height", definition.settings)
+		self.assertEqual(sum(len(keys) for keys in definition.categories.values()) + len([s for s in definition.settings.values() if s["category"] is None]),
+		                 len(definition.settings))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,42 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import shutil
+import tempfile
+import unittest
+
+import octoprint_cura_engine
+
+from .util import create_plugin
+
+
+class ProfileEditorStructTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_only_editable_settings(self):
+		body, _, _ = self.plugin._get_editor_struct_payload()
+
+		struct = json.loads(body.decode("utf-8"))
+		keys = set(key for settings in struct.values() for key in settings)
+		self.assertTrue(keys)
+		self.assertTrue(keys <= set(octoprint_cura_engine.editable_profile_settings))
+
+	def test_etag_depends_on_editable_settings(self):
+		_, _, etag = self.plugin._get_editor_struct_payload()
+		self.assertEqual(self.plugin._get_editor_struct_payload()[2], etag)
+
+		editable = octoprint_cura_engine.editable_profile_settings
+		removed = editable.pop()
+		try:
+			self.plugin._editor_struct_payload = None
+			self.assertNotEqual(self.plugin._get_editor_struct_payload()[2], etag)
+		finally:
+			editable.append(removed)
@@ -0,0 +1,119 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from cura_engine_common import engine
+from cura_engine_common.engine import EngineOutputReader, EngineWatchdog, ProgressThrottle, lower_process_priority
+
+
+def start_sleeper():
+	return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+
+class EngineOutputReaderTest(unittest.TestCase):
+
+	def test_reads_complete_lines(self):
+		p = subprocess.Popen([sys.executable, "-c", "import sys; sys.stderr.write('Progress:slice:1:2 50%\\nPrint time: 10\\nunterminated')"],
+		                     stderr=subprocess.PIPE)
+		reader = EngineOutputReader(p.stderr)
+
+		lines = []
+		while True:
+			read = reader.read_lines(timeout=1.0)
+			if read is None:
+				break
+			lines += read
+		p.wait()
+		p.stderr.close()
+
+		self.assertEqual(lines, ["Progress:slice:1:2 50%", "Print time: 10", "unterminated"])
+
+
+class ProgressThrottleTest(unittest.TestCase):
+
+	def test_keeps_latest_value(self):
+		reported = []
+		throttle = ProgressThrottle(reported.append, 1)
+		for progress in (0.1, 0.2, 0.3):
+			throttle.update(progress)
+		throttle.flush()
+
+		self.assertEqual(reported, [0.1, 0.3])
+
+
+class EngineWatchdogTest(unittest.TestCase):
+
+	def test_kills_silent_engine(self):
+		p = start_sleeper()
+		try:
+			watchdog = EngineWatchdog(silence_timeout=0.1)
+			watchdog.watch(p)
+			self.assertFalse(watchdog.check())
+			time.sleep(0.2)
+			self.assertTrue(watchdog.check())
+			self.assertEqual(p.wait(), -9)
+			self.assertIn("no output", watchdog.reason)
+		finally:
+			if p.poll() is None:
+				p.kill()
+				p.wait()
+
+
+@unittest.skipIf(os.name == "nt", "no preexec_fn on Windows")
+class CreatePreexecTest(unittest.TestCase):
+
+	def test_memory_limit(self):
+		limit = 4 * 1024 * 1024 * 1024
+		preexec = engine.create_preexec(memory_limit=limit)
+
+		# nothing may be imported in the child, make that fail
+		resource = sys.modules.get("resource")
+		sys.modules["resource"] = None
+		try:
+			output = subprocess.check_output([sys.executable, "-c", "import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0])"],
+			                                 preexec_fn=preexec)
+		finally:
+			if resource is not None:
+				sys.modules["resource"] = resource
+			else:
+				del sys.modules["resource"]
+
+		self.assertEqual(int(output), limit)
+
+	def test_nothing_to_change(self):
+		self.assertIsNone(engine.create_preexec())
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "reads the niceness from /proc")
+class LowerProcessPriorityTest(unittest.TestCase):
+
+	def test_renice(self):
+		self._assert_reniced()
+
+	def test_renice_without_os_setpriority(self):
+		# like on Python 2
+		functions = dict((name, getattr(os, name)) for name in ("getpriority", "setpriority") if hasattr(os, name))
+		for name in functions:
+			delattr(os, name)
+		try:
+			self.assertTrue(engine.can_renice())
+			self._assert_reniced()
+		finally:
+			for name, function in functions.items():
+				setattr(os, name, function)
+
+	def _assert_reniced(self):
+		p = start_sleeper()
+		try:
+			niceness = os.nice(0) + 5
+			lower_process_priority(p.pid, niceness=niceness)
+			with open("/proc/{}/stat".format(p.pid)) as f:
+				self.assertEqual(int(f.read().rsplit(")", 1)[1].split()[16]), niceness)
+		finally:
+			p.kill()
+			p.wait()
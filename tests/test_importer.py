@@ -0,0 +1,159 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import octoprint_cura_engine
+from octoprint_cura_engine import importer
+
+from .util import create_plugin
+
+
+def profile_json(layer_height):
+	return json.dumps(dict(settings=dict(layer_height=dict(default=layer_height)))).encode("utf-8")
+
+
+class FakeSlicingManager(object):
+	"""
+	Saves profiles like OctoPrint's slicing manager, failing on the ``fail_on``th save.
+	"""
+
+	def __init__(self, folder, fail_on=None):
+		self.folder = folder
+		self.fail_on = fail_on
+		self.saves = 0
+
+	def get_profile_path(self, slicer, name):
+		return os.path.join(self.folder, name + ".profile")
+
+	def save_profile(self, slicer, name, profile_dict, allow_overwrite=True, display_name=None, description=None):
+		self.saves += 1
+		if self.saves == self.fail_on:
+			raise IOError("Disk full")
+		octoprint_cura_engine.save_profile_dict_to_yaml(self.get_profile_path(slicer, name), profile_dict)
+
+
+class ImporterTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_single_file(self):
+		path = self._write("upload", profile_json(0.1))
+		items = importer.read_items("fine.json", path)
+
+		self.assertEqual([item.display_name for item in items], ["fine"])
+
+	def test_zip(self):
+		path = os.path.join(self.folder, "upload")
+		with zipfile.ZipFile(path, "w") as archive:
+			archive.writestr("profiles/fine.json", profile_json(0.1))
+			archive.writestr("profiles/coarse.json", profile_json(0.3))
+			archive.writestr("profiles/readme.txt", b"not a profile")
+			archive.writestr("profiles/.hidden.json", profile_json(0.2))
+
+		items = importer.read_items("profiles.zip", path)
+		self.assertEqual(sorted(item.display_name for item in items), ["coarse", "fine"])
+
+	def test_tar(self):
+		path = os.path.join(self.folder, "upload")
+		with tarfile.open(path, "w:gz") as archive:
+			data = profile_json(0.1)
+			info = tarfile.TarInfo("fine.json")
+			info.size = len(data)
+			archive.addfile(info, io.BytesIO(data))
+
+		items = importer.read_items("profiles.tar.gz", path)
+		self.assertEqual([item.display_name for item in items], ["fine"])
+		self.assertEqual(items[0].data, profile_json(0.1))
+
+	def test_convert_marks_failures(self):
+		items = [importer.ImportItem("fine.json", profile_json(0.1)),
+		         importer.ImportItem("broken.json", b"{not json"),
+		         importer.ImportItem("coarse.json", profile_json(0.3))]
+
+		importer.convert_items(items, octoprint_cura_engine.get_profile_dict_from_json_data)
+
+		self.assertEqual([item.state for item in items], ["pending", "failed", "pending"])
+		self.assertEqual(items[0].profile_dict, dict(layer_height=0.1))
+		self.assertTrue(all(item.data is None for item in items))
+
+	def _write(self, name, data):
+		path = os.path.join(self.folder, name)
+		with open(path, "wb") as f:
+			f.write(data)
+		return path
+
+
+class BulkImportTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.profiles_folder = os.path.join(self.folder, "profiles")
+		os.makedirs(self.profiles_folder)
+		self.plugin = create_plugin(self.folder)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_imports_all(self):
+		self.plugin._slicing_manager = FakeSlicingManager(self.profiles_folder)
+		items = self._items()
+
+		self.plugin._validate_imported_profiles(items, allow_overwrite=False)
+		self.plugin._commit_imported_profiles(items, "today")
+
+		self.assertEqual([item.state for item in items], ["imported", "imported"])
+		self.assertEqual(sorted(os.listdir(self.profiles_folder)), ["coarse.profile", "fine.profile"])
+
+	def test_rolls_back_on_failure(self):
+		existing = os.path.join(self.profiles_folder, "fine.profile")
+		octoprint_cura_engine.save_profile_dict_to_yaml(existing, dict(layer_height=0.15))
+		self.plugin._slicing_manager = FakeSlicingManager(self.profiles_folder, fail_on=2)
+		items = self._items()
+
+		self.plugin._validate_imported_profiles(items, allow_overwrite=True)
+		with self.assertRaises(IOError):
+			self.plugin._commit_imported_profiles(items, "today")
+
+		# the replaced profile is back, the new one is gone
+		self.assertEqual(os.listdir(self.profiles_folder), ["fine.profile"])
+		self.assertEqual(octoprint_cura_engine.get_profile_dict_from_yaml(existing), dict(layer_height=0.15))
+
+	def test_existing_profiles_conflict(self):
+		octoprint_cura_engine.save_profile_dict_to_yaml(os.path.join(self.profiles_folder, "fine.profile"), dict(layer_height=0.15))
+		self.plugin._slicing_manager = FakeSlicingManager(self.profiles_folder)
+		items = self._items()
+
+		self.plugin._validate_imported_profiles(items, allow_overwrite=False)
+
+		self.assertEqual(items[0].state, "failed")
+		self.assertTrue(items[0].conflict)
+		self.assertEqual(items[1].state, "pending")
+
+	def test_duplicate_names_fail(self):
+		self.plugin._slicing_manager = FakeSlicingManager(self.profiles_folder)
+		items = self._items() + [self._item("a/fine.json", 0.12)]
+
+		self.plugin._validate_imported_profiles(items, allow_overwrite=True)
+
+		self.assertEqual([item.state for item in items], ["pending", "pending", "failed"])
+
+	def _items(self):
+		return [self._item("fine.json", 0.1), self._item("coarse.json", 0.3)]
+
+	def _item(self, filename, layer_height):
+		item = importer.ImportItem(filename, None)
+		item.profile_dict = dict(layer_height=layer_height)
+		return item
@@ -0,0 +1,114 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from octoprint_cura_engine import joblog
+from octoprint_cura_engine.joblog import EngineLog, LineSampler
+
+
+class FakeClock(object):
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def time(self):
+		return self.now
+
+
+class LineSamplerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+		self._time = joblog.time
+		joblog.time = self.clock
+
+	def tearDown(self):
+		joblog.time = self._time
+
+	def test_limits_progress_lines(self):
+		sampler = LineSampler(progress_rate=2.0)
+
+		self.assertEqual(sampler.get_level("Progress:inset:1:10 10%"), logging.DEBUG)
+		self.clock.now += 0.1
+		self.assertIsNone(sampler.get_level("Progress:inset:2:10 20%"))
+		self.clock.now += 0.5
+		self.assertEqual(sampler.get_level("Progress:inset:3:10 30%"), logging.DEBUG)
+
+	def test_new_stage_is_always_logged(self):
+		sampler = LineSampler(progress_rate=1.0)
+
+		self.assertEqual(sampler.get_level("Progress:inset:1:10 10%"), logging.DEBUG)
+		self.assertEqual(sampler.get_level("Progress:skin:1:10 10%"), logging.DEBUG)
+		self.assertIsNone(sampler.get_level("Progress:skin:2:10 20%"))
+
+	def test_unlimited(self):
+		sampler = LineSampler(progress_rate=0)
+		for _ in range(5):
+			self.assertEqual(sampler.get_level("Progress:inset:1:10 10%"), logging.DEBUG)
+
+	def test_levels(self):
+		sampler = LineSampler(verbose=False)
+
+		self.assertEqual(sampler.get_level("Error: could not open file"), logging.ERROR)
+		self.assertEqual(sampler.get_level("WARNING: model is not closed"), logging.WARNING)
+		self.assertIsNone(sampler.get_level("Loaded 12 triangles"))
+		self.assertEqual(LineSampler(verbose=True).get_level("Loaded 12 triangles"), logging.DEBUG)
+
+
+class EngineLogTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.logfile = os.path.join(self.folder, "engine.log")
+		self.job_folder = os.path.join(self.folder, "jobs")
+		self.logger = logging.getLogger("tests.joblog.{}".format(id(self)))
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_logs_per_job(self):
+		log = self._start()
+		try:
+			self.logger.info("before")
+			log.bind("job1")
+			self.logger.info("for %s", "job1")
+			log.finish("job1")
+			self.logger.info("after")
+		finally:
+			log.stop()
+
+		with open(self.logfile) as f:
+			lines = [line.split(" ", 2)[2].strip() for line in f]
+		self.assertEqual(lines, ["before", "for job1", "after"])
+
+		with open(os.path.join(self.job_folder, "job1.log")) as f:
+			self.assertIn("for job1", f.read())
+
+	def test_compresses_and_prunes_job_logs(self):
+		log = self._start(max_job_logs=2, compress=True)
+		try:
+			for index in range(3):
+				job_id = "job{}".format(index)
+				log.bind(job_id)
+				self.logger.info("for %s", job_id)
+				log.finish(job_id)
+				# pruning goes by mtime
+				time.sleep(0.05)
+		finally:
+			log.stop()
+
+		self.assertEqual(sorted(os.listdir(self.job_folder)), ["job1.log.gz", "job2.log.gz"])
+		with gzip.open(os.path.join(self.job_folder, "job2.log.gz"), "rb") as f:
+			self.assertIn(b"for job2", f.read())
+
+	def _start(self, **kwargs):
+		log = EngineLog(self.logger, self.logfile, job_folder=self.job_folder, **kwargs)
+		log.start()
+		return log
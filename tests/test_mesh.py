@@ -0,0 +1,170 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine import mesh
+from octoprint_cura_engine.mesh import MeshError, ModelDoesNotFit
+
+from .util import create_model
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+
+def create_grid(count, size=100.0):
+	"""
+	Flat square of ``2 * count * count`` triangles.
+	"""
+
+	step = size / count
+	triangles = []
+	for i in range(count):
+		for j in range(count):
+			a = (i * step, j * step, 0.0)
+			b = ((i + 1) * step, j * step, 0.0)
+			c = ((i + 1) * step, (j + 1) * step, 0.0)
+			d = (i * step, (j + 1) * step, 0.0)
+			triangles.extend([(a, b, c), (a, c, d)])
+	return mesh.Mesh(numpy.array(triangles, dtype=numpy.float64))
+
+
+@unittest.skipUnless(mesh.is_available(), "NumPy is not available")
+class ReadStlTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def test_ascii(self):
+		cube = mesh.read_stl(create_model(self.folder))
+		self.assertEqual(len(cube), 12)
+		self.assertEqual(cube.size.tolist(), [10.0, 10.0, 10.0])
+		self.assertAlmostEqual(cube.surface_area(), 600.0)
+
+	def test_binary_round_trip(self):
+		cube = mesh.read_stl(create_model(self.folder))
+		path = os.path.join(self.folder, "binary.stl")
+		cube.write_stl(path)
+
+		read = mesh.read_stl(path)
+		self.assertEqual(os.path.getsize(path), 84 + 12 * 50)
+		self.assertTrue(numpy.array_equal(read.triangles, cube.triangles))
+
+	def test_invalid(self):
+		path = os.path.join(self.folder, "broken.stl")
+		with open(path, "wb") as f:
+			f.write(b"this is not a mesh at all, neither binary nor ascii, but long enough for a header")
+		with self.assertRaises(MeshError):
+			mesh.read_stl(path)
+
+	def test_incomplete_ascii(self):
+		path = os.path.join(self.folder, "incomplete.stl")
+		with open(path, "wb") as f:
+			f.write(b"solid broken\nfacet normal 0 0 0\nouter loop\nvertex 0 0 0\nvertex 1 0 0\nendloop\nendfacet\nendsolid broken\n")
+		with self.assertRaises(MeshError):
+			mesh.read_stl(path)
+
+
+@unittest.skipUnless(mesh.is_available(), "NumPy is not available")
+class MeshTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.cube = mesh.read_stl(create_model(self.folder))
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def test_rotated_quarter(self):
+		rotated = mesh.Mesh(self.cube.triangles * [2.0, 1.0, 1.0]).rotated_quarter()
+		minimum, maximum = rotated.bounds
+		self.assertEqual((maximum - minimum).tolist(), [10.0, 20.0, 10.0])
+		self.assertEqual(minimum.tolist(), [-10.0, 0.0, 0.0])
+
+	def test_merge(self):
+		merged = mesh.merge([self.cube, self.cube.translated((20, 0, 0))])
+		self.assertEqual(len(merged), 24)
+		self.assertEqual(merged.size.tolist(), [30.0, 10.0, 10.0])
+
+	def test_decimated(self):
+		grid = create_grid(40)
+		decimated = grid.decimated(200)
+
+		self.assertLessEqual(len(decimated), 200)
+		self.assertGreater(len(decimated), 0)
+		# clustering pulls the border in by up to half a cell
+		self.assertAlmostEqual(decimated.surface_area(), grid.surface_area(), delta=grid.surface_area() * 0.2)
+		minimum, maximum = decimated.bounds
+		self.assertTrue((minimum >= 0.0).all() and (maximum <= 100.0).all())
+
+	def test_decimated_small_mesh_unchanged(self):
+		self.assertIs(self.cube.decimated(100), self.cube)
+
+
+@unittest.skipUnless(mesh.is_available(), "NumPy is not available")
+class PlacementTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.cube = mesh.read_stl(create_model(self.folder)).translated((5, 5, 3))
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def test_place_on_bed(self):
+		placed = mesh.place_on_bed(self.cube, dict(x=100, y=50))
+		minimum, maximum = placed.bounds
+		self.assertEqual(minimum.tolist(), [95.0, 45.0, 0.0])
+		self.assertEqual(maximum.tolist(), [105.0, 55.0, 10.0])
+
+	def test_fits(self):
+		mesh.check_fits(self.cube, dict(width=200, depth=200, height=200))
+		mesh.check_fits(mesh.place_on_bed(self.cube, dict(x=5, y=5)), dict(width=10, depth=10, height=10), positioned=True)
+
+	def test_too_high(self):
+		with self.assertRaises(ModelDoesNotFit):
+			mesh.check_fits(self.cube, dict(width=200, depth=200, height=5))
+
+	def test_too_large(self):
+		with self.assertRaises(ModelDoesNotFit):
+			mesh.check_fits(self.cube, dict(width=8, depth=200, height=200))
+
+	def test_positioned_outside(self):
+		placed = mesh.place_on_bed(self.cube, dict(x=0, y=100))
+		with self.assertRaises(ModelDoesNotFit):
+			mesh.check_fits(placed, dict(width=200, depth=200, height=200), positioned=True)
+
+		# but fits on a bed with its origin in the center
+		mesh.check_fits(mesh.place_on_bed(self.cube, dict(x=0, y=0)), dict(width=200, depth=200, height=200, origin="center"), positioned=True)
+
+	def test_to_engine_frame(self):
+		volume = dict(width=200, depth=100, height=200)
+		placed = mesh.place_on_bed(self.cube, dict(x=30, y=70))
+
+		# the engine adds half the bed to every coordinate
+		minimum, maximum = mesh.to_engine_frame(placed, volume).bounds
+		self.assertEqual(minimum.tolist(), [-75.0, 15.0, 0.0])
+		self.assertEqual(maximum.tolist(), [-65.0, 25.0, 10.0])
+
+		# unless machine_center_is_zero is set
+		minimum, maximum = mesh.to_engine_frame(placed, volume, center_is_zero=True).bounds
+		self.assertEqual(minimum.tolist(), [25.0, 65.0, 0.0])
+
+	def test_circular(self):
+		volume = dict(width=14, depth=14, height=200, formFactor="circular")
+		# the diagonal of the cube's footprint is about 14.1mm
+		with self.assertRaises(ModelDoesNotFit):
+			mesh.check_fits(self.cube, volume)
+		mesh.check_fits(self.cube, dict(volume, width=15, depth=15))
+
+
+if __name__ == "__main__":
+	unittest.main()
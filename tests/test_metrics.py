@@ -0,0 +1,67 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import unittest
+
+from octoprint_cura_engine.metrics import JobTimer, MetricsRegistry
+
+
+def create_timer(job_id, total, outcome="success"):
+	timer = JobTimer(job_id)
+	timer.record("engine", total)
+	timer.finish(outcome)
+	timer.finished_at = timer.started_at + total
+	return timer
+
+
+class JobTimerTest(unittest.TestCase):
+
+	def test_phases_accumulate(self):
+		timer = JobTimer("job")
+		timer.record("engine", 1.0)
+		timer.record("load_profile", 0.5)
+		timer.record("engine", 2.0)
+		timer.finish("success")
+
+		self.assertEqual(timer.phases, dict(engine=3.0, load_profile=0.5))
+		self.assertEqual(timer.as_dict()["outcome"], "success")
+
+	def test_engine_stages(self):
+		timer = JobTimer("job")
+		timer.start_engine_stage("inset")
+		timer.start_engine_stage("inset")
+		timer.start_engine_stage("skin")
+		timer.finish("success")
+
+		self.assertEqual(list(timer.phases), ["engine_inset", "engine_skin"])
+
+
+class MetricsRegistryTest(unittest.TestCase):
+
+	def test_summary_covers_window(self):
+		registry = MetricsRegistry(window=2)
+		for index, total in enumerate((1.0, 2.0, 3.0)):
+			registry.add(create_timer(str(index), total))
+
+		metrics = registry.as_dict()
+		self.assertEqual(metrics["window"], 2)
+		self.assertEqual(metrics["outcomes"], dict(success=3))
+		self.assertEqual(metrics["phases"]["engine"]["count"], 2)
+		self.assertEqual(metrics["phases"]["engine"]["max"], 3.0)
+
+	def test_prometheus_histograms_are_cumulative(self):
+		registry = MetricsRegistry(window=1)
+		registry.add(create_timer("1", 0.02))
+		registry.add(create_timer("2", 20.0, outcome="failed"))
+
+		lines = registry.as_prometheus().splitlines()
+		self.assertIn('cura_engine_jobs_total{outcome="failed"} 1', lines)
+		self.assertIn('cura_engine_jobs_total{outcome="success"} 1', lines)
+		self.assertIn("# TYPE cura_engine_job_phase_seconds histogram", lines)
+
+		# jobs that dropped out of the window are still counted
+		self.assertIn('cura_engine_job_phase_seconds_bucket{phase="engine",le="0.05"} 1', lines)
+		self.assertIn('cura_engine_job_phase_seconds_bucket{phase="engine",le="30"} 2', lines)
+		self.assertIn('cura_engine_job_phase_seconds_bucket{phase="engine",le="+Inf"} 2', lines)
+		self.assertIn('cura_engine_job_phase_seconds_count{phase="engine"} 2', lines)
+		self.assertIn("cura_engine_peak_rss_bytes_count 0", lines)
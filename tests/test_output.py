@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine.output import LayerSink
+
+
+GCODE = b";FLAVOR:RepRap\nG28\n;LAYER:0\nG1 X1 Y1\n;LAYER:1\nG1 X2 Y2\n;LAYER:2\nG1 X3 Y3\n;End of Gcode\n"
+
+
+class LayerSinkTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "output.gco")
+		self.layers = []
+
+	def tearDown(self):
+		shutil.rmtree(self.folder)
+
+	def test_whole_file_at_once(self):
+		sink = self._sink()
+		sink.write(GCODE)
+		self.assertEqual(self.layers, [(1, GCODE.index(b";LAYER:2"))])
+		self.assertEqual(sink.close(), len(GCODE))
+
+		self.assertEqual(self.layers[-1], (2, len(GCODE)))
+		self._assert_written()
+
+	def test_byte_by_byte(self):
+		sink = self._sink()
+		for index in range(len(GCODE)):
+			sink.write(GCODE[index:index + 1])
+		sink.close()
+
+		# markers split across chunks are found as well, every layer is published once it's complete
+		self.assertEqual(self.layers, [(0, GCODE.index(b";LAYER:1")),
+		                               (1, GCODE.index(b";LAYER:2")),
+		                               (2, len(GCODE))])
+		self._assert_written()
+
+	def test_published_layers_are_on_disk(self):
+		def on_layer(layer, size):
+			with open(self.path, "rb") as f:
+				self.assertEqual(f.read(), GCODE[:size])
+
+		sink = LayerSink(self.path, on_layer=on_layer)
+		for index in range(0, len(GCODE), 5):
+			sink.write(GCODE[index:index + 5])
+		sink.close()
+		self._assert_written()
+
+	def test_writes_without_layers_once_too_much_is_pending(self):
+		sink = self._sink()
+		sink.MAX_PENDING = 10
+		sink.write(b"G1 X1 Y1\nG1 X2 Y2\n")
+		self.assertEqual(sink.size, 18)
+		self.assertEqual(self.layers, [])
+		sink.close()
+
+	def _sink(self):
+		return LayerSink(self.path, on_layer=lambda layer, size: self.layers.append((layer, size)))
+
+	def _assert_written(self):
+		with open(self.path, "rb") as f:
+			self.assertEqual(f.read(), GCODE)
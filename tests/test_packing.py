@@ -0,0 +1,110 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import itertools
+import unittest
+
+from octoprint_cura_engine import mesh, packing
+from octoprint_cura_engine.packing import PlateFull
+
+
+def overlaps(a, b):
+	return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def placed_rects(sizes, placements):
+	rects = []
+	for (width, depth), (x, y, rotated) in zip(sizes, placements):
+		if rotated:
+			width, depth = depth, width
+		rects.append((x - width / 2.0, y - depth / 2.0, width, depth))
+	return rects
+
+
+class PackTest(unittest.TestCase):
+
+	def test_parts_fit_without_overlapping(self):
+		sizes = [(50, 30), (40, 40), (20, 60), (30, 30), (10, 10), (25, 15)]
+		bed = (0.0, 0.0, 100.0, 100.0)
+
+		rects = placed_rects(sizes, packing.pack(sizes, bed, spacing=2.0))
+
+		for rect in rects:
+			self.assertTrue(packing._contains(bed, rect), rect)
+		for a, b in itertools.combinations(rects, 2):
+			self.assertFalse(overlaps(a, b), (a, b))
+
+	def test_spacing_is_kept(self):
+		sizes = [(45, 45)] * 4
+		rects = placed_rects(sizes, packing.pack(sizes, (0.0, 0.0, 100.0, 100.0), spacing=5.0))
+
+		for a, b in itertools.combinations(rects, 2):
+			grown = (a[0] - 2.5, a[1] - 2.5, a[2] + 5.0, a[3] + 5.0)
+			self.assertFalse(overlaps(grown, b), (a, b))
+
+	def test_rotates_parts_that_only_fit_rotated(self):
+		placements = packing.pack([(20, 90)], (0.0, 0.0, 100.0, 30.0))
+		self.assertTrue(placements[0][2])
+
+		with self.assertRaises(PlateFull):
+			packing.pack([(20, 90)], (0.0, 0.0, 100.0, 30.0), allow_rotation=False)
+
+	def test_avoids_obstacles(self):
+		obstacle = (0.0, 0.0, 100.0, 50.0)
+		rects = placed_rects([(80, 40)], packing.pack([(80, 40)], (0.0, 0.0, 100.0, 100.0), obstacles=[obstacle]))
+		self.assertFalse(overlaps(rects[0], obstacle))
+
+	def test_plate_full(self):
+		with self.assertRaises(PlateFull) as context:
+			packing.pack([(60, 60)] * 3, (0.0, 0.0, 100.0, 100.0))
+		self.assertIn("60.0x60.0mm", str(context.exception))
+
+	def test_plate_full_is_model_does_not_fit(self):
+		self.assertTrue(issubclass(PlateFull, mesh.ModelDoesNotFit))
+
+
+class BedTest(unittest.TestCase):
+
+	def test_rectangular(self):
+		self.assertEqual(packing.get_bed(dict(width=200, depth=100)), (0.0, 0.0, 200.0, 100.0))
+		self.assertEqual(packing.get_bed(dict(width=200, depth=100, origin="center")), (-100.0, -50.0, 200.0, 100.0))
+
+	def test_circular_uses_inscribed_square(self):
+		x, y, width, depth = packing.get_bed(dict(width=200, depth=200, origin="center", formFactor="circular"))
+		self.assertAlmostEqual(width, 200 / 2 ** 0.5)
+		self.assertAlmostEqual(x, -width / 2.0)
+
+	def test_disallowed_areas(self):
+		rects = packing.get_disallowed_rects((100.0, 100.0), "[[[-100, -100], [-80, -100], [-80, -90]]]")
+		self.assertEqual(rects, [(0.0, 0.0, 20.0, 10.0)])
+
+	def test_adhesion_margin(self):
+		self.assertEqual(packing.get_adhesion_margin(dict(adhesion_type="brim", brim_line_count=10, skirt_line_width=0.4)), 4.0)
+		self.assertEqual(packing.get_adhesion_margin(dict(adhesion_type="raft", raft_margin=5)), 5.0)
+		self.assertEqual(packing.get_adhesion_margin(dict(adhesion_type="skirt")), 0.0)
+
+
+@unittest.skipUnless(mesh.is_available(), "requires NumPy")
+class ArrangeTest(unittest.TestCase):
+
+	def test_merges_placed_parts(self):
+		import numpy
+
+		cube = mesh.Mesh(numpy.array([[[0, 0, 0], [10, 0, 0], [10, 20, 0]], [[0, 0, 5], [10, 20, 5], [0, 20, 5]]], dtype=numpy.float64))
+		volume = dict(width=100, depth=100, height=100)
+
+		plate, placements = packing.arrange([cube, cube, cube], volume, spacing=2.0)
+
+		self.assertEqual(len(plate), 6)
+		minimum, maximum = plate.bounds
+		self.assertTrue((minimum >= 0).all() and maximum[0] <= 100 and maximum[1] <= 100)
+		self.assertEqual(minimum[2], 0)
+		self.assertEqual(len(placements), 3)
+
+	def test_part_too_high(self):
+		import numpy
+
+		tower = mesh.Mesh(numpy.array([[[0, 0, 0], [10, 0, 0], [10, 10, 150]]], dtype=numpy.float64))
+		with self.assertRaises(mesh.ModelDoesNotFit) as context:
+			packing.arrange([tower], dict(width=100, depth=100, height=100))
+		self.assertNotIsInstance(context.exception, PlateFull)
@@ -0,0 +1,88 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import math
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from octoprint_cura_engine.metrics import JobTimer
+
+from .util import create_plugin
+
+
+class RecordingReporter(object):
+
+	def __init__(self):
+		self.updates = []
+		self.flushed = False
+
+	def update(self, stage, fraction):
+		self.updates.append((stage, fraction))
+
+	def flush(self):
+		self.flushed = True
+
+
+class ParseSlicingOutputTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def _parse(self, output, returncode=0, **kwargs):
+		script = "import sys; sys.stderr.write({!r}); sys.exit({})".format(output, returncode)
+		p = subprocess.Popen([sys.executable, "-c", script], stderr=subprocess.PIPE)
+		return self.plugin._parse_slicing_output(p, **kwargs)
+
+	def test_progress_and_analysis(self):
+		reporter = RecordingReporter()
+		timer = JobTimer("job")
+		output = "\n".join(["Loading mesh",
+		                    "Progress:slice:1:4 \t0.25%",
+		                    "Progress:slice:4:4 \t1.0%",
+		                    "Progress:export:1:2 \t0.5%",
+		                    "Print time: 1234",
+		                    "Filament: 1000.0",
+		                    ""])
+		returncode, analysis = self._parse(output, reporter=reporter, filament_diameter=1.75, timer=timer)
+
+		self.assertEqual(returncode, 0)
+		self.assertEqual(reporter.updates, [("slice", 0.25), ("slice", 1.0), ("export", 0.5)])
+		self.assertTrue(reporter.flushed)
+		self.assertEqual(analysis["estimatedPrintTime"], "1234")
+		self.assertEqual(analysis["filament"]["tool0"]["volume"], 1.0)
+		self.assertAlmostEqual(analysis["filament"]["tool0"]["length"], 1000.0 / (math.pi * 0.875 ** 2))
+
+		timer.finish("success")
+		self.assertEqual(list(name for name in timer.phases if name.startswith("engine_")), ["engine_slice", "engine_export"])
+
+	def test_overall_progress_of_older_engines(self):
+		reporter = RecordingReporter()
+		self._parse("Progress:inset:0.5%\n", reporter=reporter)
+		self.assertEqual(reporter.updates, [(None, 0.5)])
+
+	def test_unparseable_progress_skipped(self):
+		reporter = RecordingReporter()
+		returncode, analysis = self._parse("Progress: garbage\nPrint time: 10\n", reporter=reporter)
+		self.assertEqual(reporter.updates, [])
+		self.assertEqual(analysis, dict(estimatedPrintTime="10"))
+
+	def test_filament_needs_diameter(self):
+		returncode, analysis = self._parse("Filament: 1000.0\n")
+		self.assertNotIn("filament", analysis)
+
+	def test_returncode(self):
+		returncode, analysis = self._parse("Error\n", returncode=3)
+		self.assertEqual(returncode, 3)
+		self.assertEqual(analysis, dict())
+
+
+if __name__ == "__main__":
+	unittest.main()
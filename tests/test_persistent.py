@@ -0,0 +1,93 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine import mesh
+from octoprint_cura_engine.metrics import JobTimer
+
+from .util import PRINTER_PROFILE, create_model, create_plugin
+
+
+class StatefulConnection(object):
+	"""
+	Stands in for a persistent engine: like CuraEngine in "connect" mode it keeps the settings of earlier jobs and
+	only replaces the ones it receives.
+	"""
+
+	def __init__(self):
+		self.process = FakeProcess()
+		self.settings = dict()
+
+	def slice(self, settings, triangles, machinecode_path, on_progress=None, watchdog=None):
+		self.settings.update(settings)
+		with open(machinecode_path, "w") as f:
+			f.write(";infill_sparse_density={}\n".format(self.settings["infill_sparse_density"]))
+		return dict()
+
+
+class FakeProcess(object):
+	pid = 4711
+
+	def poll(self):
+		return None
+
+
+class SingleEnginePool(object):
+	def __init__(self, connection):
+		self.connection = connection
+
+	def acquire(self):
+		return self.connection
+
+	def release(self, connection):
+		pass
+
+
+@unittest.skipUnless(mesh.is_available(), "requires NumPy")
+class PersistentSettingsTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.model_path = create_model(self.folder)
+		self.connection = StatefulConnection()
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_overrides_do_not_leak_into_later_jobs(self):
+		defaults = self.plugin._definition.get_defaults()
+
+		overridden = dict(defaults)
+		overridden["infill_sparse_density"] = 55
+		self.assertEqual(self._slice(overridden), ";infill_sparse_density=55\n")
+
+		self.assertEqual(self._slice(dict(defaults)), ";infill_sparse_density={}\n".format(defaults["infill_sparse_density"]))
+
+	def test_settings_missing_from_profile_fall_back_to_defaults(self):
+		defaults = self.plugin._definition.get_defaults()
+
+		self._slice(dict(infill_sparse_density=55))
+		self.assertEqual(self._slice(dict()), ";infill_sparse_density={}\n".format(defaults["infill_sparse_density"]))
+
+	def _slice(self, profile_dict):
+		machinecode_path = os.path.join(self.folder, "output.gco")
+		scheduler = self.plugin._scheduler
+		job = scheduler.submit(machinecode_path)
+		self.assertTrue(scheduler.wait_for_slot(job))
+		try:
+			returncode, _ = self.plugin._slice_persistent(SingleEnginePool(self.connection), job, JobTimer(job.id), self.model_path,
+			                                              PRINTER_PROFILE, machinecode_path, profile_dict,
+			                                              self.plugin._create_progress_reporter(None, None, (), dict()),
+			                                              None, self.plugin._create_watchdog())
+		finally:
+			scheduler.finish(job)
+
+		self.assertEqual(returncode, 0)
+		with open(machinecode_path) as f:
+			return f.read()
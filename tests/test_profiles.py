@@ -0,0 +1,105 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_cura_engine.profiles import ProfileCache, copy_profile
+
+
+class ProfileCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "profile.yaml")
+		with open(self.path, "wb") as f:
+			f.write(b"layer_height: 0.1\nmachine_disallowed_areas:\n- [[0, 0], [1, 1]]\n")
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def _rewrite_in_place(self, content):
+		# same size, same inode and same mtime, indistinguishable for the cache
+		stat = os.stat(self.path)
+		with open(self.path, "r+b") as f:
+			f.write(content)
+		os.utime(self.path, (stat.st_atime, stat.st_mtime))
+
+	def test_load(self):
+		profile = ProfileCache().load(self.path)
+		self.assertEqual(profile, dict(layer_height=0.1, machine_disallowed_areas=[[[0, 0], [1, 1]]]))
+
+	def test_load_cached(self):
+		cache = ProfileCache()
+		cache.load(self.path)
+
+		self._rewrite_in_place(b"layer_height: 0.3")
+		self.assertEqual(cache.load(self.path)["layer_height"], 0.1)
+
+		cache.invalidate(self.path)
+		self.assertEqual(cache.load(self.path)["layer_height"], 0.3)
+
+	def test_changes_picked_up(self):
+		cache = ProfileCache()
+		cache.load(self.path)
+
+		with open(self.path, "wb") as f:
+			f.write(b"layer_height: 0.25\n")
+		self.assertEqual(cache.load(self.path), dict(layer_height=0.25))
+
+	def test_copies_returned(self):
+		cache = ProfileCache()
+		profile = cache.load(self.path)
+		profile["layer_height"] = 0.5
+		profile["machine_disallowed_areas"][0].append([2, 2])
+
+		self.assertEqual(cache.load(self.path), dict(layer_height=0.1, machine_disallowed_areas=[[[0, 0], [1, 1]]]))
+
+	def test_save(self):
+		cache = ProfileCache()
+		profile = dict(layer_height=0.2, infill_sparse_density=15)
+		cache.save(self.path, profile)
+		profile["layer_height"] = 0.4
+
+		self.assertEqual(ProfileCache().load(self.path), dict(layer_height=0.2, infill_sparse_density=15))
+		self.assertEqual(cache.load(self.path), dict(layer_height=0.2, infill_sparse_density=15))
+
+	def test_least_recently_used_evicted(self):
+		other = os.path.join(self.folder, "other.yaml")
+		with open(other, "wb") as f:
+			f.write(b"layer_height: 0.2\n")
+
+		cache = ProfileCache(max_entries=1)
+		cache.load(self.path)
+		cache.load(other)
+
+		self._rewrite_in_place(b"layer_height: 0.3")
+		self.assertEqual(cache.load(self.path)["layer_height"], 0.3)
+
+	def test_invalidate_all(self):
+		cache = ProfileCache()
+		cache.load(self.path)
+		cache.invalidate()
+
+		self._rewrite_in_place(b"layer_height: 0.3")
+		self.assertEqual(cache.load(self.path)["layer_height"], 0.3)
+
+
+class CopyProfileTest(unittest.TestCase):
+
+	def test_containers_copied(self):
+		profile = dict(layer_height=0.1, areas=[[0, 0]], nested=dict(a=1))
+		copied = copy_profile(profile)
+
+		self.assertEqual(copied, profile)
+		self.assertIsNot(copied["areas"], profile["areas"])
+		self.assertIsNot(copied["nested"], profile["nested"])
+
+	def test_non_dict(self):
+		self.assertIsNone(copy_profile(None))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,117 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from collections import OrderedDict
+
+from octoprint_cura_engine.progress import ProgressModel, ProgressTracker, estimate_remaining
+
+
+WEIGHTS = OrderedDict([("slice", 0.25), ("export", 0.75)])
+
+
+def create_phases(total):
+	return OrderedDict([("load_profile", 0.1), ("engine_startup", 0.2), ("engine_slice", total * 0.5), ("engine_export", total * 0.5)])
+
+
+class ProgressTrackerTest(unittest.TestCase):
+
+	def test_stages_are_weighted(self):
+		tracker = ProgressTracker(WEIGHTS)
+		self.assertAlmostEqual(tracker.update("slice", 1.0), 0.25)
+		self.assertAlmostEqual(tracker.update("export", 0.5), 0.25 + 0.375)
+		self.assertAlmostEqual(tracker.update("export", 1.0), 1.0)
+
+	def test_progress_never_goes_back(self):
+		tracker = ProgressTracker(WEIGHTS)
+		tracker.update("export", 0.5)
+		self.assertAlmostEqual(tracker.update("slice", 0.5), 0.625)
+
+	def test_unknown_stage_runs_after_current(self):
+		tracker = ProgressTracker(WEIGHTS)
+		tracker.update("slice", 1.0)
+		progress = tracker.update("support", 0.5)
+		# an average weight of 0.5 is added after slice
+		self.assertAlmostEqual(progress, (0.25 + 0.25) / 1.5)
+
+	def test_without_stages(self):
+		tracker = ProgressTracker(WEIGHTS)
+		self.assertEqual(tracker.update(None, 0.3), 0.3)
+		self.assertEqual(tracker.update(None, 2.0), 1.0)
+
+
+class EstimateRemainingTest(unittest.TestCase):
+
+	def test_unknown(self):
+		self.assertIsNone(estimate_remaining(0.0, 1.0))
+
+	def test_extrapolation(self):
+		self.assertAlmostEqual(estimate_remaining(0.25, 10.0), 30.0)
+
+	def test_prediction_only(self):
+		self.assertEqual(estimate_remaining(0.0, 4.0, predicted_duration=10.0), 6.0)
+		self.assertEqual(estimate_remaining(0.0, 12.0, predicted_duration=10.0), 0.0)
+
+	def test_blend(self):
+		# predicted 10s left, extrapolated 30s, at 25% the prediction counts three times as much
+		self.assertAlmostEqual(estimate_remaining(0.25, 10.0, predicted_duration=20.0), 0.75 * 10.0 + 0.25 * 30.0)
+
+
+class ProgressModelTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "progress.json")
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, ignore_errors=True)
+
+	def test_no_prediction_before_min_samples(self):
+		model = ProgressModel(self.path)
+		for _ in range(ProgressModel.MIN_SAMPLES - 1):
+			model.learn([1.0, 1.0, 10.0, 0.2], create_phases(5.0))
+		self.assertIsNone(model.predict([1.0, 1.0, 10.0, 0.2]))
+
+	def test_learns_linear_run_time(self):
+		model = ProgressModel(self.path, forgetting=1.0, regularization=1e-9)
+		for size in (0.5, 1.0, 2.0, 4.0, 8.0):
+			features = [1.0, size, size * 5.0, size * 0.2]
+			model.learn(features, create_phases(1.0 + 2.0 * size))
+
+		# the engine's startup counts towards its run time
+		size = 3.0
+		self.assertAlmostEqual(model.predict([1.0, size, size * 5.0, size * 0.2]), 0.2 + 7.0, places=3)
+
+	def test_learns_stage_weights(self):
+		model = ProgressModel(self.path, smoothing=1.0)
+		model.learn([1.0, 1.0, 10.0, 0.2], OrderedDict([("engine_slice", 1.0), ("engine_export", 3.0)]))
+		self.assertEqual(model.get_stage_weights(), OrderedDict([("slice", 0.25), ("export", 0.75)]))
+
+	def test_ignores_jobs_without_engine_time(self):
+		model = ProgressModel(self.path)
+		model.learn([1.0, 1.0, 10.0, 0.2], dict(load_profile=1.0))
+		self.assertFalse(os.path.exists(self.path))
+
+	def test_persisted(self):
+		model = ProgressModel(self.path)
+		for size in (1.0, 2.0, 3.0):
+			model.learn([1.0, size, size * 5.0, size * 0.2], create_phases(2.0 * size))
+		features = [1.0, 2.5, 12.5, 0.5]
+
+		loaded = ProgressModel(self.path)
+		self.assertAlmostEqual(loaded.predict(features), model.predict(features))
+		self.assertEqual(loaded.get_stage_weights(), model.get_stage_weights())
+
+	def test_broken_file_starts_over(self):
+		with open(self.path, "w") as f:
+			f.write("not json")
+		model = ProgressModel(self.path)
+		self.assertIsNone(model.predict([1.0, 1.0, 10.0, 0.2]))
+
+
+if __name__ == "__main__":
+	unittest.main()
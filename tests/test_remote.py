@@ -0,0 +1,116 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from cura_engine_common import worker as slicing_worker
+from cura_engine_common.definition import SettingsDefinition
+
+from .util import FAKE_ENGINE, PRINTER_PROFILE, create_model, create_plugin, create_profile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RemoteSlicingTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.worker_folder = os.path.join(self.folder, "worker")
+		os.makedirs(self.worker_folder)
+
+		definition = SettingsDefinition(slicing_worker.get_plugin_definition_path())
+		self.worker = slicing_worker.SlicingWorker(FAKE_ENGINE, definition, self.worker_folder, slots=2)
+		self.server = slicing_worker.create_server(self.worker, port=0, api_key="secret")
+		thread = threading.Thread(target=self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+
+		url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+		self.plugin = create_plugin(self.folder, remote=dict(enabled=True, workers=[url], api_key="secret", timeout=5.0,
+		                                                     deadline=0, retry_interval=60.0))
+		self.model_path = create_model(self.folder)
+		self.profile_path = create_profile(self.plugin, self.folder)
+		self.machinecode_path = os.path.join(self.folder, "cube.gco")
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.folder)
+
+	def test_slices_remotely(self):
+		ok, result = self._slice()
+
+		self.assertTrue(ok, result)
+		self.assertTrue(os.path.getsize(self.machinecode_path) > 0)
+		self.assertIn("remote_slice", self.plugin._metrics.as_dict()["recent"][-1]["phases"])
+
+	def test_falls_back_to_local_slicing_after_deadline(self):
+		self.plugin._settings._values["remote"]["deadline"] = 0.1
+
+		def never_finishes(job_id):
+			return dict(state="running", progress=0.0)
+		for remote_worker in self.plugin._worker_pool._workers:
+			remote_worker.get_job = never_finishes
+
+		ok, result = self._slice()
+
+		self.assertTrue(ok, result)
+		phases = self.plugin._metrics.as_dict()["recent"][-1]["phases"]
+		self.assertIn("remote_slice", phases)
+		self.assertIn("spawn", phases)
+		# the remote job got cancelled
+		self.assertEqual(self.worker.get_status()["running"] + self.worker.get_status()["queued"], 0)
+
+	def test_falls_back_to_local_slicing_with_wrong_api_key(self):
+		self.plugin._settings._values["remote"]["api_key"] = "wrong"
+		self.plugin._update_worker_pool()
+
+		ok, result = self._slice()
+
+		self.assertTrue(ok, result)
+		self.assertNotIn("remote_slice", self.plugin._metrics.as_dict()["recent"][-1]["phases"])
+
+	def test_skips_worker_with_other_definition(self):
+		for remote_worker in self.plugin._worker_pool._workers:
+			def get_other_status(get_status=remote_worker.get_status):
+				return dict(get_status(), definition="0" * 40)
+			remote_worker.get_status = get_other_status
+
+		ok, result = self._slice()
+
+		self.assertTrue(ok, result)
+		self.assertNotIn("remote_slice", self.plugin._metrics.as_dict()["recent"][-1]["phases"])
+		self.assertIsNotNone(self.plugin._worker_pool._workers[0].failed_at)
+
+	def _slice(self):
+		return self.plugin.do_slice(self.model_path, PRINTER_PROFILE, machinecode_path=self.machinecode_path,
+		                            profile_path=self.profile_path)
+
+
+class WorkerTest(unittest.TestCase):
+
+	def test_loopback(self):
+		self.assertTrue(slicing_worker.is_loopback("127.0.0.1"))
+		self.assertTrue(slicing_worker.is_loopback("localhost"))
+		self.assertFalse(slicing_worker.is_loopback("0.0.0.0"))
+
+	def test_refuses_public_address_without_api_key(self):
+		p = subprocess.Popen([sys.executable, "-m", "cura_engine_common.worker", "--engine", FAKE_ENGINE, "--host", "0.0.0.0"],
+		                     cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		_, stderr = p.communicate()
+		self.assertEqual(p.returncode, 2)
+		self.assertIn(b"requires an --api-key", stderr)
+
+	def test_does_not_import_the_plugin(self):
+		output = subprocess.check_output([sys.executable, "-c", "import sys, cura_engine_common.worker; "
+		                                                        "print('octoprint_cura_engine' in sys.modules or 'octoprint' in sys.modules)"],
+		                                 cwd=ROOT)
+		self.assertEqual(output.strip(), b"False")
@@ -0,0 +1,109 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+
+from octoprint_cura_engine.scheduler import JobScheduler, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_SPECULATIVE
+
+
+class FakeProcess(object):
+
+	def __init__(self):
+		self.terminated = False
+
+	def terminate(self):
+		self.terminated = True
+
+
+class JobSchedulerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.scheduler = JobScheduler(slots=1)
+		self.started = []
+
+	def test_runs_jobs_in_priority_order(self):
+		blocker = self.scheduler.submit("blocker.gco")
+		self.assertTrue(self.scheduler.wait_for_slot(blocker))
+
+		threads = []
+		for name, priority in (("low", PRIORITY_LOW), ("normal", PRIORITY_NORMAL), ("high", PRIORITY_HIGH), ("normal2", PRIORITY_NORMAL)):
+			threads.append(self._start(self.scheduler.submit(name, priority=priority)))
+		time.sleep(0.1)
+		self.assertEqual(self.started, [])
+
+		self.scheduler.finish(blocker)
+		for thread in threads:
+			thread.join(5.0)
+		self.assertEqual(self.started, ["high", "normal", "normal2", "low"])
+
+	def test_respects_slots(self):
+		self.scheduler.set_slots(2)
+		first = self.scheduler.submit("first.gco")
+		second = self.scheduler.submit("second.gco")
+		self.assertTrue(self.scheduler.wait_for_slot(first))
+		self.assertTrue(self.scheduler.wait_for_slot(second))
+
+		thread = self._start(self.scheduler.submit("third.gco"))
+		time.sleep(0.1)
+		self.assertEqual(self.started, [])
+
+		self.scheduler.finish(first)
+		thread.join(5.0)
+		self.assertEqual(self.started, ["third.gco"])
+
+	def test_preempts_speculative_jobs(self):
+		speculative = self.scheduler.submit("speculative.gco", priority=PRIORITY_SPECULATIVE)
+		self.assertTrue(self.scheduler.wait_for_slot(speculative))
+		process = FakeProcess()
+		self.assertTrue(self.scheduler.attach_process(speculative, process))
+
+		job = self.scheduler.submit("wanted.gco", priority=PRIORITY_LOW)
+
+		self.assertTrue(speculative.cancelled)
+		self.assertTrue(speculative.preempted)
+		self.assertTrue(process.terminated)
+
+		self.scheduler.finish(speculative)
+		self.assertTrue(self.scheduler.wait_for_slot(job))
+
+	def test_speculative_jobs_do_not_preempt_each_other(self):
+		speculative = self.scheduler.submit("speculative.gco", priority=PRIORITY_SPECULATIVE)
+		self.assertTrue(self.scheduler.wait_for_slot(speculative))
+		self.scheduler.submit("other.gco", priority=PRIORITY_SPECULATIVE)
+
+		self.assertFalse(speculative.cancelled)
+
+	def test_cancel_while_queued(self):
+		blocker = self.scheduler.submit("blocker.gco")
+		self.assertTrue(self.scheduler.wait_for_slot(blocker))
+
+		job = self.scheduler.submit("cancelled.gco")
+		results = []
+		thread = threading.Thread(target=lambda: results.append(self.scheduler.wait_for_slot(job)))
+		thread.start()
+		self.assertEqual(self.scheduler.cancel_by_path("cancelled.gco"), [job.id])
+		thread.join(5.0)
+
+		self.assertEqual(results, [False])
+
+	def test_attaching_to_cancelled_job_terminates_process(self):
+		job = self.scheduler.submit("job.gco")
+		self.assertTrue(self.scheduler.wait_for_slot(job))
+		self.scheduler.cancel(job.id)
+
+		process = FakeProcess()
+		self.assertFalse(self.scheduler.attach_process(job, process))
+		self.assertTrue(process.terminated)
+
+	def _start(self, job):
+		def run():
+			if self.scheduler.wait_for_slot(job):
+				self.started.append(job.machinecode_path)
+				self.scheduler.finish(job)
+
+		thread = threading.Thread(target=run)
+		thread.daemon = True
+		thread.start()
+		return thread
@@ -0,0 +1,108 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import octoprint_cura_engine
+
+from octoprint_cura_engine import mesh
+from octoprint_cura_engine.scheduler import PRIORITY_HIGH
+
+from .util import PRINTER_PROFILE, create_model, create_plugin, create_profile
+
+
+class SlicingTest(unittest.TestCase):
+	"""
+	Slices through the whole plugin, with the fake engine of the benchmarks standing in for CuraEngine.
+	"""
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.model_path = create_model(self.folder)
+		self.profile_path = create_profile(self.plugin, self.folder)
+		self.machinecode_path = os.path.join(self.folder, "cube.gco")
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_slice(self):
+		ok, result = self._slice()
+
+		self.assertTrue(ok, result)
+		self.assertIn("analysis", result)
+		self.assertTrue(os.path.exists(self.machinecode_path))
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(success=1))
+
+	def test_slices_from_the_ui_go_first(self):
+		priorities = []
+		submit = self.plugin._scheduler.submit
+
+		def record_priority(machinecode_path, priority):
+			priorities.append(priority)
+			return submit(machinecode_path, priority=priority)
+		self.plugin._scheduler.submit = record_priority
+
+		self.assertTrue(self._slice()[0])
+		self.assertEqual(priorities, [PRIORITY_HIGH])
+
+	def test_cache_is_checked_before_building_the_command(self):
+		self.plugin._settings._values["cache"]["enabled"] = True
+		self.plugin._update_slice_cache()
+
+		commands = []
+		build_command = self.plugin._build_command
+
+		def record_command(*args, **kwargs):
+			commands.append(args)
+			return build_command(*args, **kwargs)
+		self.plugin._build_command = record_command
+
+		self.assertTrue(self._slice()[0])
+		self.assertEqual(len(commands), 1)
+
+		os.remove(self.machinecode_path)
+		self.assertTrue(self._slice()[0])
+		self.assertEqual(len(commands), 1)
+		self.assertTrue(os.path.exists(self.machinecode_path))
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(success=1, cached=1))
+
+	def test_cache_covers_the_printer_volume(self):
+		self.plugin._settings._values["cache"]["enabled"] = True
+		self.plugin._update_slice_cache()
+
+		self.assertTrue(self._slice()[0])
+		larger = dict(PRINTER_PROFILE, volume=dict(PRINTER_PROFILE["volume"], width=300, depth=300))
+		self.assertTrue(self._slice(printer_profile=larger)[0])
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(success=2))
+
+	@unittest.skipUnless(mesh.is_available(), "NumPy is not available")
+	def test_position_in_the_engine_frame(self):
+		bounds = []
+		build_command = self.plugin._build_command
+		def record_model(executable, model_path, *args, **kwargs):
+			bounds.append(mesh.read_stl(model_path).bounds)
+			return build_command(executable, model_path, *args, **kwargs)
+		self.plugin._build_command = record_model
+
+		# the engine moves the mesh by half the bed of 200x200mm, ending up at the requested position
+		self.assertTrue(self._slice(position=dict(x=30, y=150))[0])
+		minimum, maximum = bounds.pop()
+		self.assertEqual(minimum.tolist(), [-75.0, 45.0, 0.0])
+		self.assertEqual(maximum.tolist(), [-65.0, 55.0, 10.0])
+
+		# with machine_center_is_zero the mesh is passed on in printer coordinates
+		profile_dict = octoprint_cura_engine.get_profile_dict_from_yaml(self.profile_path)
+		profile_dict["machine_center_is_zero"] = "True"
+		octoprint_cura_engine.save_profile_dict_to_yaml(self.profile_path, profile_dict)
+		self.assertTrue(self._slice(position=dict(x=30, y=150))[0])
+		minimum, maximum = bounds.pop()
+		self.assertEqual(minimum.tolist(), [25.0, 145.0, 0.0])
+
+	def _slice(self, printer_profile=PRINTER_PROFILE, position=None):
+		return self.plugin.do_slice(self.model_path, printer_profile, machinecode_path=self.machinecode_path,
+		                            profile_path=self.profile_path, position=position)
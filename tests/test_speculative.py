@@ -0,0 +1,146 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import octoprint_cura_engine
+
+from octoprint_cura_engine.speculative import SpeculativeSlicer
+
+from .util import PRINTER_PROFILE, FakePrinterProfileManager, FakeSlicingManager, create_model, create_plugin, create_profile, set_default_profile
+
+
+class SpeculativeSlicerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.sliced = []
+		self.paused = False
+		self.done = threading.Event()
+		# blocks the worker inside slice_model until released
+		self.release = threading.Event()
+		self.release.set()
+		self.started = threading.Event()
+		self.checked = []
+
+	def slice_model(self, model_path):
+		self.started.set()
+		self.release.wait(5.0)
+		if model_path == "broken.stl":
+			raise RuntimeError("boom")
+		if model_path == "last.stl":
+			self.done.set()
+			return
+		self.sliced.append(model_path)
+
+	def is_paused(self):
+		self.checked.append(self.paused)
+		return self.paused
+
+	def create_slicer(self):
+		return SpeculativeSlicer(self.slice_model, self.is_paused)
+
+	def test_models_sliced_in_order(self):
+		slicer = self.create_slicer()
+		for model in ("a.stl", "broken.stl", "b.stl", "last.stl"):
+			slicer.submit(model)
+
+		self.assertTrue(self.done.wait(5.0))
+		self.assertEqual(self.sliced, ["a.stl", "b.stl"])
+
+	def test_duplicates_sliced_once(self):
+		self.release.clear()
+		slicer = self.create_slicer()
+		slicer.submit("blocker.stl")
+		self.assertTrue(self.started.wait(5.0))
+
+		slicer.submit("a.stl")
+		slicer.submit("a.stl")
+		slicer.submit("last.stl")
+		self.release.set()
+
+		self.assertTrue(self.done.wait(5.0))
+		self.assertEqual(self.sliced, ["blocker.stl", "a.stl"])
+
+	def test_cleared_models_dropped(self):
+		self.release.clear()
+		slicer = self.create_slicer()
+		slicer.submit("blocker.stl")
+		self.assertTrue(self.started.wait(5.0))
+
+		slicer.submit("a.stl")
+		slicer.clear()
+		slicer.submit("last.stl")
+		self.release.set()
+
+		self.assertTrue(self.done.wait(5.0))
+		self.assertEqual(self.sliced, ["blocker.stl"])
+
+	def test_paused(self):
+		self.release.clear()
+		slicer = self.create_slicer()
+		slicer.submit("blocker.stl")
+		self.assertTrue(self.started.wait(5.0))
+
+		self.paused = True
+		slicer.submit("a.stl")
+		slicer.submit("b.stl")
+		self.release.set()
+
+		# models taken from the queue while paused are dropped, the worker keeps running
+		deadline = time.time() + 5.0
+		while len(self.checked) < 3 and time.time() < deadline:
+			time.sleep(0.01)
+		self.paused = False
+		slicer.submit("last.stl")
+
+		self.assertTrue(self.done.wait(5.0))
+		self.assertEqual(self.sliced, ["blocker.stl"])
+		self.assertEqual(self.checked, [False, True, True, False])
+
+
+class PreSlicingTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.plugin._settings._values["cache"]["enabled"] = True
+		self.plugin._update_slice_cache()
+		self.plugin._printer_profile_manager = FakePrinterProfileManager()
+		self.plugin._slicing_manager = FakeSlicingManager(self.folder)
+		self.model_path = create_model(self.folder)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_default_profile(self):
+		profile_path = self.plugin._slicing_manager.get_profile_path("cura_engine", "fine")
+		octoprint_cura_engine.save_profile_dict_to_yaml(profile_path, dict(self.plugin._definition.get_defaults(), layer_height=0.05))
+		set_default_profile(self.plugin, "fine")
+
+		self.plugin._slice_speculatively(self.model_path)
+		self._assert_cached(profile_path)
+
+	def test_without_default_profile(self):
+		set_default_profile(self.plugin, None)
+
+		self.plugin._slice_speculatively(self.model_path)
+		# falls back to the definition's defaults
+		self._assert_cached(create_profile(self.plugin, self.folder))
+
+	def _assert_cached(self, profile_path):
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(success=1))
+
+		machinecode_path = os.path.join(self.folder, "cube.gco")
+		ok, _ = self.plugin.do_slice(self.model_path, PRINTER_PROFILE, machinecode_path=machinecode_path, profile_path=profile_path)
+		self.assertTrue(ok)
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(success=1, cached=1))
+
+
+if __name__ == "__main__":
+	unittest.main()
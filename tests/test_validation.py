@@ -0,0 +1,111 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import octoprint_cura_engine
+from octoprint_cura_engine import importer
+from octoprint_cura_engine.validation import ProfileValidationError, ProfileValidator
+
+from .util import PRINTER_PROFILE, create_model, create_plugin, create_profile
+
+
+SETTINGS = dict(layer_height=dict(type="float", min_value="0.001", max_value="10", default=0.1),
+                brim_line_count=dict(type="int", min_value="0", default=10),
+                support_enable=dict(type="boolean", default=False),
+                adhesion_type=dict(type="enum", options=dict(skirt="Skirt", brim="Brim"), default="skirt"),
+                machine_disallowed_areas=dict(type="polygons", default=[]),
+                machine_name=dict(type="string", default="printer"))
+
+
+class ProfileValidatorTest(unittest.TestCase):
+
+	def setUp(self):
+		self.validator = ProfileValidator(SETTINGS)
+
+	def test_valid_profile(self):
+		self.assertEqual(self.validator.validate(dict(layer_height="0.2", brim_line_count=5, support_enable="true",
+		                                              adhesion_type="Brim", machine_disallowed_areas=[[[0, 0], [1, 1]]],
+		                                              machine_name=3, unknown_setting="anything")),
+		                 dict())
+
+	def test_invalid_numbers(self):
+		errors = self.validator.validate(dict(layer_height="abc", brim_line_count=1.5))
+		self.assertEqual(list(errors), ["brim_line_count", "layer_height"])
+
+		errors = self.validator.validate(dict(layer_height=-1, brim_line_count=True))
+		self.assertIn("at least", errors["layer_height"])
+		self.assertIn("must be an int", errors["brim_line_count"])
+
+		self.assertIn("layer_height", self.validator.validate(dict(layer_height=float("nan"))))
+
+	def test_invalid_enum(self):
+		errors = self.validator.validate(dict(adhesion_type="glue"))
+		self.assertEqual(list(errors), ["adhesion_type"])
+		self.assertIn("brim", errors["adhesion_type"])
+
+	def test_invalid_boolean_and_polygons(self):
+		errors = self.validator.validate(dict(support_enable="maybe", machine_disallowed_areas=[[1, 2]]))
+		self.assertEqual(list(errors), ["machine_disallowed_areas", "support_enable"])
+
+	def test_check_raises(self):
+		with self.assertRaises(ProfileValidationError) as context:
+			self.validator.check(dict(layer_height=0, adhesion_type="glue"))
+		self.assertEqual(sorted(context.exception.errors), ["adhesion_type", "layer_height"])
+		self.assertIn("adhesion_type: must be one of", str(context.exception))
+
+		self.validator.check(dict(layer_height=0.2))
+
+	def test_coerce(self):
+		self.assertEqual(self.validator.coerce("layer_height", "0.2"), 0.2)
+		self.assertEqual(self.validator.coerce("brim_line_count", "10"), 10)
+		self.assertEqual(self.validator.coerce("support_enable", "on"), True)
+		self.assertEqual(self.validator.coerce("machine_disallowed_areas", "[[[0, 0]]]"), [[[0, 0]]])
+		self.assertEqual(self.validator.coerce("brim_line_count", "many"), "many")
+
+
+class PluginValidationTest(unittest.TestCase):
+
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.plugin = create_plugin(self.folder)
+		self.model_path = create_model(self.folder)
+		self.profile_path = create_profile(self.plugin, self.folder)
+
+	def tearDown(self):
+		self.plugin.on_shutdown()
+		shutil.rmtree(self.folder)
+
+	def test_definition_defaults_are_valid(self):
+		self.plugin._check_profile(self.plugin._definition.get_defaults())
+
+	def test_invalid_profile_is_not_sliced(self):
+		profile_dict = self.plugin._definition.get_defaults()
+		profile_dict["adhesion_type"] = "glue"
+		octoprint_cura_engine.save_profile_dict_to_yaml(self.profile_path, profile_dict)
+
+		machinecode_path = os.path.join(self.folder, "cube.gco")
+		ok, result = self.plugin.do_slice(self.model_path, PRINTER_PROFILE, machinecode_path=machinecode_path,
+		                                  profile_path=self.profile_path)
+
+		self.assertFalse(ok)
+		self.assertIn("adhesion_type", result)
+		self.assertFalse(os.path.exists(machinecode_path))
+		self.assertEqual(self.plugin._metrics.as_dict()["outcomes"], dict(invalid=1))
+
+	def test_validation_can_be_disabled(self):
+		self.plugin._settings._values["validation"]["enabled"] = False
+		self.plugin._check_profile(dict(adhesion_type="glue"))
+
+	def test_invalid_imported_profile_fails(self):
+		item = importer.ImportItem("glue.json", None)
+		item.profile_dict = dict(adhesion_type="glue", layer_height=0.1)
+
+		self.plugin._validate_imported_profiles([item], allow_overwrite=True)
+
+		self.assertEqual(item.state, "failed")
+		self.assertFalse(item.conflict)
+		self.assertIn("adhesion_type", item.error)
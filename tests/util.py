@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import os
+import sys
+
+# the benchmark harness already runs the plugin outside of OctoPrint, the tests reuse it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from run_benchmarks import FAKE_ENGINE, PRINTER_PROFILE, create_model, create_plugin, create_profile
+
+__all__ = ["FAKE_ENGINE", "PRINTER_PROFILE", "create_model", "create_plugin", "create_profile",
+           "FakeFileManager", "FakePrinterProfileManager", "FakeSlicingManager", "set_default_profile"]
+
+
+class FakeFileManager(object):
+	"""
+	Local storage of OctoPrint's file manager, rooted at ``folder``.
+	"""
+
+	def __init__(self, folder):
+		self.folder = folder
+
+	def file_exists(self, destination, path):
+		return os.path.isfile(self.path_on_disk(destination, path))
+
+	def path_on_disk(self, destination, path):
+		return os.path.join(self.folder, path)
+
+	def add_file(self, destination, path, file_object, allow_overwrite=False):
+		file_object.save(self.path_on_disk(destination, path))
+		return path
+
+
+class FakePrinterProfileManager(object):
+
+	def __init__(self, printer_profile=PRINTER_PROFILE):
+		self.printer_profile = printer_profile
+
+	def get(self, identifier):
+		return self.printer_profile if identifier == "_default" else None
+
+	def get_current_or_default(self):
+		return self.printer_profile
+
+
+class FakeSlicingManager(object):
+	"""
+	Keeps the slicing profiles in ``folder``, like OctoPrint's slicing manager.
+	"""
+
+	def __init__(self, folder):
+		self.folder = folder
+
+	def get_profile_path(self, slicer, name):
+		return os.path.join(self.folder, name + ".profile")
+
+
+def set_default_profile(plugin, name):
+	"""
+	Selects ``name`` as default profile of the plugin's slicer in OctoPrint's settings.
+	"""
+
+	global_get = plugin._settings.global_get
+
+	def get(path):
+		if path == ["slicing", "defaultProfiles"]:
+			return dict(cura_engine=name) if name else None
+		return global_get(path)
+	plugin._settings.global_get = get